@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from downloader import DownloadTask, InvalidTransitionError, TaskStatus, VideoDownloader
+from utils.history import DownloadRecord
+from utils.work_queue import CANCELLED, FINISHED, QUEUED, Job, SharedQueue
+
+logger = logging.getLogger(__name__)
+
+def _task_progress(task: DownloadTask) -> dict:
+    """工作节点回报给队列的任务进度"""
+    return {
+        "task_status": task.status.value,
+        "progress": task.progress,
+        "speed_bps": task.speed_bps,
+        "eta_seconds": task.eta_seconds,
+        "downloaded_bytes": task.downloaded_bytes,
+        "total_bytes": task.total_bytes,
+        "filename": task.filename,
+        "note": task.note,
+        "error_message": task.error_message,
+    }
+
+class _QueueClient:
+    """共享队列的调用都在单独的线程中按提交顺序执行
+
+    队列文件可能在网络存储上，加锁等待最长可达连接超时(30秒)，不能在事件循环（协调端即界面线程）中直接调用。
+    只用一个线程，保证提交、取消等操作按发生顺序写入。
+    """
+    def __init__(self, queue: SharedQueue):
+        self.queue = queue
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-queue")
+
+    def _call(self, fn: Callable, *args) -> 'asyncio.Future[Any]':
+        return asyncio.get_event_loop().run_in_executor(self._executor, fn, *args)
+
+    def _call_logged(self, message: str, url: str, fn: Callable, *args) -> None:
+        """不等待结果的调用，失败时记录日志"""
+        def done(future: asyncio.Future):
+            if not future.cancelled() and future.exception():
+                logger.warning("%s: %s", message, future.exception(), extra={"url": url})
+        self._call(fn, *args).add_done_callback(done)
+
+class Worker(_QueueClient):
+    """工作节点：从共享队列领取任务交给本地的 VideoDownloader 执行
+
+    定期心跳续租并回报进度；任务结束时把最终状态、文件大小和哈希写回队列。
+    租约被回收（节点卡住太久）或被协调端取消的任务在下次心跳时停止。
+    """
+    def __init__(self, downloader: VideoDownloader, queue: SharedQueue, worker_id: str = "",
+                 slots: int = 3, lease_seconds: float = 60.0, poll_interval: float = 2.0):
+        super().__init__(queue)
+        self.downloader = downloader
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.slots = slots
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.leased: Dict[str, Job] = {}
+        downloader.listeners.append(self._on_transition)
+
+    async def run(self):
+        asyncio.create_task(self._heartbeat_loop())
+        while True:
+            try:
+                while len(self.leased) < self.slots:
+                    job = await self._call(self.queue.lease, self.worker_id, self.lease_seconds)
+                    if job is None:
+                        break
+                    self.leased[job.url] = job
+                    await self.downloader.download(job.url, job.save_path, job.off_peak)
+            except sqlite3.Error as e:
+                logger.warning("领取任务失败: %s", e)
+            await asyncio.sleep(self.poll_interval)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            progress = {
+                url: _task_progress(task)
+                for url in self.leased if (task := self.downloader.get_task(url))
+            }
+            try:
+                lost = await self._call(self.queue.heartbeat, self.worker_id, progress, self.lease_seconds)
+            except sqlite3.Error as e:
+                logger.warning("心跳失败: %s", e)
+                continue
+            for url in lost:
+                # 任务已被取消或分配给其他节点，停止本地下载
+                logger.info("任务已不由本节点持有，停止下载", extra={"url": url})
+                self.leased.pop(url, None)
+                self.downloader.cancel_task(url)
+
+    def _on_transition(self, task: DownloadTask, old: Optional[TaskStatus], new: Optional[TaskStatus]):
+        if new is None or not task.finished or task.url not in self.leased:
+            return
+        self.leased.pop(task.url)
+        # 状态转换发生在写入历史记录之前，等本轮处理结束后再读取文件大小和哈希
+        asyncio.get_event_loop().call_soon(self._report_finished, task)
+
+    def _report_finished(self, task: DownloadTask):
+        fields = _task_progress(task)
+        record = self.downloader.history.get_record(task.url)
+        if record:
+            fields.update(file_size=record.file_size, content_hash=record.content_hash)
+        # 失败时租约到期后任务会被重新分配，已下载的部分可以续传
+        self._call_logged("回报任务结果失败", task.url, self.queue.complete, task.url, self.worker_id, fields)
+
+class Coordinator(_QueueClient):
+    """协调端：界面提交的任务写入共享队列，工作节点回报的进度同步到本地任务列表
+
+    本地任务只用于显示和统计，状态转换与单机模式相同；任务结束时写入本机的历史记录。
+    """
+    def __init__(self, downloader: VideoDownloader, queue: SharedQueue, poll_interval: float = 1.0,
+                 worker_timeout: float = 120.0):
+        super().__init__(queue)
+        self.downloader = downloader
+        self.poll_interval = poll_interval
+        self.worker_timeout = worker_timeout
+        self.worker_count = 0
+        self._version = 0
+        self._syncing = False
+        downloader.coordinator = self
+        downloader.listeners.append(self._on_transition)
+
+    def submit(self, task: DownloadTask) -> None:
+        self._call_logged("提交任务失败", task.url, self.queue.enqueue, task.url, task.save_path, task.off_peak)
+
+    async def run(self):
+        while True:
+            try:
+                await self._call(self.queue.reclaim_expired)
+                await self.sync()
+                self.worker_count = await self._call(self.queue.live_workers, self.worker_timeout)
+            except sqlite3.Error as e:
+                logger.warning("同步共享队列失败: %s", e)
+            await asyncio.sleep(self.poll_interval)
+
+    async def sync(self) -> None:
+        """读取上次同步之后变化的任务，查询在队列线程中进行，结果在事件循环中应用"""
+        jobs, self._version = await self._call(self.queue.changes, self._version)
+        for job in jobs:
+            self._apply(job)
+
+    def _apply(self, job: Job) -> None:
+        task = self.downloader.get_task(job.url)
+        if task is None:
+            if job.state in (FINISHED, CANCELLED):
+                return
+            # 其他协调端或命令行提交的任务
+            task = self.downloader.add_task(job.url, job.save_path)
+        if task.finished:
+            return
+        if job.state == QUEUED and self._started(task):
+            # 工作节点失联后租约被回收，任务重新排队；本地换成新的等待任务，与重新下载已结束的任务相同
+            logger.info("任务已被重新排队", extra={"url": job.url})
+            task = self.downloader.add_task(job.url, job.save_path)
+            task.off_peak = job.off_peak
+
+        task.progress = job.progress
+        task.speed_bps = job.speed_bps
+        task.eta_seconds = job.eta_seconds
+        task.downloaded_bytes = job.downloaded_bytes
+        task.total_bytes = job.total_bytes
+        task.filename = job.filename or task.filename
+        task.note = job.note
+        task.error_message = job.error_message
+
+        if job.state == QUEUED:
+            status = TaskStatus.PENDING
+        elif job.state == CANCELLED:
+            status = TaskStatus.CANCELLED
+        else:
+            status = TaskStatus(job.task_status) if job.task_status else TaskStatus.DOWNLOADING
+        if status == TaskStatus.DOWNLOADING and not task.start_time:
+            task.start_time = datetime.now()
+
+        self._syncing = True
+        try:
+            self._advance(task, status)
+        except InvalidTransitionError as e:
+            # 只影响这一个任务，同一批中的其他任务照常同步
+            logger.warning("同步任务状态失败: %s", e, extra={"url": job.url})
+            return
+        finally:
+            self._syncing = False
+        if task.finished:
+            self._record(task, job)
+
+    @staticmethod
+    def _started(task: DownloadTask) -> bool:
+        """本地任务是否已由某个工作节点开始执行（暂停的按暂停前的状态判断）"""
+        status = task.paused_from if task.status == TaskStatus.PAUSED else task.status
+        return status in (TaskStatus.DOWNLOADING, TaskStatus.POSTPROCESSING)
+
+    def _advance(self, task: DownloadTask, status: TaskStatus) -> None:
+        """轮询可能错过中间状态，必要时经过下载中再转到目标状态"""
+        try:
+            self.downloader._set_status(task, status)
+        except InvalidTransitionError:
+            self.downloader._set_status(task, TaskStatus.DOWNLOADING)
+            self.downloader._set_status(task, status)
+
+    def _record(self, task: DownloadTask, job: Optional[Job] = None) -> None:
+        record = DownloadRecord(
+            url=task.url,
+            filename=task.filename,
+            save_path=task.save_path,
+            start_time=task.start_time or datetime.now(),
+            end_time=datetime.now(),
+            status=task.status.value,
+            error_message=task.error_message,
+            file_size=job.file_size if job else 0,
+            content_hash=job.content_hash if job else "",
+        )
+        self.downloader._save_record(task, record)
+
+    def _on_transition(self, task: DownloadTask, old: Optional[TaskStatus], new: Optional[TaskStatus]):
+        """界面取消的任务同步到共享队列"""
+        if new != TaskStatus.CANCELLED or self._syncing:
+            return
+        self._call_logged("取消任务失败", task.url, self.queue.cancel, task.url)
+        asyncio.get_event_loop().call_soon(self._record, task)
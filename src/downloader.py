@@ -1,12 +1,32 @@
-import yt_dlp
 import asyncio
-from typing import Optional, Callable, Dict, List
-from dataclasses import dataclass
+import time
+from collections import OrderedDict, deque
+from typing import Optional, Callable, Deque, Dict, List, Set, Tuple
 from enum import Enum
 from datetime import datetime
 from utils.config import AppConfig
 from utils.history import DownloadHistory, DownloadRecord
+from utils.metrics import DownloadMetrics
+from utils.profiler import profiled
+from utils.storage import DiskSpaceReserver, FileMover, InsufficientSpaceError
+from utils.throughput import ThroughputEstimator
+from utils.integrity import StreamHasher, file_digest, link_duplicate
+from utils.formats import InfoCache, fallback_selector, parse_target, resolve_format, video_then_audio
+from platforms.base import chunked
+from platforms.router import PlatformRouter
+from utils.ydl_pool import DownloaderPool
+from utils.logs import YtdlpLogger, log_manager
+from utils.proxy_pool import ProxyPool
+from utils.schedule import AdjustableLimit, BandwidthSchedule
+from utils.network import ErrorKind, HostCircuitBreaker, backoff_delay, classify_error, url_host
+from postprocessing import MediaValidator, PostProcessor, ValidationError
+import hashlib
+import logging
 import os
+import shutil
+import sqlite3
+
+logger = logging.getLogger(__name__)
 
 class TaskStatus(Enum):
     PENDING = "pending"
@@ -15,75 +35,317 @@ class TaskStatus(Enum):
     ERROR = "error"
     PAUSED = "paused"
     CANCELLED = "cancelled"
+    POSTPROCESSING = "postprocessing"
+
+class InvalidTransitionError(ValueError):
+    """非法的任务状态转换"""
+    pass
+
+# 合法的状态转换；结束状态没有出口，重新下载会创建新任务
+# 暂停只改变显示状态，不会中断正在进行的传输，因此暂停后仍可能直接完成或失败
+_TRANSITIONS = {
+    TaskStatus.PENDING: {TaskStatus.DOWNLOADING, TaskStatus.PAUSED, TaskStatus.CANCELLED, TaskStatus.ERROR},
+    TaskStatus.DOWNLOADING: {TaskStatus.PENDING, TaskStatus.PAUSED, TaskStatus.POSTPROCESSING,
+                             TaskStatus.COMPLETED, TaskStatus.ERROR, TaskStatus.CANCELLED},
+    TaskStatus.PAUSED: {TaskStatus.PENDING, TaskStatus.DOWNLOADING, TaskStatus.POSTPROCESSING,
+                        TaskStatus.COMPLETED, TaskStatus.ERROR, TaskStatus.CANCELLED},
+    TaskStatus.POSTPROCESSING: {TaskStatus.COMPLETED, TaskStatus.ERROR, TaskStatus.CANCELLED},
+    TaskStatus.COMPLETED: set(),
+    TaskStatus.ERROR: set(),
+    TaskStatus.CANCELLED: set(),
+}
+
+# 状态转换事件回调：(任务, 原状态, 新状态)；新建任务时原状态为None，移出内存时新状态为None
+TransitionListener = Callable[['DownloadTask', Optional[TaskStatus], Optional[TaskStatus]], None]
+
+class StatusCounter:
+    """按状态统计任务数，随转换事件增量更新"""
+    def __init__(self):
+        self.counts: Dict[TaskStatus, int] = {status: 0 for status in TaskStatus}
+        self.total = 0
+        
+    def __call__(self, task: 'DownloadTask', old: Optional[TaskStatus], new: Optional[TaskStatus]):
+        if old is None:
+            self.total += 1
+        else:
+            self.counts[old] -= 1
+        if new is None:
+            self.total -= 1
+        else:
+            self.counts[new] += 1
 
-@dataclass
 class DownloadTask:
-    url: str
-    save_path: str
-    status: TaskStatus = TaskStatus.PENDING
-    progress: float = 0
-    speed: str = ""
-    filename: str = ""
-    error_message: str = ""
-    start_time: Optional[datetime] = None
-    eta: str = ""
-    total_bytes: int = 0
-    downloaded_bytes: int = 0
-    cancel_event: asyncio.Event = None
-    
-    def __post_init__(self):
-        self.cancel_event = asyncio.Event()
+    """下载任务的实时状态
+
+    长时间运行时任务数量很大，使用 __slots__ 省去每个实例的 __dict__；
+    速度和剩余时间以数值保存，显示文本在读取时才格式化。
+    """
+    __slots__ = (
+        "url", "save_path", "status", "progress", "filename", "error_message", "start_time",
+        "total_bytes", "downloaded_bytes", "speed_bps", "eta_seconds", "note", "cancel_requested",
+        "extractor", "phase_timings", "queued_at", "transfer_started_at", "first_byte_at",
+        "finished_at", "stream_progress", "stream_count", "throttle_deferrals", "proxy",
+        "title", "throughput", "off_peak", "hashers", "expected_duration", "format_info",
+        "thumbnail_url", "paused_from",
+    )
+    
+    def __init__(self, url: str, save_path: str):
+        self.url = url
+        self.save_path = save_path
+        self.status = TaskStatus.PENDING
+        self.progress = 0.0
+        self.filename = ""
+        self.error_message = ""
+        self.start_time: Optional[datetime] = None
+        self.total_bytes = 0
+        self.downloaded_bytes = 0
+        self.speed_bps: Optional[float] = None  # None表示未开始，0表示计算中
+        self.eta_seconds: Optional[int] = None  # None表示不显示，负数表示计算中
+        self.note = ""  # 非空时代替速度显示，如"完成"、"合并中..."
+        self.cancel_requested = False
+        self.extractor = ""
+        # 阶段耗时统计（秒），时间点使用 time.monotonic()
+        self.phase_timings: Dict[str, float] = {}
+        self.queued_at = 0.0
+        self.transfer_started_at = 0.0
+        self.first_byte_at = 0.0
+        self.finished_at = 0.0
+        # 各个流的 [已下载字节, 总字节, 是否已完成]，按格式编号索引
+        self.stream_progress: Dict[str, list] = {}
+        self.stream_count = 1
+        self.throttle_deferrals = 0
+        self.proxy = ""
+        self.title = ""
+        self.throughput: Optional[ThroughputEstimator] = None  # 下载开始后创建，结束时释放
+        self.off_peak = False  # 只在闲时窗口内开始下载
+        self.hashers: Dict[str, StreamHasher] = {}  # 各个流的增量哈希，重试续传时保留
+        self.expected_duration: Optional[float] = None  # 元数据中的时长，用于校验
+        self.format_info = ""  # 选中的格式及选择理由
+        self.thumbnail_url = ""
+        self.paused_from: Optional[TaskStatus] = None  # 暂停前的实际状态，恢复时回到该状态
+    
+    @property
+    def speed(self) -> str:
+        if self.note:
+            return self.note
+        if self.speed_bps is None:
+            return ""
+        return f"{self.speed_bps/1024/1024:.1f} MB/s" if self.speed_bps > 0 else "计算中..."
+    
+    @property
+    def eta(self) -> str:
+        if self.eta_seconds is None:
+            return ""
+        if self.eta_seconds < 0:
+            return "计算中..."
+        minutes, seconds = divmod(self.eta_seconds, 60)
+        return f"{minutes}分{seconds}秒" if minutes else f"{seconds}秒"
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in (TaskStatus.COMPLETED, TaskStatus.CANCELLED, TaskStatus.ERROR)
 
 class VideoDownloader:
-    def __init__(self):
+    def __init__(self, history: Optional[DownloadHistory] = None, config: Optional[AppConfig] = None):
+        """history 默认为用户目录下的历史库；给出 config 时在创建后立即应用"""
         self.tasks: Dict[str, DownloadTask] = {}
-        self.history = DownloadHistory()
+        self.history = history if history is not None else DownloadHistory()
+        # 已结束的任务按结束顺序排列，超过保留数量后从内存移除，只保留在历史记录中
+        self.finished_task_retention = 1000
+        self._finished_tasks: 'OrderedDict[str, None]' = OrderedDict()
+        self._evicted: List[str] = []
+        
+        # 状态转换订阅者，状态栏等通过增量计数获取统计，无需遍历所有任务
+        self.listeners: List[TransitionListener] = []
+        self.status_counts = StatusCounter()
+        self.listeners.append(self.status_counts)
+        self.listeners.append(self._update_status_metrics)
         self.max_retries = 3
+        self.max_attempts = 20  # 续传有进展时不计重试次数，但总尝试次数有上限
+        self.max_throttle_deferrals = 5
+        self.breaker = HostCircuitBreaker()
+        self.ydl_pool = DownloaderPool()
+        self.proxies = ProxyPool()
         self.active_downloads = 0
+        self._running: Set[str] = set()  # 正在 _do_download 中执行的任务
         self.download_queue = asyncio.Queue()
-        self.download_semaphore = asyncio.Semaphore(3)
+        # 并发数和总限速由带宽计划按时间段调整，对正在进行的传输立即生效
+        self.download_semaphore = AdjustableLimit(3)
+        self.schedule = BandwidthSchedule()
+        self._off_peak_waiting: Deque[Tuple[str, str]] = deque()
+        # 分布式模式下由协调端把任务提交到共享队列，由工作节点执行（见 distributed.py）
+        self.coordinator = None
+        self.metrics = DownloadMetrics()
+        # 所有任务合计的下载速度，用于状态栏曲线和调度参考
+        self.bandwidth = ThroughputEstimator()
+        self.postprocessor = PostProcessor()
+        self.validator = MediaValidator()
+        self.validate_downloads = False
+        self.deduplicate_files = False
+        self.max_validation_redownloads = 2
+        self._validation_failures: Dict[str, int] = {}  # URL -> 校验失败后重新下载的次数
+        self.storage = DiskSpaceReserver()
+        self._size_estimate: Optional[int] = None  # 排队任务的预估大小，第一次使用时从历史记录取平均值
+        self.mover = FileMover()
+        self.staging_dir = ""  # 非空时先下载到本地暂存目录，完成后由后台搬运到保存路径
+        # 格式选择：目标清晰度和单个任务的字节预算（0表示不限制），解析结果缓存供下载阶段复用
+        self.format_target = parse_target("best")
+        self.max_task_bytes = 0
+        self.info_cache = InfoCache()
+        # 已知平台的URL直接指定yt-dlp提取器，不再逐个尝试所有提取器的URL规则
+        self.router = PlatformRouter()
         
         self.ydl_opts = {
-            'format': 'best',  # 使用最佳的单一格式，而不是分离的音视频
+            # 音视频分离时分别下载，合并放到独立的后处理阶段
+            'format': fallback_selector(self.format_target),
             'progress_hooks': [self._progress_hook],
             'outtmpl': '%(title)s.%(ext)s',
+            'continuedl': True,  # 重试时从 .part 文件的当前偏移续传
+            'logger': YtdlpLogger(),  # yt-dlp的输出写入日志，借出时按任务替换
         }
         
-        # 启动队列处理器
+        # 启动队列处理器和带宽计划
         asyncio.create_task(self._process_queue())
+        asyncio.create_task(self._schedule_loop())
+        if config is not None:
+            self.update_config(config)
         
     async def _process_queue(self):
         """处理下载队列"""
         while True:
             url, save_path = await self.download_queue.get()
+            self.metrics.set_gauge("download_queue_depth", self.download_queue.qsize())
+            
+            # 主机处于熔断期，延后调度，不占用槽位也不阻塞其他主机的任务
+            cooldown = self.breaker.remaining(url_host(url))
+            if cooldown:
+                self._defer(url, save_path, cooldown)
+                self.download_queue.task_done()
+                continue
             
-            async with self.download_semaphore:
+            # 仅闲时的任务在窗口打开前留在等待列表中
+            task = self.get_task(url)
+            if task and task.off_peak and not task.finished and not self.schedule.current().off_peak:
+                task.note = "等待闲时窗口"
+                self._off_peak_waiting.append((url, save_path))
+                self.download_queue.task_done()
+                continue
+            
+            # 占用一个网络槽位后在独立协程中运行，槽位在数据落盘后即释放
+            semaphore = self.download_semaphore
+            await semaphore.acquire()
+            asyncio.create_task(self._run_download(url, save_path, semaphore))
+            
+    async def _schedule_loop(self):
+        """按带宽计划定时切换限速和并发数"""
+        while True:
+            self._apply_schedule()
+            # 在下一个窗口边界之后醒来，最长一分钟检查一次
+            await asyncio.sleep(min(self.schedule.seconds_until_change() + 1, 60))
+    
+    def _apply_schedule(self) -> None:
+        """应用当前时间段的设置，闲时窗口打开时放出等待中的任务"""
+        state = self.schedule.current()
+        self.ydl_pool.set_ratelimit(state.speed_limit * 1024)
+        self.download_semaphore.set_limit(state.max_concurrent)
+        if not state.off_peak:
+            return
+        while self._off_peak_waiting:
+            url, save_path = self._off_peak_waiting.popleft()
+            task = self.get_task(url)
+            if task and not task.finished:
+                task.note = ""
+                self.download_queue.put_nowait((url, save_path))
+        self.metrics.set_gauge("download_queue_depth", self.download_queue.qsize())
+            
+    async def _run_download(self, url: str, save_path: str, semaphore: AdjustableLimit) -> None:
+        """运行单个任务并在结束时归还网络槽位"""
+        released = False
+        
+        def release_slot():
+            nonlocal released
+            if not released:
+                released = True
+                semaphore.release()
+                self.active_downloads -= 1
+                self.metrics.set_gauge("active_downloads", self.active_downloads)
+        
+        task = self.get_task(url)
+        if task and task.queued_at:
+            task.phase_timings["queue_wait"] = time.monotonic() - task.queued_at
+        self.active_downloads += 1
+        self.metrics.set_gauge("active_downloads", self.active_downloads)
+        self._running.add(url)
+        try:
+            await self._do_download(url, save_path, release_slot)
+        except Exception as e:
+            # 错误已在_do_download中处理
+            pass
+        finally:
+            self._running.discard(url)
+            release_slot()
+            self.storage.release(url)
+            # 限流延后等重新排队的任务继续按预估大小占用空间
+            if task and not task.finished:
                 try:
-                    await self._do_download(url, save_path)
-                except Exception as e:
-                    # 错误已在_do_download中处理
-                    pass
-                finally:
-                    self.download_queue.task_done()
+                    self._reserve_queued(task)
+                except InsufficientSpaceError:
+                    pass  # 开始下载时按实际大小再检查
+            self.download_queue.task_done()
                     
-    async def download(self, url: str, save_path: str) -> None:
-        """添加下载任务到队列"""
-        task = self.get_task(url) or self.add_task(url, save_path)
+    async def download(self, url: str, save_path: str, off_peak: bool = False) -> None:
+        """添加下载任务到队列，off_peak 为True时只在闲时窗口内开始"""
+        task = self.get_task(url)
+        if task and not task.finished:
+            return  # 已在队列中或正在下载
+        # 已结束的任务不能再转换状态，重新下载时创建新任务
+        task = self.add_task(url, save_path)
+        task.off_peak = off_peak
+        if self.coordinator:
+            self.coordinator.submit(task)
+            return
+        # 排队中的任务也按预估大小占用空间，队列很长时不会在开始下载后才发现磁盘不够
+        try:
+            self._reserve_queued(task)
+        except InsufficientSpaceError as e:
+            record = DownloadRecord(url=url, filename="", save_path=save_path, start_time=datetime.now())
+            self._finish(task, record, TaskStatus.ERROR, str(e))
+            return
+        except Exception as e:
+            # 意外错误不能让任务停在等待状态：按失败结束后继续抛出，由调用方看到
+            logger.exception("任务入队失败", extra={"url": url})
+            record = DownloadRecord(url=url, filename="", save_path=save_path, start_time=datetime.now())
+            self._finish(task, record, TaskStatus.ERROR, str(e))
+            raise
+        task.queued_at = time.monotonic()
         await self.download_queue.put((url, save_path))
+        self.metrics.set_gauge("download_queue_depth", self.download_queue.qsize())
+    
+    def _reserve_queued(self, task: DownloadTask) -> None:
+        """为排队中的任务预留预估大小，解析出格式后由 _reserve_space 换成实际大小
+
+        预估值为设置的单任务上限，没有上限时为最近完成的下载的平均大小。
+        """
+        if self.max_task_bytes:
+            size = self.max_task_bytes
+        else:
+            if self._size_estimate is None:
+                self._size_estimate = self.history.average_size()
+            size = self._size_estimate
+        self.storage.release(task.url)
+        self.storage.reserve(task.url, self._staging_path(task.url) or task.save_path, size)
+    
+    def _defer(self, url: str, save_path: str, delay: float) -> None:
+        """延后把任务放回队列"""
+        asyncio.get_event_loop().call_later(delay, self.download_queue.put_nowait, (url, save_path))
         
-    async def _do_download(self, url: str, save_path: str) -> None:
+    async def _do_download(self, url: str, save_path: str,
+                           release_slot: Optional[Callable[[], None]] = None) -> None:
         """实际的下载实现"""
         task = self.get_task(url)
-        if not task:
+        if not task or task.finished:
             return
-            
-        # 先列出可用格式
-        formats = await self.list_formats(url)
-        print("Available formats:")
-        for fmt in formats:
-            print(fmt)
         
-        task.status = TaskStatus.DOWNLOADING
         task.start_time = datetime.now()
         
         # 创建下载记录
@@ -91,162 +353,672 @@ class VideoDownloader:
             url=url,
             filename="",
             save_path=save_path,
-            start_time=task.start_time
+            start_time=task.start_time,
+            phase_timings=task.phase_timings
         )
         
-        retries = 0
+        # 先解析视频信息，缓存给第一次下载使用；解析和下载使用同一个代理，下载时才能命中按代理缓存的结果
+        task.proxy = self.proxies.acquire() or ""
+        held = True  # 当前是否持有 task.proxy，归还后下一次尝试重新分配
+        extract_started = time.monotonic()
+        try:
+            await self._extract_info(url, task.proxy or None)
+        except BaseException:
+            self.proxies.release(task.proxy)
+            raise
+        task.phase_timings["extraction"] = time.monotonic() - extract_started
+        
+        self._set_status(task, TaskStatus.DOWNLOADING)
+        logger.info("开始下载，保存到 %s", save_path, extra={"url": url})
+        
+        files: List[str] = []
+        host = url_host(url)
+        retries = attempts = 0
+        resume_offset = task.downloaded_bytes
         while retries < self.max_retries:
             try:
-                # 配置下载选项
-                opts = dict(self.ydl_opts)
-                opts['outtmpl'] = f"{save_path}/%(title)s.%(ext)s"
+                # 检查取消事件
+                if task.cancel_requested:
+                    if held:
+                        self.proxies.release(task.proxy)
+                    self._finish(task, record, TaskStatus.CANCELLED)
+                    return
                 
-                # 创建下载器实例
-                with yt_dlp.YoutubeDL(opts) as ydl:
-                    # 检查取消事件
-                    if task.cancel_event.is_set():
-                        task.status = TaskStatus.CANCELLED
-                        record.status = "cancelled"
-                        self.history.add_record(record)
-                        return
-                    
-                    # 开始下载
-                    await asyncio.get_event_loop().run_in_executor(
-                        None,
-                        lambda: ydl.download([url])
-                    )
-                    
-                    if not task.cancel_event.is_set():
-                        task.status = TaskStatus.COMPLETED
-                        record.status = "completed"
-                        record.filename = task.filename
-                        record.end_time = datetime.now()
-                        self.history.add_record(record)
-                        return
+                # 开始下载，第一次尝试沿用解析时分配的代理
+                task.transfer_started_at = time.monotonic()
+                task.first_byte_at = task.finished_at = 0
+                if not held:
+                    task.proxy = self.proxies.acquire() or ""
+                    held = True
+                files = await self._fetch_streams(url, save_path, task.proxy or None)
+                
+                held = False
+                if task.cancel_requested:
+                    self.proxies.release(task.proxy)
+                    self._finish(task, record, TaskStatus.CANCELLED)
+                    return
+                
+                self.breaker.record_success(host)
+                self._record_transfer_phases(task)
+                self.proxies.release(task.proxy, True, task.downloaded_bytes,
+                                     task.phase_timings.get("transfer", 0))
+                break
                     
             except asyncio.CancelledError:
-                task.status = TaskStatus.CANCELLED
-                record.status = "cancelled"
-                self.history.add_record(record)
+                if held:
+                    self.proxies.release(task.proxy)
+                self._finish(task, record, TaskStatus.CANCELLED)
                 raise
                 
             except Exception as e:
-                retries += 1
-                if retries >= self.max_retries:
-                    task.status = TaskStatus.ERROR
-                    task.error_message = str(e)
-                    record.status = "error"
-                    record.error_message = str(e)
-                    record.end_time = datetime.now()
-                    self.history.add_record(record)
+                kind = classify_error(e)
+                throttled = kind == ErrorKind.THROTTLED
+                self.proxies.release(task.proxy, False, throttled=throttled)
+                held = False
+                
+                # 限流可能只针对当前出口，换到另一个可用代理立即重试；新代理直接占用，下一次尝试沿用
+                if throttled and task.proxy and attempts < self.max_attempts:
+                    rotated = self.proxies.acquire()
+                    if rotated not in (None, task.proxy):
+                        attempts += 1
+                        self.metrics.inc("download_retries_total", kind="proxy_rotate")
+                        logger.warning("代理 %s 被限流，换到 %s 重试: %s", task.proxy, rotated, e, extra={"url": url})
+                        task.proxy, held = rotated, True
+                        continue
+                    self.proxies.release(rotated)
+                
+                # 主机限流：熔断该主机并把任务放回队列，不消耗重试次数
+                cooldown = self.breaker.record_failure(host, kind)
+                if cooldown is not None and task.throttle_deferrals < self.max_throttle_deferrals \
+                        and not task.cancel_requested:
+                    task.throttle_deferrals += 1
+                    self._set_status(task, TaskStatus.PENDING)
+                    task.note = "主机限流，等待中"
+                    task.eta_seconds = int(cooldown)
+                    self.metrics.inc("download_retries_total", kind=kind.value)
+                    logger.warning("主机 %s 限流，%.0f秒后重新排队: %s", host, cooldown, e, extra={"url": url})
+                    self._defer(url, save_path, cooldown)
+                    return
+                
+                # 瞬时错误且续传有进展时不消耗重试次数
+                attempts += 1
+                if kind == ErrorKind.TRANSIENT and task.downloaded_bytes > resume_offset:
+                    resume_offset = task.downloaded_bytes
+                else:
+                    retries += 1
+                if kind in (ErrorKind.EXTRACTOR, ErrorKind.DISK_FULL) or attempts >= self.max_attempts:
+                    retries = self.max_retries  # 重试无意义
+                    
+                if retries >= self.max_retries or task.cancel_requested:
+                    self.metrics.inc("download_errors_total", extractor=task.extractor or "unknown", kind=kind.value)
+                    self._finish(task, record, TaskStatus.ERROR, str(e))
                     raise
                 else:
-                    # 等待一段时间后重试
-                    await asyncio.sleep(2 ** retries)  # 指数退避
+                    # 带抖动的指数退避后重试，yt-dlp 从 .part 文件续传
+                    self.metrics.inc("download_retries_total", kind=kind.value)
+                    delay = backoff_delay(retries)
+                    logger.warning("下载出错(%s)，%.1f秒后重试: %s", kind.value, delay, e, extra={"url": url})
+                    await asyncio.sleep(delay)
                     continue
+        
+        # 数据已落盘，释放网络槽位后再进入后处理
+        if release_slot:
+            release_slot()
+        
+        output = files[0] if files else ""
+        if len(files) > 1 or self._staging_path(url):
+            self._set_status(task, TaskStatus.POSTPROCESSING)
+            task.eta_seconds = None
+            try:
+                if len(files) > 1:
+                    task.note = "合并中..."
+                    output = await self._postprocess(task, files)
+                if self._staging_path(url):
+                    task.note = "移动中..."
+                    output = await self._move_to_save_path(task, output, save_path)
+            except asyncio.CancelledError:
+                self._finish(task, record, TaskStatus.CANCELLED)
+                raise
+            except Exception as e:
+                self.metrics.inc("download_errors_total", extractor=task.extractor or "unknown", kind="postprocess")
+                self._finish(task, record, TaskStatus.ERROR, f"后处理失败: {e}")
+                raise
+            task.filename = os.path.basename(output)
+            task.note = "完成"
+        
+        try:
+            await self._verify_output(task, record, output)
+        except asyncio.CancelledError:
+            self._finish(task, record, TaskStatus.CANCELLED)
+            raise
+        except ValidationError as e:
+            self.metrics.inc("download_errors_total", extractor=task.extractor or "unknown", kind="validation")
+            self._redownload_corrupt(task, record, output, save_path, e)
+            return
+        except Exception as e:
+            self.metrics.inc("download_errors_total", extractor=task.extractor or "unknown", kind="postprocess")
+            self._finish(task, record, TaskStatus.ERROR, f"文件检查失败: {e}")
+            raise
+        
+        self._validation_failures.pop(url, None)
+        self._finish(task, record, TaskStatus.COMPLETED)
+    
+    async def _verify_output(self, task: DownloadTask, record: DownloadRecord, output: str) -> None:
+        """记录成品的哈希和大小，按配置用ffprobe校验并按哈希去重
+
+        单个流直接下载的文件使用下载过程中增量计算的哈希；合并生成的文件需要完整读取一次。
+        """
+        if not output:
+            return
+        loop = asyncio.get_event_loop()
+        started = time.monotonic()
+        hasher = next(iter(task.hashers.values()), None) if task.stream_count == 1 else None
+        digest_file = hasher.finalize if hasher else file_digest
+        record.content_hash, record.file_size = await loop.run_in_executor(None, digest_file, output)
+        task.hashers.clear()
+        task.phase_timings["hash"] = time.monotonic() - started
+        
+        if self.validate_downloads and self.validator.available:
+            self._set_status(task, TaskStatus.POSTPROCESSING)
+            task.note = "校验中..."
+            await self.validator.validate(output, task.expected_duration, task.phase_timings)
+            task.note = "完成"
+        
+        if self.deduplicate_files:
+            await loop.run_in_executor(None, self._deduplicate, task, record, output)
+    
+    def _deduplicate(self, task: DownloadTask, record: DownloadRecord, output: str) -> None:
+        """内容与已下载的文件相同时，把新文件替换为硬链接"""
+        for other in self.history.find_by_hash(record.content_hash):
+            existing = os.path.join(other.save_path, other.filename)
+            if not os.path.isfile(existing) or os.path.getsize(existing) != record.file_size:
+                continue
+            if link_duplicate(existing, output):
+                task.note = "完成(与已有文件相同)"
+                logger.info("内容与 %s 相同，已替换为硬链接", existing, extra={"url": task.url})
+                return
+    
+    def _redownload_corrupt(self, task: DownloadTask, record: DownloadRecord, output: str,
+                            save_path: str, error: Exception) -> None:
+        """删除校验失败的文件，次数未超限时重新加入下载队列"""
+        if os.path.exists(output):
+            os.remove(output)
+        failures = self._validation_failures.get(task.url, 0) + 1
+        if failures > self.max_validation_redownloads:
+            self._validation_failures.pop(task.url, None)
+            self._finish(task, record, TaskStatus.ERROR, f"文件校验失败: {error}")
+            return
+        self._validation_failures[task.url] = failures
+        self._finish(task, record, TaskStatus.ERROR, f"文件校验失败，已重新加入队列: {error}")
+        asyncio.create_task(self.download(task.url, save_path, task.off_peak))
+    
+    def _set_status(self, task: DownloadTask, status: TaskStatus) -> bool:
+        """校验并执行状态转换，通知订阅者"""
+        old = task.status
+        if old == status:
+            return False
+        if status not in _TRANSITIONS[old]:
+            if task.cancel_requested:
+                return False  # 用户取消优先，忽略引擎随后的状态更新
+            raise InvalidTransitionError(f"任务状态不能从 {old.value} 变为 {status.value}")
+        task.status = status
+        self._emit(task, old, status)
+        return True
+    
+    def _emit(self, task: DownloadTask, old: Optional[TaskStatus], new: Optional[TaskStatus]) -> None:
+        for listener in self.listeners:
+            listener(task, old, new)
+    
+    def _update_status_metrics(self, task: DownloadTask, old: Optional[TaskStatus],
+                               new: Optional[TaskStatus]) -> None:
+        for status in (old, new):
+            if status is not None:
+                self.metrics.set_gauge("tasks", self.status_counts.counts[status], status=status.value)
+    
+    def _finish(self, task: DownloadTask, record: DownloadRecord, status: TaskStatus,
+                error_message: str = "") -> None:
+        """把任务转入结束状态并写入历史记录，用户已取消的任务一律按取消记录"""
+        if task.cancel_requested:
+            status = TaskStatus.CANCELLED
+        self._set_status(task, status)
+        record.status = status.value
+        record.filename = task.filename
+        record.format_info = task.format_info
+        record.thumbnail_url = task.thumbnail_url
+        # 解析前就失败的任务按路由表推断提取器
+        record.extractor = task.extractor or self.router.ie_key(task.url) or ""
+        record.end_time = datetime.now()
+        if error_message:
+            task.error_message = record.error_message = error_message
+        if status == TaskStatus.ERROR:
+            logger.error("下载失败: %s", task.error_message, extra={"url": task.url})
+        else:
+            logger.info("任务结束: %s", status.value, extra={"url": task.url})
+        task.throughput = None  # 结束的任务不再需要速度缓冲和增量哈希
+        task.hashers.clear()
+        self.storage.release(task.url)
+        if status == TaskStatus.COMPLETED and record.file_size and self._size_estimate is not None:
+            # 排队任务的预估大小按完成的下载滑动平均
+            self._size_estimate = int(self._size_estimate * 0.9 + record.file_size * 0.1)
+        staging_path = self._staging_path(task.url)
+        if status != TaskStatus.COMPLETED and staging_path and os.path.isdir(staging_path):
+            # 失败或取消的任务不会再续传，删除暂存子目录中的残留文件
+            asyncio.get_event_loop().run_in_executor(None, shutil.rmtree, staging_path, True)
+        self._save_record(task, record)
+    
+    def _task_opts(self, proxy: Optional[str]) -> dict:
+        """本次下载使用的选项，代理按任务分配"""
+        return dict(self.ydl_opts, proxy=proxy) if proxy else self.ydl_opts
+    
+    async def _fetch_streams(self, url: str, save_path: str, proxy: Optional[str] = None) -> List[str]:
+        """下载阶段：选择格式后逐个下载选中的流，返回落盘的文件路径
+
+        使用同一代理缓存的解析结果，没有时重新解析。格式由 resolve_format 按目标清晰度和字节预算选择，
+        无法选择时使用yt-dlp按等价选择器选中的格式。选中音视频分离的格式时，每个流的信息单独交给
+        process_info 并行下载，yt-dlp不会在下载调用中合并；已完成的流在重试时会被yt-dlp识别为已下载而跳过。
+        YoutubeDL 实例从池中借用。
+        """
+        loop = asyncio.get_event_loop()
+        write_dir = self._staging_path(url) or save_path
+        outtmpl = f"{write_dir}/%(title)s.%(ext)s"
+        opts = self._task_opts(proxy)
+        info = self.info_cache.pop(url, proxy)
+        ydl_logger = YtdlpLogger(url)
+        with self.ydl_pool.acquire(opts, outtmpl, ydl_logger) as ydl:
+            if info is None:
+                ie_key = self.router.ie_key(url)
+                info = await loop.run_in_executor(None, lambda: ydl.extract_info(url, download=False, ie_key=ie_key))
+            merged_name = os.path.basename(ydl.prepare_filename(info))
+        
+        task = self.get_task(url)
+        decision = resolve_format(info.get('formats') or [], self.format_target,
+                                  info.get('duration'), self.max_task_bytes)
+        if decision:
+            streams = decision.formats
+            task.format_info = f"{decision.selector}: {decision.reason}"
+        else:
+            streams = info.get('requested_formats') or [info]
+            task.format_info = f"由yt-dlp选择: {info.get('format_id') or opts['format']}"
+            if len(streams) > 1:
+                # 合并要求视频在前、音频在后；分不出时整体交给yt-dlp下载并合并
+                streams = video_then_audio(streams) or [info]
+        logger.info("选择格式 %s", task.format_info, extra={"url": url})
+        self._reserve_space(url, streams, write_dir, save_path)
+        task.title = info.get('title') or ""
+        task.extractor = info.get('extractor_key') or task.extractor
+        task.thumbnail_url = task.thumbnail_url or info.get('thumbnail') or ""
+        task.expected_duration = info.get('duration')
+        task.stream_count = len(streams)
+        task.stream_progress.clear()
+        if task.throughput is None:
+            task.throughput = ThroughputEstimator()
+        if len(streams) > 1:
+            task.filename = merged_name
+        
+        def fetch(stream) -> str:
+            stream_info = dict(info)
+            stream_outtmpl = outtmpl
+            if stream is not info:
+                # 只下载这一个流，去掉yt-dlp自己选中的格式组合
+                stream_info.pop('requested_formats', None)
+                stream_info.pop('requested_downloads', None)
+                stream_info.update(stream)
+            if len(streams) > 1:
+                stream_outtmpl = f"{write_dir}/%(title)s.f%(format_id)s.%(ext)s"
+            with self.ydl_pool.acquire(opts, stream_outtmpl, ydl_logger, transfer=True) as ydl:
+                ydl.process_info(stream_info)
+                return stream_info.get('filepath') or ydl.prepare_filename(stream_info)
+        
+        # 视频流和音频流并行下载，等两者都结束后才进入合并
+        results = await asyncio.gather(
+            *(loop.run_in_executor(None, fetch, stream) for stream in streams),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return list(results)
+    
+    def _staging_path(self, url: str) -> str:
+        """任务在暂存目录中的子目录，未启用暂存时返回空字符串"""
+        if not self.staging_dir:
+            return ""
+        return os.path.join(self.staging_dir, hashlib.sha1(url.encode("utf-8")).hexdigest()[:16])
+    
+    def _reserve_space(self, url: str, streams: List[dict], write_dir: str, save_path: str) -> None:
+        """根据元数据中的文件大小预留磁盘空间
+
+        合并时分段文件和合并结果会同时存在，写入目录按两倍预留；启用暂存时保存路径再预留一份。
+        """
+        size = sum(s.get('filesize') or s.get('filesize_approx') or 0 for s in streams)
+        self.storage.release(url)
+        self.storage.reserve(url, write_dir, size * 2 if len(streams) > 1 else size)
+        if write_dir != save_path:
+            self.storage.reserve(url, save_path, size)
+    
+    async def _move_to_save_path(self, task: DownloadTask, path: str, save_path: str) -> str:
+        """把暂存目录中的成品搬运到保存路径"""
+        staging_path = os.path.dirname(path)
+        self.storage.release(task.url, staging_path)
+        started = time.monotonic()
+        dest = await self.mover.move(path, save_path)
+        task.phase_timings["move"] = time.monotonic() - started
+        try:
+            os.rmdir(staging_path)
+        except OSError:
+            pass
+        return dest
+    
+    async def _postprocess(self, task: DownloadTask, files: List[str]) -> str:
+        """后处理阶段：合并音视频，受CPU并发数限制；_fetch_streams 已把视频流排在前面"""
+        video_path, audio_path = files[0], files[1]
+        return await self.postprocessor.merge(video_path, audio_path, timings=task.phase_timings)
+    
+    def _record_transfer_phases(self, task: DownloadTask) -> None:
+        """根据进度回调记录的时间点计算首字节和传输耗时"""
+        now = time.monotonic()
+        if not task.first_byte_at:
+            return
+        task.phase_timings["first_byte"] = task.first_byte_at - task.transfer_started_at
+        finished_at = task.finished_at or now
+        transfer = finished_at - task.first_byte_at
+        task.phase_timings["transfer"] = transfer
+        
+        self.metrics.inc("downloaded_bytes_total", task.downloaded_bytes)
+        if transfer > 0 and task.downloaded_bytes:
+            self.metrics.observe("download_speed_bytes_per_second", task.downloaded_bytes / transfer)
+    
+    def _save_record(self, task: DownloadTask, record: DownloadRecord) -> None:
+        """写入历史记录并汇总指标
+
+        历史写入耗时在写入之后才能得到，因此只计入任务和指标，不写入本条记录。
+        """
+        record.phase_timings = dict(task.phase_timings)
+        write_started = time.monotonic()
+        try:
+            self.history.add_record(record)
+        except sqlite3.Error as e:
+            # 数据库被其他连接长时间锁住（如另一进程在整理历史库）时放弃这条记录，任务照常结束
+            logger.error("写入历史记录失败: %s", e, extra={"url": task.url})
+        task.phase_timings["history_write"] = time.monotonic() - write_started
+        
+        self.metrics.inc("downloads_total", status=record.status)
+        self.metrics.observe_phases(task.phase_timings)
+        self._retire(task)
+    
+    def _retire(self, task: DownloadTask) -> None:
+        """记录已结束的任务，超过保留数量时把最早结束的任务移出内存"""
+        self._finished_tasks.pop(task.url, None)
+        self._finished_tasks[task.url] = None
+        while len(self._finished_tasks) > self.finished_task_retention:
+            url, _ = self._finished_tasks.popitem(last=False)
+            evicted = self.tasks.get(url)
+            # 重新下载中的任务不移除
+            if evicted and evicted.finished:
+                del self.tasks[url]
+                self._evicted.append(url)
+                log_manager.task_logs.discard(url)
+                self._emit(evicted, evicted.status, None)
+    
+    def take_evicted(self) -> List[str]:
+        """取出自上次调用以来被移出内存的任务URL，供界面删除对应行"""
+        evicted, self._evicted = self._evicted, []
+        return evicted
     
     def add_task(self, url: str, save_path: str) -> DownloadTask:
         """添加下载任务到队列"""
         task = DownloadTask(url=url, save_path=save_path)
+        task.thumbnail_url = self.router.thumbnail_url(url)
+        old = self.tasks.get(url)
+        if old:
+            self._emit(old, old.status, None)
         self.tasks[url] = task
+        self._emit(task, None, task.status)
         return task
     
     def get_task(self, url: str) -> Optional[DownloadTask]:
         """获取指定任务信息"""
         return self.tasks.get(url)
     
-    def pause_task(self, url: str) -> None:
-        """暂停下载任务"""
-        if url in self.tasks:
-            self.tasks[url].status = TaskStatus.PAUSED
+    def pause_task(self, url: str) -> bool:
+        """暂停下载任务，状态不允许时返回False"""
+        task = self.tasks.get(url)
+        if not task:
+            return False
+        old = task.status
+        if not self._request_transition(url, TaskStatus.PAUSED):
+            return False
+        task.paused_from = old
+        return True
     
-    def resume_task(self, url: str) -> None:
-        """恢复下载任务"""
-        if url in self.tasks:
-            self.tasks[url].status = TaskStatus.PENDING
+    def resume_task(self, url: str) -> bool:
+        """恢复下载任务，只有暂停中的任务可以恢复
+
+        暂停只改变显示状态，恢复时回到暂停前的实际状态：传输中的任务回到下载中，排队中的回到等待。
+        """
+        task = self.tasks.get(url)
+        if not task or task.status != TaskStatus.PAUSED:
+            return False
+        status, task.paused_from = task.paused_from or TaskStatus.PENDING, None
+        return self._request_transition(url, status)
     
-    def cancel_task(self, url: str) -> None:
+    def cancel_task(self, url: str) -> bool:
         """取消下载任务"""
-        if url in self.tasks:
-            task = self.tasks[url]
-            task.cancel_event.set()
-            task.status = TaskStatus.CANCELLED
+        task = self.tasks.get(url)
+        if not task or task.finished:
+            return False
+        task.cancel_requested = True
+        if not self._set_status(task, TaskStatus.CANCELLED):
+            return False
+        if url not in self._running and not self.coordinator:
+            # 排队、延后重试或等待闲时窗口中的任务不会再被执行，在这里写入历史记录；
+            # 执行中的任务由 _do_download 在下一个检查点记录，分布式模式由协调端记录
+            record = DownloadRecord(url=url, filename="", save_path=task.save_path,
+                                    start_time=task.start_time or datetime.now(),
+                                    phase_timings=task.phase_timings)
+            self._finish(task, record, TaskStatus.CANCELLED)
+        return True
+    
+    def _request_transition(self, url: str, status: TaskStatus) -> bool:
+        """界面发起的状态转换，非法转换被拒绝"""
+        task = self.tasks.get(url)
+        if not task:
+            return False
+        try:
+            return self._set_status(task, status)
+        except InvalidTransitionError:
+            return False
     
     def update_config(self, config: 'AppConfig'):
         """更新下载器配置"""
+        self.router.configure(config)
+        
+        # 格式由 resolve_format 选择，yt-dlp的选择器只在元数据没有格式列表时生效
+        self.format_target = parse_target(config.preferred_format)
+        self.max_task_bytes = config.max_task_size_mb * 1024 * 1024
         self.ydl_opts.update({
-            'format': config.preferred_format,
-            'ratelimit': config.download_speed_limit * 1024 if config.download_speed_limit > 0 else None,
+            # 音视频分离的流分别下载，合并在后处理阶段完成
+            'format': fallback_selector(self.format_target),
         })
         
-        if config.enable_proxy:
-            self.ydl_opts['proxy'] = config.proxy_url
-        else:
-            self.ydl_opts.pop('proxy', None)
+        # 代理由代理池按任务分配
+        self.ydl_opts.pop('proxy', None)
+        self.proxies.probe_url = config.proxy_probe_url
+        self.proxies.set_proxies([config.proxy_url] + config.proxy_pool if config.enable_proxy else [])
+            
+        # 选项变化后旧实例不再匹配，直接关闭
+        self.ydl_pool.clear()
             
-        # 更���并发数限制
-        self.download_semaphore = asyncio.Semaphore(config.max_concurrent_downloads)
+        # 限速和并发数按带宽计划生效，全局设置作为计划外时间的默认值
+        self.schedule = BandwidthSchedule.from_config(config)
+        self._apply_schedule()
+        self.postprocessor.set_max_workers(config.max_concurrent_postprocess)
+        
+        # 内存中保留的已结束任务数
+        self.finished_task_retention = config.finished_task_retention
+        
+        # 完整性校验与去重
+        self.validate_downloads = config.validate_downloads
+        self.deduplicate_files = config.deduplicate_files
+        
+        # 磁盘空间与暂存目录
+        self.storage.min_free_bytes = config.min_free_space_mb * 1024 * 1024
+        self.staging_dir = config.staging_dir
+        
+        # 指标服务
+        asyncio.create_task(self.metrics.serve(config.metrics_port))
     
+    @profiled("downloader._progress_hook")
     def _progress_hook(self, d):
-        """处理下载进度回调"""
+        """处理下载进度回调
+
+        音视频分离的任务会有两个流同时回调，按格式编号分别记录后汇总成一行进度。
+        """
+        url = d['info_dict']['webpage_url']
+        task = self.tasks.get(url)
+        if not task:
+            return
+        stream_id = d['info_dict'].get('format_id', '')
+        
         if d['status'] == 'downloading':
-            url = d['info_dict']['webpage_url']
-            if url in self.tasks:
-                task = self.tasks[url]
-                
-                # 更新下载进度
-                if 'total_bytes' in d:
-                    task.total_bytes = d['total_bytes']
-                    task.downloaded_bytes = d['downloaded_bytes']
-                    task.progress = (d['downloaded_bytes'] / d['total_bytes']) * 100
-                elif 'total_bytes_estimate' in d:
-                    task.total_bytes = d['total_bytes_estimate']
-                    task.downloaded_bytes = d['downloaded_bytes']
-                    task.progress = (d['downloaded_bytes'] / d['total_bytes_estimate']) * 100
-                
-                # 更新下载速度
-                if 'speed' in d and d['speed']:
-                    task.speed = f"{d['speed']/1024/1024:.1f} MB/s"
-                else:
-                    task.speed = "计算中..."
-                
-                # 更新预计剩余时间
-                if 'eta' in d and d['eta']:
-                    task.eta = f"{d['eta']//60}分{d['eta']%60}秒"
-                else:
-                    task.eta = "计算中..."
+            if not task.first_byte_at and d.get('downloaded_bytes'):
+                task.first_byte_at = time.monotonic()
+            task.extractor = d['info_dict'].get('extractor_key', task.extractor)
+            
+            total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+            downloaded = d.get('downloaded_bytes', 0)
+            self._count_bytes(task, stream_id, downloaded)
+            self._hash_progress(task, stream_id, d.get('tmpfilename') or d.get('filename'), downloaded)
+            task.stream_progress[stream_id] = [downloaded, total, False]
+            self._update_combined_progress(task)
+            
+            # 更新文件名
+            if 'filename' in d and task.stream_count == 1:
+                task.filename = os.path.basename(d['filename'])
                 
-                # 更新文件名
-                if 'filename' in d:
-                    task.filename = os.path.basename(d['filename'])
-                    
         elif d['status'] == 'finished':
-            url = d['info_dict']['webpage_url']
-            if url in self.tasks:
-                task = self.tasks[url]
-                task.progress = 100
-                task.speed = "完成"
-                task.eta = "0秒"
-                if 'filename' in d:
-                    task.filename = os.path.basename(d['filename'])
+            size = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+            self._count_bytes(task, stream_id, size)
+            # finished 回调时 .part 已改名为成品，读完剩余部分
+            self._hash_progress(task, stream_id, d.get('filename'), size, force=True)
+            task.stream_progress[stream_id] = [size, size, True]
+            # 所有流都结束才算完成，另一个流可能已经在回调进度但还没有下载完
+            if len(task.stream_progress) < task.stream_count or \
+                    not all(p[2] for p in task.stream_progress.values()):
+                self._update_combined_progress(task)
+                return
+            
+            task.finished_at = time.monotonic()
+            task.downloaded_bytes = task.total_bytes = sum(p[1] for p in task.stream_progress.values())
+            task.progress = 100
+            task.note = "完成"
+            task.eta_seconds = 0
+            if 'filename' in d and task.stream_count == 1:
+                task.filename = os.path.basename(d['filename'])
     
-    async def list_formats(self, url: str) -> List[str]:
-        """列出视频可用的格式"""
-        formats = []
-        opts = dict(self.ydl_opts)
-        opts['listformats'] = True
+    def _hash_progress(self, task: DownloadTask, stream_id: str, path: Optional[str], size: int,
+                       force: bool = False) -> None:
+        """随写入进度增量计算流的哈希"""
+        if not path:
+            return
+        hasher = task.hashers.get(stream_id)
+        if hasher is None:
+            hasher = task.hashers[stream_id] = StreamHasher()
+        hasher.advance(path, size, force)
+    
+    def _count_bytes(self, task: DownloadTask, stream_id: str, downloaded: int) -> None:
+        """把流新增的字节计入任务和全局吞吐估计
+
+        每个流的第一次回调只作为基准，续传时已存在的部分不算作本次吞吐。
+        """
+        previous = task.stream_progress.get(stream_id)
+        if previous is None or task.throughput is None:
+            return
+        delta = downloaded - previous[0]
+        task.throughput.add(delta)
+        self.bandwidth.add(delta)
+    
+    def _update_combined_progress(self, task: DownloadTask) -> None:
+        """汇总各个流的字节数，速度和剩余时间取平滑后的估计值"""
+        streams = list(task.stream_progress.values())
+        downloaded = sum(p[0] for p in streams)
+        total = sum(p[1] for p in streams)
+        
+        # 更新下载进度
+        task.downloaded_bytes = downloaded
+        if total and len(streams) >= task.stream_count:
+            task.total_bytes = total
+            task.progress = min(downloaded / total * 100, 100)
         
-        with yt_dlp.YoutubeDL(opts) as ydl:
+        task.note = ""
+        self._update_speed(task)
+    
+    def _update_speed(self, task: DownloadTask, now: Optional[float] = None) -> None:
+        """按平滑后的速度更新任务的速度和预计剩余时间"""
+        speed = task.throughput.rate(now) if task.throughput else 0
+        task.speed_bps = speed
+        eta = None
+        if speed > 0 and task.total_bytes:
+            eta = int(max(task.total_bytes - task.downloaded_bytes, 0) / speed)
+        task.eta_seconds = -1 if eta is None else eta
+    
+    def refresh_speeds(self) -> None:
+        """由界面定时调用：没有新数据的时间片按0计入，传输停滞时速度逐渐下降、剩余时间随之变长
+
+        进度回调只在收到数据时触发，不刷新的话停滞的任务会一直显示最后的速度。
+        """
+        now = time.monotonic()
+        for url in self._running:
+            task = self.tasks.get(url)
+            if task and task.status == TaskStatus.DOWNLOADING and task.throughput and task.first_byte_at \
+                    and not task.note:
+                self._update_speed(task, now)
+    
+    async def _extract_info(self, url: str, proxy: Optional[str]) -> Optional[dict]:
+        """解析视频信息并缓存，失败时返回None，由下载阶段重新解析并按重试处理"""
+        ie_key = self.router.ie_key(url)
+        with self.ydl_pool.acquire(self._task_opts(proxy), logger=YtdlpLogger(url)) as ydl:
             try:
                 info = await asyncio.get_event_loop().run_in_executor(
                     None,
-                    lambda: ydl.extract_info(url, download=False)
+                    lambda: ydl.extract_info(url, download=False, ie_key=ie_key)
                 )
-                if info and 'formats' in info:
-                    for f in info['formats']:
-                        format_str = f"{f.get('format_id', 'N/A')} - {f.get('format', 'Unknown')}"
-                        formats.append(format_str)
             except Exception as e:
-                print(f"获取格式列表失败: {e}")
-        
+                logger.warning("解析视频信息失败: %s", e, extra={"url": url})
+                return None
+        if info:
+            self.info_cache.put(url, proxy, info)
+        return info
+    
+    async def prefetch_metadata(self, urls: List[str]) -> None:
+        """通过平台的批量接口提前获取任务标题，没有批量接口的平台跳过"""
+        loop = asyncio.get_event_loop()
+        for adapter, ids in self.router.group(urls).items():
+            if not adapter.max_batch:
+                continue
+            for batch in chunked(list(ids), adapter.max_batch):
+                with self.ydl_pool.acquire(self._task_opts(self.proxies.choose())) as ydl:
+                    try:
+                        metadata = await loop.run_in_executor(None, adapter.fetch_metadata, ydl, batch)
+                    except Exception as e:
+                        logger.warning("批量获取视频信息失败(%s): %s", adapter.name, e)
+                        break
+                for video_id, fields in metadata.items():
+                    task = self.get_task(ids.get(video_id, ""))
+                    if task and not task.title:
+                        task.title = fields.get("title") or ""
+    
+    def urlopen(self, url: str) -> bytes:
+        """通过池中的 YoutubeDL 实例请求一个地址并返回内容，沿用代理设置；会阻塞，在线程池中调用"""
+        with self.ydl_pool.acquire(self._task_opts(self.proxies.choose())) as ydl:
+            return ydl.urlopen(url).read()
+    
+    async def list_formats(self, url: str) -> List[str]:
+        """列出视频可用的格式，解析结果同样缓存给之后的下载"""
+        formats = []
+        info = await self._extract_info(url, self.proxies.choose())
+        if info and 'formats' in info:
+            for f in info['formats']:
+                format_str = f"{f.get('format_id', 'N/A')} - {f.get('format', 'Unknown')}"
+                formats.append(format_str)
         return formats
\ No newline at end of file
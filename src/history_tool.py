@@ -0,0 +1,41 @@
+import argparse
+from datetime import datetime, timedelta
+from utils.analytics import build_report
+from utils.history import DownloadHistory
+from utils.history_export import EXPORT_FORMATS, export_history
+
+def main():
+    parser = argparse.ArgumentParser(description="导出、统计和归档下载历史")
+    parser.add_argument("--db", default=None, help="历史数据库路径，默认 ~/.video_downloader/history.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="流式导出全部历史记录")
+    export.add_argument("path", help="输出文件，jsonl格式以 .gz 结尾时压缩")
+    export.add_argument("--format", choices=EXPORT_FORMATS, default="jsonl")
+    export.add_argument("--days", type=int, default=0, help="只导出最近几天，0表示全部")
+    export.add_argument("--no-archive", action="store_true", help="不包含归档库中的记录")
+
+    stats = commands.add_parser("stats", help="输出每天各主机下载量、各提取器成功率和完成耗时")
+    stats.add_argument("--days", type=int, default=30, help="统计最近几天，0表示全部")
+    stats.add_argument("--no-archive", action="store_true", help="不包含归档库中的记录")
+
+    archive = commands.add_parser("archive", help="把较早的已结束记录移到归档库")
+    archive.add_argument("--older-than", type=int, required=True, help="归档多少天之前的记录")
+
+    args = parser.parse_args()
+    history = DownloadHistory(args.db)
+
+    if args.command == "export":
+        since = datetime.now() - timedelta(days=args.days) if args.days else None
+        count = export_history(history, args.path, args.format, since=since,
+                               include_archive=not args.no_archive)
+        print(f"已导出 {count} 条记录到 {args.path}")
+    elif args.command == "stats":
+        since = datetime.now() - timedelta(days=args.days) if args.days else None
+        print(build_report(history, since, include_archive=not args.no_archive))
+    else:
+        moved = history.archive(datetime.now() - timedelta(days=args.older_than))
+        print(f"已归档 {moved} 条记录到 {history.archive_path}")
+
+if __name__ == '__main__':
+    main()
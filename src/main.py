@@ -1,14 +1,52 @@
 import sys
 import asyncio
+import logging
+from datetime import datetime, timedelta
 from PyQt6.QtWidgets import QApplication
 from ui.main_window import MainWindow
 from downloader import VideoDownloader
+from utils.config import AppConfig
+from utils.work_queue import SharedQueue
+from distributed import Coordinator
+from utils.profiler import profiler
+from utils.logs import log_manager
+
+logger = logging.getLogger(__name__)
+
+def _log_archive_result(future: asyncio.Future):
+    """启动时归档的结果只写日志，失败不影响运行"""
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error:
+        logger.error("归档历史记录失败: %s", error)
+    elif future.result():
+        logger.info("已归档 %d 条历史记录", future.result())
 
 async def main():
     app = QApplication(sys.argv)
     
-    # 创建下载器实例
-    downloader = VideoDownloader()
+    # 日志写入后台线程，界面线程只入队
+    config = AppConfig.load()
+    log_manager.start(config.log_level, config.log_component_levels, config.log_max_mb, config.log_backups)
+    
+    # 创建下载器实例，应用配置文件中的设置（带宽计划、并发数、代理、暂存目录、格式等）
+    downloader = VideoDownloader(config=config)
+    
+    # 较早的历史记录移到归档库，保持主库小巧；在线程池中进行，不阻塞启动
+    if config.history_archive_days:
+        cutoff = datetime.now() - timedelta(days=config.history_archive_days)
+        archived = asyncio.get_event_loop().run_in_executor(None, downloader.history.archive, cutoff)
+        archived.add_done_callback(_log_archive_result)
+    
+    # 分布式模式：本进程只作为协调端
+    if config.distributed_queue:
+        coordinator = Coordinator(downloader, SharedQueue(config.distributed_queue))
+        asyncio.create_task(coordinator.run())
+    
+    # 性能分析模式
+    if config.enable_profiling or profiler.env_enabled():
+        profiler.start(config.profiling_slow_callback_ms, config.profiling_trace_memory)
     
     # 创建主窗口
     window = MainWindow(downloader)
@@ -23,4 +61,6 @@ if __name__ == '__main__':
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
-        sys.exit(0) 
\ No newline at end of file
+        sys.exit(0)
+    finally:
+        log_manager.stop() 
\ No newline at end of file
@@ -0,0 +1,49 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Pattern, Tuple
+
+class PlatformAdapter:
+    """平台适配器基类
+
+    子类声明平台的主机名和视频ID的匹配规则，由 PlatformRouter 预先编译成按主机名索引的路由表；
+    ie_key 为对应的yt-dlp提取器，解析时直接指定，不再逐个尝试所有提取器的URL规则。
+    平台有批量查询接口时实现 fetch_metadata，批量任务可以提前拿到标题等信息。
+    """
+    name = ""
+    ie_key = ""
+    # 主机名 -> 从路径开头匹配 "路径?查询串" 的正则，第一个分组为视频ID
+    routes: Dict[str, str] = {}
+    max_batch = 0  # fetch_metadata 单次最多查询的ID数，0表示不支持批量查询
+
+    def compiled_routes(self) -> List[Tuple[str, Pattern]]:
+        return [(host, re.compile(pattern)) for host, pattern in self.routes.items()]
+
+    def configure(self, config) -> None:
+        """应用设置，默认无需设置"""
+
+    def thumbnail_url(self, video_id: str) -> str:
+        """不解析就能确定的缩略图地址，没有时返回空字符串，等解析后使用元数据中的地址"""
+        return ""
+
+    def fetch_metadata(self, ydl: Any, video_ids: List[str]) -> Dict[str, dict]:
+        """批量查询视频信息，返回 {视频ID: {"title": ..., "duration": ...}}
+
+        ydl 为从池中借出的 YoutubeDL 实例，通过它的 urlopen 发请求以沿用代理和Cookie设置。
+        在线程池中调用，不支持时返回空字典。
+        """
+        return {}
+
+@dataclass(frozen=True)
+class Route:
+    """URL的分类结果"""
+    adapter: PlatformAdapter
+    video_id: str
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        """同一视频的不同URL形式得到相同的键"""
+        return self.adapter.name, self.video_id
+
+def chunked(items: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
@@ -0,0 +1,16 @@
+from platforms.base import PlatformAdapter
+
+_VIDEO = r"/video/(BV[0-9A-Za-z]{10}|av\d+)(?=$|[/?#])"
+
+class BilibiliAdapter(PlatformAdapter):
+    """哔哩哔哩视频页（BV号和av号）
+
+    b23.tv 短链接需要先跳转才能知道视频ID，m.bilibili.com 不被 BiliBili 提取器接受，
+    两者都不在路由表中，仍由yt-dlp自行识别。
+    """
+    name = "bilibili"
+    ie_key = "BiliBili"
+    routes = {
+        "bilibili.com": _VIDEO,
+        "www.bilibili.com": _VIDEO,
+    }
@@ -0,0 +1,78 @@
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+from yt_dlp.extractor import get_info_extractor
+
+from platforms.base import PlatformAdapter, Route
+from platforms.bilibili import BilibiliAdapter
+from platforms.youtube import YouTubeAdapter
+
+def default_adapters() -> List[PlatformAdapter]:
+    return [YouTubeAdapter(), BilibiliAdapter()]
+
+class PlatformRouter:
+    """预编译的URL到平台适配器的路由表
+
+    按主机名直接查表，每个主机只有一条预编译的正则，分类一个URL只需一次字典查找和一次匹配，
+    不随支持的平台数增长。不在表中的URL返回None，交给yt-dlp按完整的提取器列表识别。
+    """
+    def __init__(self, adapters: Optional[List[PlatformAdapter]] = None):
+        self.adapters = adapters if adapters is not None else default_adapters()
+        self._routes: Dict[str, Tuple[PlatformAdapter, Pattern]] = {}
+        self._extractors: Dict[str, type] = {}  # ie_key -> yt-dlp提取器类，首次使用时加载
+        for adapter in self.adapters:
+            for host, pattern in adapter.compiled_routes():
+                self._routes[host] = (adapter, pattern)
+
+    def configure(self, config) -> None:
+        for adapter in self.adapters:
+            adapter.configure(config)
+
+    def classify(self, url: str) -> Optional[Route]:
+        # 比 urlparse 轻量：只切出主机名和之后的部分
+        scheme, sep, rest = url.partition("://")
+        if not sep:
+            return None
+        slash = rest.find("/")
+        if slash < 0:
+            return None
+        host = rest[:slash].rpartition("@")[2].partition(":")[0].lower()
+        entry = self._routes.get(host)
+        if entry is None:
+            return None
+        adapter, pattern = entry
+        match = pattern.match(rest, slash)
+        return Route(adapter, match.group(1)) if match else None
+
+    def ie_key(self, url: str) -> Optional[str]:
+        """URL对应的yt-dlp提取器，未知或提取器不接受该URL时返回None
+
+        路由表只识别视频ID，URL的其余部分也可能让提取器拒绝（如带 list= 参数的YouTube地址由
+        播放列表提取器处理），指定提取器前先用它自己的 suitable 确认。
+        """
+        route = self.classify(url)
+        if not route:
+            return None
+        key = route.adapter.ie_key
+        extractor = self._extractors.get(key)
+        if extractor is None:
+            extractor = self._extractors[key] = get_info_extractor(key)
+        return key if extractor.suitable(url) else None
+
+    def thumbnail_url(self, url: str) -> str:
+        """按URL就能确定的缩略图地址，未知时返回空字符串"""
+        route = self.classify(url)
+        return route.adapter.thumbnail_url(route.video_id) if route else ""
+
+    def dedup_key(self, url: str):
+        """去重用的键，同一视频的不同URL形式得到相同的键"""
+        route = self.classify(url)
+        return route.key if route else url
+
+    def group(self, urls: Iterable[str]) -> Dict[PlatformAdapter, Dict[str, str]]:
+        """按平台分组，返回 {适配器: {视频ID: URL}}，不在路由表中的URL不包含在内"""
+        groups: Dict[PlatformAdapter, Dict[str, str]] = {}
+        for url in urls:
+            route = self.classify(url)
+            if route:
+                groups.setdefault(route.adapter, {})[route.video_id] = url
+        return groups
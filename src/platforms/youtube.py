@@ -0,0 +1,60 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
+
+from platforms.base import PlatformAdapter
+
+_VIDEO_ID = r"([0-9A-Za-z_-]{11})(?=$|[/?&#])"
+_WATCH = r"/(?:watch\?(?:[^#]*&)?v=|shorts/|embed/|live/|v/)" + _VIDEO_ID
+_DURATION_PATTERN = re.compile(r"^P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?$")
+
+_API_URL = "https://www.googleapis.com/youtube/v3/videos"
+_API_MAX_IDS = 50
+
+def parse_duration(value: str) -> Optional[int]:
+    """解析 ISO 8601 时长，如 PT1H2M3S"""
+    match = _DURATION_PATTERN.match(value or "")
+    if not match:
+        return None
+    days, hours, minutes, seconds = (int(g or 0) for g in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+class YouTubeAdapter(PlatformAdapter):
+    """YouTube 单个视频（watch、shorts、embed、live 和短链接）
+
+    播放列表和频道页不在路由表中，仍由yt-dlp自行识别。填写 API 密钥后，
+    批量任务通过 Data API 一次查询最多50个视频的标题和时长。
+    """
+    name = "youtube"
+    ie_key = "Youtube"
+    routes = {
+        "youtube.com": _WATCH,
+        "www.youtube.com": _WATCH,
+        "m.youtube.com": _WATCH,
+        "music.youtube.com": _WATCH,
+        "www.youtube-nocookie.com": _WATCH,
+        "youtu.be": "/" + _VIDEO_ID,
+    }
+
+    def __init__(self):
+        self.api_key = ""
+
+    def configure(self, config) -> None:
+        self.api_key = config.youtube_api_key
+        self.max_batch = _API_MAX_IDS if self.api_key else 0
+
+    def thumbnail_url(self, video_id: str) -> str:
+        return f"https://i.ytimg.com/vi/{video_id}/mqdefault.jpg"
+
+    def fetch_metadata(self, ydl: Any, video_ids: List[str]) -> Dict[str, dict]:
+        query = urlencode({"part": "snippet,contentDetails", "id": ",".join(video_ids), "key": self.api_key})
+        response = ydl.urlopen(f"{_API_URL}?{query}")
+        data = json.loads(response.read().decode("utf-8"))
+        return {
+            item["id"]: {
+                "title": item.get("snippet", {}).get("title", ""),
+                "duration": parse_duration(item.get("contentDetails", {}).get("duration", "")),
+            }
+            for item in data.get("items", [])
+        }
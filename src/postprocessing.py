@@ -0,0 +1,156 @@
+import asyncio
+import json
+import os
+import re
+import shutil
+import time
+from typing import Dict, List, Optional
+
+class PostProcessError(Exception):
+    """后处理失败"""
+    pass
+
+class ValidationError(PostProcessError):
+    """输出文件不完整或损坏"""
+    pass
+
+class PostProcessor:
+    """后处理阶段（合并、转封装等ffmpeg任务）
+
+    与下载阶段分离，网络并发槽位在数据落盘后即释放；
+    这里按CPU核数单独限制同时运行的ffmpeg进程数。
+    """
+    def __init__(self, max_workers: int = 0):
+        self.ffmpeg = shutil.which("ffmpeg")
+        self.semaphore = asyncio.Semaphore(self._resolve_workers(max_workers))
+
+    @staticmethod
+    def _resolve_workers(max_workers: int) -> int:
+        return max_workers if max_workers > 0 else (os.cpu_count() or 2)
+
+    def set_max_workers(self, max_workers: int):
+        """更新并发数，正在运行的进程不受影响"""
+        self.semaphore = asyncio.Semaphore(self._resolve_workers(max_workers))
+
+    async def run(self, args: List[str], timings: Optional[Dict[str, float]] = None) -> None:
+        """在并发限制内运行一个ffmpeg命令，timings 中累计排队和运行耗时"""
+        if not self.ffmpeg:
+            raise PostProcessError("未找到ffmpeg，请先安装并添加到PATH")
+
+        submitted = time.monotonic()
+        async with self.semaphore:
+            started = time.monotonic()
+            try:
+                await self._exec(args)
+            finally:
+                if timings is not None:
+                    timings["postprocess_wait"] = timings.get("postprocess_wait", 0) + started - submitted
+                    timings["postprocess"] = timings.get("postprocess", 0) + time.monotonic() - started
+
+    async def _exec(self, args: List[str]) -> None:
+        process = await asyncio.create_subprocess_exec(
+            self.ffmpeg, "-y", "-hide_banner", "-loglevel", "error", *args,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            _, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+        if process.returncode != 0:
+            message = stderr.decode("utf-8", "replace").strip().splitlines()
+            raise PostProcessError(message[-1] if message else f"ffmpeg退出码 {process.returncode}")
+
+    async def merge(self, video_path: str, audio_path: str, output_path: Optional[str] = None,
+                    timings: Optional[Dict[str, float]] = None) -> str:
+        """合并分离的视频流和音频流，成功后删除分段文件"""
+        output_path = output_path or merged_filename(video_path, audio_path)
+        temp_path = output_path + ".part" + os.path.splitext(output_path)[1]
+        try:
+            await self.run([
+                "-i", video_path, "-i", audio_path,
+                "-map", "0:v:0", "-map", "1:a:0",
+                "-c", "copy", temp_path,
+            ], timings)
+            os.replace(temp_path, output_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        for path in (video_path, audio_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return output_path
+
+class MediaValidator:
+    """用ffprobe检查输出文件是否完整可读
+
+    只读取容器头和索引，开销远小于解码；在独立的并发限制内运行，不占用合并的槽位。
+    时长明显短于元数据中的时长视为下载不完整。
+    """
+    def __init__(self, max_workers: int = 4, tolerance: float = 0.05):
+        self.ffprobe = shutil.which("ffprobe")
+        self.semaphore = asyncio.Semaphore(max(max_workers, 1))
+        self.tolerance = tolerance
+
+    @property
+    def available(self) -> bool:
+        return self.ffprobe is not None
+
+    async def validate(self, path: str, expected_duration: Optional[float] = None,
+                       timings: Optional[Dict[str, float]] = None) -> float:
+        """返回文件时长，文件损坏或不完整时抛出 ValidationError"""
+        if not self.ffprobe:
+            raise PostProcessError("未找到ffprobe，请先安装ffmpeg并添加到PATH")
+
+        started = time.monotonic()
+        async with self.semaphore:
+            try:
+                returncode, stdout, stderr = await self._probe(path)
+            finally:
+                if timings is not None:
+                    timings["validate"] = timings.get("validate", 0) + time.monotonic() - started
+
+        errors = stderr.decode("utf-8", "replace").strip().splitlines()
+        if returncode != 0:
+            raise ValidationError(errors[-1] if errors else f"ffprobe退出码 {returncode}")
+        try:
+            info = json.loads(stdout)
+            duration = float(info["format"]["duration"])
+        except (ValueError, KeyError, TypeError):
+            raise ValidationError("无法读取媒体时长")
+        if not info.get("streams"):
+            raise ValidationError("文件中没有音视频流")
+        if expected_duration and duration < expected_duration * (1 - self.tolerance) - 1:
+            raise ValidationError(f"时长 {duration:.0f} 秒，短于预期的 {expected_duration:.0f} 秒")
+        return duration
+
+    async def _probe(self, path: str):
+        process = await asyncio.create_subprocess_exec(
+            self.ffprobe, "-v", "error", "-show_entries", "format=duration:stream=codec_type",
+            "-of", "json", path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+        return process.returncode, stdout, stderr
+
+def merged_filename(video_path: str, audio_path: str) -> str:
+    """根据分段文件名推算合并后的文件名
+
+    分段文件形如 "标题.f137.mp4"，去掉格式编号；mp4+m4a 保持mp4，其他组合使用mkv。
+    """
+    base, video_ext = os.path.splitext(video_path)
+    base = re.sub(r"\.f[\w-]+$", "", base)
+    audio_ext = os.path.splitext(audio_path)[1]
+    ext = ".mp4" if video_ext == ".mp4" and audio_ext in (".m4a", ".mp4") else ".mkv"
+    if video_ext == ".webm" and audio_ext == ".webm":
+        ext = ".webm"
+    return base + ext
@@ -0,0 +1,33 @@
+import argparse
+import logging
+from simulation import Simulator, Workload
+from utils.config import AppConfig
+
+def main():
+    parser = argparse.ArgumentParser(description="在虚拟时钟上模拟下载调度和重试策略")
+    parser.add_argument("--tasks", type=int, default=1000, help="任务数")
+    parser.add_argument("--concurrent", type=int, default=0, help="最大并发下载数，0表示使用默认配置")
+    parser.add_argument("--speed-limit", type=int, default=-1, help="总限速(KB/s)，-1表示使用默认配置")
+    parser.add_argument("--size", type=float, default=50.0, help="任务大小的中位数(MB)")
+    parser.add_argument("--arrival-rate", type=float, default=0.0, help="每秒到达的任务数，0表示全部在开始时提交")
+    parser.add_argument("--tick", type=float, default=1.0, help="传输进度的更新间隔(虚拟秒)")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子，相同种子结果相同")
+    parser.add_argument("--verbose", action="store_true", help="输出下载器的日志")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL,
+                        format="%(levelname)s [%(name)s] %(message)s")
+
+    # 使用默认配置，不读取本机的配置文件，并发数和限速可以用参数覆盖
+    config = AppConfig()
+    if args.concurrent:
+        config.max_concurrent_downloads = args.concurrent
+    if args.speed_limit >= 0:
+        config.download_speed_limit = args.speed_limit
+
+    workload = Workload.synthetic(args.tasks, median_size_mb=args.size,
+                                  arrival_rate=args.arrival_rate, seed=args.seed)
+    print(Simulator(workload, config, seed=args.seed, tick=args.tick).run())
+
+if __name__ == '__main__':
+    main()
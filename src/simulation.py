@@ -0,0 +1,382 @@
+import asyncio
+import dataclasses
+import random
+import selectors
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+from downloader import DownloadTask, TaskStatus, VideoDownloader
+from utils.config import AppConfig
+from utils.history import DownloadRecord
+
+class SimulationStalled(RuntimeError):
+    """没有可运行的协程也没有定时器，模拟无法继续"""
+
+class _Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+class _VirtualSelector(selectors.DefaultSelector):
+    """事件循环空闲等待时不真正睡眠，而是把虚拟时钟直接拨到下一个定时器"""
+    def __init__(self, clock: _Clock):
+        super().__init__()
+        self._clock = clock
+
+    def select(self, timeout: Optional[float] = None):
+        # 仍然检查一次真实的文件描述符，线程池回调通过自唤醒管道送达
+        events = super().select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None:
+            raise SimulationStalled("没有待运行的协程和定时器")
+        self._clock.now += timeout
+        return []
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """使用虚拟时钟的事件循环
+
+    asyncio.sleep、call_later 等按虚拟时间调度，所有协程都在等待时立即跳到最近的定时器，
+    几小时的调度过程在几秒内跑完，且每次运行的结果相同。
+    """
+    def __init__(self, start: float = 0.0):
+        self.clock = _Clock(start)
+        super().__init__(_VirtualSelector(self.clock))
+
+    def time(self) -> float:
+        return self.clock.now
+
+@contextmanager
+def _virtual_monotonic(loop: VirtualClockLoop) -> Iterator[None]:
+    """模拟期间 time.monotonic 返回虚拟时间，熔断冷却、阶段耗时等与事件循环使用同一个时钟"""
+    original = time.monotonic
+    time.monotonic = loop.time
+    try:
+        yield
+    finally:
+        time.monotonic = original
+
+class ExtractorError(Exception):
+    """模拟的解析失败，按 ErrorKind.EXTRACTOR 处理"""
+
+@dataclass
+class HostProfile:
+    """一个主机的网络特征"""
+    bandwidth: float = 10 * 1024 * 1024  # 该主机的总带宽(字节/秒)，同时下载的任务平分
+    extraction_latency: float = 2.0      # 解析耗时的均值(秒)，按指数分布抽样
+    failure_rate: float = 0.05           # 每次尝试中途断开的概率
+    throttle_rate: float = 0.0           # 每次尝试被限流(HTTP 429)的概率
+    extractor_error_rate: float = 0.0    # 每次尝试解析失败的概率
+    resumable: bool = True               # 断开后能否从已下载的位置续传
+
+@dataclass
+class SimJob:
+    url: str
+    host: str
+    size: int
+    submit_at: float = 0.0  # 相对模拟开始的提交时间(秒)
+
+@dataclass
+class Workload:
+    hosts: Dict[str, HostProfile]
+    jobs: List[SimJob]
+
+    @classmethod
+    def synthetic(cls, tasks: int = 1000, hosts: Optional[Dict[str, HostProfile]] = None,
+                  median_size_mb: float = 50.0, arrival_rate: float = 0.0, seed: int = 0) -> 'Workload':
+        """生成任务：大小按对数正态分布，arrival_rate 为每秒到达的任务数，0表示全部在开始时提交"""
+        rng = random.Random(seed)
+        hosts = hosts or default_hosts()
+        names = sorted(hosts)
+        jobs = []
+        submit_at = 0.0
+        for i in range(tasks):
+            host = rng.choice(names)
+            size = int(rng.lognormvariate(0, 1) * median_size_mb * 1024 * 1024) + 1
+            if arrival_rate:
+                submit_at += rng.expovariate(arrival_rate)
+            jobs.append(SimJob(f"https://{host}/video/{i}", host, size, submit_at))
+        return cls(hosts, jobs)
+
+def default_hosts() -> Dict[str, HostProfile]:
+    return {
+        "fast.example": HostProfile(bandwidth=20 * 1024 * 1024, extraction_latency=1.0, failure_rate=0.02),
+        "slow.example": HostProfile(bandwidth=2 * 1024 * 1024, extraction_latency=3.0,
+                                    failure_rate=0.1, throttle_rate=0.05),
+        "flaky.example": HostProfile(bandwidth=5 * 1024 * 1024, extraction_latency=2.0, failure_rate=0.3,
+                                     extractor_error_rate=0.02, resumable=False),
+    }
+
+@dataclass
+class HostReport:
+    tasks: int = 0
+    completed: int = 0
+    failed: int = 0
+    mean_stretch: float = 0.0  # 平均(完成耗时 / 独占该主机带宽时的理想耗时)
+    goodput: float = 0.0       # 完成文件的字节数 / 模拟总时长
+
+@dataclass
+class SimulationReport:
+    makespan: float = 0.0          # 从开始到最后一个任务结束(秒)
+    completed: int = 0
+    failed: int = 0
+    unfinished: int = 0
+    attempts: int = 0
+    slot_utilization: float = 0.0      # 下载槽位被占用的时间比例
+    transfer_utilization: float = 0.0  # 槽位中实际在传输数据的时间比例
+    fairness: float = 1.0              # 各主机平均 stretch 的Jain公平指数，1为完全公平
+    transferred_bytes: int = 0
+    wasted_bytes: int = 0              # 没有成为成品文件的传输量：不可续传的重下和失败任务
+    wall_seconds: float = 0.0
+    hosts: Dict[str, HostReport] = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        mb = 1024 * 1024
+        lines = [
+            f"总耗时: {self.makespan / 3600:.2f} 小时 (实际运行 {self.wall_seconds:.1f} 秒)",
+            f"任务: 完成 {self.completed}, 失败 {self.failed}, 未结束 {self.unfinished}, 尝试 {self.attempts} 次",
+            f"槽位占用率: {self.slot_utilization:.1%}, 其中传输中: {self.transfer_utilization:.1%}",
+            f"公平指数: {self.fairness:.3f}",
+            f"传输量: {self.transferred_bytes / mb:.0f} MB, 浪费: {self.wasted_bytes / mb:.0f} MB "
+            f"({self.wasted_bytes / max(self.transferred_bytes, 1):.1%})",
+            "主机:",
+        ]
+        for name, host in sorted(self.hosts.items()):
+            lines.append(
+                f"  {name}: {host.completed}/{host.tasks} 完成, 失败 {host.failed}, "
+                f"平均stretch {host.mean_stretch:.2f}, 有效吞吐 {host.goodput / mb:.2f} MB/s"
+            )
+        return "\n".join(lines)
+
+class _MemoryHistory:
+    """模拟时代替 DownloadHistory，不写入用户的历史数据库"""
+    def __init__(self):
+        self.records: Dict[str, DownloadRecord] = {}
+
+    def add_record(self, record: DownloadRecord):
+        self.records[record.url] = record
+
+    def get_record(self, url: str) -> Optional[DownloadRecord]:
+        return self.records.get(url)
+
+    def find_by_hash(self, content_hash: str) -> List[DownloadRecord]:
+        return []
+
+    def average_size(self, limit: int = 100) -> int:
+        sizes = [r.file_size for r in self.records.values() if r.status == "completed" and r.file_size > 0]
+        sizes = sizes[-limit:]
+        return sum(sizes) // len(sizes) if sizes else 0
+
+@dataclass
+class _JobState:
+    attempts: int = 0
+    finished_at: Optional[float] = None
+    status: Optional[TaskStatus] = None
+
+class Simulator:
+    """在虚拟时钟上运行 VideoDownloader 的排队、并发、限速、熔断和重试逻辑
+
+    只替换解析和传输两步：解析按主机的延迟睡眠，传输按主机带宽在同时下载的任务间平分、
+    并受带宽计划的总限速约束，按概率注入断开、限流和解析失败。其余逻辑与实际运行完全相同，
+    修改调度或重试策略后可以用同一个工作负载和随机种子对比结果。
+    """
+    def __init__(self, workload: Workload, config: Optional[AppConfig] = None, seed: int = 0,
+                 tick: float = 1.0, max_duration: float = 30 * 24 * 3600):
+        self.workload = workload
+        # 指标服务和暂存目录会接触本机环境，模拟时总是关闭
+        self.config = dataclasses.replace(config or AppConfig(), metrics_port=0, staging_dir="")
+        self.seed = seed
+        self.tick = tick  # 传输进度的更新间隔(虚拟秒)
+        self.max_duration = max_duration
+        self.downloader: Optional[VideoDownloader] = None
+        self._jobs = {job.url: job for job in workload.jobs}
+        self._states = {job.url: _JobState() for job in workload.jobs}
+        self._rng = random.Random(seed)
+        self._flows: Dict[str, int] = {name: 0 for name in workload.hosts}
+        self._transferred = 0
+        self._discarded = 0
+        self._slot_busy = 0.0
+        self._slot_capacity = 0.0
+        self._transfer_busy = 0.0
+        self._remaining = len(workload.jobs)
+        self._done: Optional[asyncio.Event] = None
+        self._error: Optional[BaseException] = None  # 提交任务时的异常，模拟结束后抛出
+        self._start = 0.0
+
+    def run(self) -> SimulationReport:
+        # 退避时间的抖动使用全局 random，固定种子保证结果可重复
+        random.seed(self.seed)
+        loop = VirtualClockLoop()
+        started = time.perf_counter()
+        try:
+            with _virtual_monotonic(loop):
+                report = loop.run_until_complete(self._run())
+                tasks = asyncio.all_tasks(loop)
+                for task in tasks:
+                    task.cancel()
+                loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        finally:
+            loop.close()
+        report.wall_seconds = time.perf_counter() - started
+        return report
+
+    async def _run(self) -> SimulationReport:
+        loop = asyncio.get_event_loop()
+        self._start = loop.time()
+        self._done = asyncio.Event()
+        # 历史记录只保存在内存中，不打开用户的历史数据库
+        downloader = self.downloader = VideoDownloader(history=_MemoryHistory(), config=self.config)
+        downloader._extract_info = self._extract_info
+        downloader._fetch_streams = self._fetch_streams
+        downloader.listeners.append(self._on_transition)
+
+        for job in self.workload.jobs:
+            loop.call_at(self._start + job.submit_at, self._submit, job)
+        monitor = asyncio.create_task(self._monitor())
+        if self._remaining:
+            try:
+                await asyncio.wait_for(self._done.wait(), self.max_duration)
+            except asyncio.TimeoutError:
+                pass
+        monitor.cancel()
+        if self._error is not None:
+            raise self._error
+        return self._report(loop.time() - self._start)
+
+    def _submit(self, job: SimJob) -> None:
+        future = asyncio.ensure_future(self.downloader.download(job.url, "simulation"))
+        future.add_done_callback(self._check_submitted)
+
+    def _check_submitted(self, future: asyncio.Future) -> None:
+        """提交失败说明下载器本身有错误，立即结束模拟，不把任务当作未结束"""
+        if future.cancelled() or future.exception() is None or self._error is not None:
+            return
+        self._error = future.exception()
+        self._done.set()
+
+    def _on_transition(self, task: DownloadTask, old: Optional[TaskStatus], new: Optional[TaskStatus]):
+        state = self._states.get(task.url)
+        if state is None or new is None or not task.finished or state.finished_at is not None:
+            return
+        state.finished_at = asyncio.get_event_loop().time() - self._start
+        state.status = new
+        if new != TaskStatus.COMPLETED:
+            self._discarded += task.downloaded_bytes
+        self._remaining -= 1
+        if not self._remaining:
+            self._done.set()
+
+    async def _monitor(self):
+        """按 tick 累计槽位占用和传输时间"""
+        while True:
+            await asyncio.sleep(self.tick)
+            self._slot_busy += self.downloader.active_downloads * self.tick
+            self._slot_capacity += self.downloader.download_semaphore.limit * self.tick
+            self._transfer_busy += sum(self._flows.values()) * self.tick
+
+    def _latency(self, host: HostProfile) -> float:
+        return self._rng.expovariate(1 / host.extraction_latency) if host.extraction_latency > 0 else 0.0
+
+    async def _extract_info(self, url: str, proxy: Optional[str]) -> Optional[dict]:
+        job = self._jobs.get(url)
+        if job:
+            await asyncio.sleep(self._latency(self.workload.hosts[job.host]))
+        return None
+
+    def _rate(self, host_name: str) -> float:
+        """当前每个传输分到的速度：主机带宽平分，再受总限速约束"""
+        rate = self.workload.hosts[host_name].bandwidth / max(self._flows[host_name], 1)
+        ratelimit = self.downloader.ydl_pool.ratelimit
+        if ratelimit:
+            rate = min(rate, ratelimit / max(sum(self._flows.values()), 1))
+        return rate
+
+    async def _fetch_streams(self, url: str, save_path: str, proxy: Optional[str] = None) -> List[str]:
+        job = self._jobs[url]
+        host = self.workload.hosts[job.host]
+        state = self._states[url]
+        task = self.downloader.get_task(url)
+        # 第一次尝试使用排队后解析的结果，重试时重新解析
+        if state.attempts:
+            await asyncio.sleep(self._latency(host))
+        state.attempts += 1
+        if self._rng.random() < host.extractor_error_rate:
+            raise ExtractorError("simulated extractor failure")
+
+        task.total_bytes = job.size
+        task.stream_count = 1
+        if not host.resumable and task.downloaded_bytes:
+            self._discarded += task.downloaded_bytes
+            task.downloaded_bytes = 0
+
+        roll = self._rng.random()
+        error: Optional[Exception] = None
+        stop_at = job.size
+        if roll < host.throttle_rate:
+            error = OSError("HTTP Error 429: Too Many Requests")
+            stop_at = task.downloaded_bytes
+        elif roll < host.throttle_rate + host.failure_rate:
+            error = ConnectionResetError("Connection reset by peer")
+            stop_at = task.downloaded_bytes + int(self._rng.random() * (job.size - task.downloaded_bytes))
+
+        loop = asyncio.get_event_loop()
+        self._flows[job.host] += 1
+        try:
+            while task.downloaded_bytes < stop_at and not task.cancel_requested:
+                rate = self._rate(job.host)
+                step = min(self.tick, (stop_at - task.downloaded_bytes) / rate)
+                await asyncio.sleep(step)
+                received = min(int(rate * step) + 1, stop_at - task.downloaded_bytes)
+                if not task.first_byte_at:
+                    task.first_byte_at = loop.time()
+                task.downloaded_bytes += received
+                task.progress = task.downloaded_bytes / job.size * 100
+                self._transferred += received
+        finally:
+            self._flows[job.host] -= 1
+        if error:
+            raise error
+        task.finished_at = loop.time()
+        return []
+
+    def _report(self, elapsed: float) -> SimulationReport:
+        report = SimulationReport(
+            transferred_bytes=self._transferred,
+            slot_utilization=self._slot_busy / self._slot_capacity if self._slot_capacity else 0.0,
+            transfer_utilization=self._transfer_busy / self._slot_capacity if self._slot_capacity else 0.0,
+        )
+        stretches: Dict[str, List[float]] = {name: [] for name in self.workload.hosts}
+        completed_bytes: Dict[str, int] = {name: 0 for name in self.workload.hosts}
+        for url, state in self._states.items():
+            job = self._jobs[url]
+            host = report.hosts.setdefault(job.host, HostReport())
+            host.tasks += 1
+            report.attempts += state.attempts
+            if state.status == TaskStatus.COMPLETED:
+                host.completed += 1
+                report.completed += 1
+                completed_bytes[job.host] += job.size
+                profile = self.workload.hosts[job.host]
+                ideal = profile.extraction_latency + job.size / profile.bandwidth
+                stretches[job.host].append((state.finished_at - job.submit_at) / ideal)
+                report.makespan = max(report.makespan, state.finished_at)
+            elif state.status is not None:
+                host.failed += 1
+                report.failed += 1
+                report.makespan = max(report.makespan, state.finished_at)
+            else:
+                report.unfinished += 1
+        if report.unfinished:
+            report.makespan = elapsed
+        report.wasted_bytes = self._discarded
+
+        means = []
+        for name, host in report.hosts.items():
+            if stretches[name]:
+                host.mean_stretch = sum(stretches[name]) / len(stretches[name])
+                means.append(host.mean_stretch)
+            host.goodput = completed_bytes[name] / report.makespan if report.makespan else 0.0
+        if means:
+            report.fairness = sum(means) ** 2 / (len(means) * sum(m * m for m in means))
+        return report
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QTabWidget, QTableWidget, QTableWidgetItem,
+    QPushButton, QComboBox, QLabel, QHeaderView
+)
+from ui.background import run_in_background
+from utils.analytics import build_report
+from utils.history import DownloadHistory
+
+# (显示名, 天数)，0表示全部记录
+RANGES = [("最近7天", 7), ("最近30天", 30), ("最近90天", 90), ("全部", 0)]
+
+class AnalyticsDialog(QDialog):
+    """历史记录统计：每天各主机下载量、各提取器成功率和完成耗时，包含已归档的记录"""
+    def __init__(self, history: DownloadHistory, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.init_ui()
+        self.load_report()
+
+    def init_ui(self):
+        self.setWindowTitle("下载统计")
+        self.setGeometry(200, 200, 800, 400)
+
+        layout = QVBoxLayout(self)
+
+        range_layout = QHBoxLayout()
+        range_layout.addWidget(QLabel("范围:"))
+        self.range_combo = QComboBox()
+        for name, days in RANGES:
+            self.range_combo.addItem(name, days)
+        self.range_combo.setCurrentIndex(1)
+        self.range_combo.currentIndexChanged.connect(lambda _index: self.load_report())
+        range_layout.addWidget(self.range_combo)
+        range_layout.addStretch()
+        self.status_label = QLabel()
+        range_layout.addWidget(self.status_label)
+        layout.addLayout(range_layout)
+
+        self.tabs = QTabWidget()
+        self.host_table = self._create_table(["日期", "主机", "完成数", "下载量(MB)"])
+        self.extractor_table = self._create_table(["提取器", "成功率", "完成", "失败", "已结束"])
+        self.completion_table = self._create_table(["主机", "完成数", "p50(秒)", "p95(秒)"])
+        self.tabs.addTab(self.host_table, "主机流量")
+        self.tabs.addTab(self.extractor_table, "提取器成功率")
+        self.tabs.addTab(self.completion_table, "完成耗时")
+        layout.addWidget(self.tabs)
+
+        btn_layout = QHBoxLayout()
+        refresh_btn = self.refresh_btn = QPushButton("刷新")
+        close_btn = QPushButton("关闭")
+        refresh_btn.clicked.connect(self.load_report)
+        close_btn.clicked.connect(self.accept)
+        btn_layout.addWidget(refresh_btn)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+
+    @staticmethod
+    def _create_table(headers) -> QTableWidget:
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        return table
+
+    @staticmethod
+    def _fill(table: QTableWidget, rows):
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for col, value in enumerate(values):
+                table.setItem(row, col, QTableWidgetItem(str(value)))
+
+    def load_report(self):
+        """按选择的范围重新统计，聚合在SQLite中完成，查询在线程池中进行"""
+        days = self.range_combo.currentData()
+        since = datetime.now() - timedelta(days=days) if days else None
+        self._request = request = object()  # 范围切换较快时只显示最后一次的结果
+        self.refresh_btn.setEnabled(False)
+        self.status_label.setText("统计中...")
+        
+        def done(report):
+            if request is self._request:
+                self._show_report(report)
+        
+        def failed(e):
+            if request is self._request:
+                self.refresh_btn.setEnabled(True)
+                self.status_label.setText(f"统计失败: {e}")
+        
+        run_in_background(lambda: build_report(self.history, since), done, failed, self)
+        
+    def _show_report(self, report):
+        self.refresh_btn.setEnabled(True)
+        self.status_label.setText("")
+        mb = 1024 * 1024
+        self._fill(self.host_table, [
+            (item.day, item.host or "-", item.downloads, f"{item.bytes / mb:.1f}")
+            for item in report.host_days
+        ])
+        self._fill(self.extractor_table, [
+            (item.extractor, f"{item.success_rate:.1%}", item.completed, item.errors, item.finished)
+            for item in report.extractors
+        ])
+        self._fill(self.completion_table, [
+            ("全部" if item.host == "*" else item.host or "-", item.count, f"{item.p50:.1f}", f"{item.p95:.1f}")
+            for item in report.completion
+        ])
@@ -0,0 +1,56 @@
+from typing import Any, Callable, Optional
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+class BackgroundCall(QObject):
+    """在 Qt 全局线程池中执行耗时调用，结果回到界面线程
+
+    不依赖asyncio事件循环，模态对话框打开期间也能完成。父对象销毁后结果直接丢弃。
+    """
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(object)
+
+    def __init__(self, fn: Callable[[], Any], on_done: Callable[[Any], None],
+                 on_error: Optional[Callable[[Exception], None]] = None, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.fn = fn
+        self.on_done = on_done
+        self.on_error = on_error
+        self.succeeded.connect(self._on_succeeded)
+        self.failed.connect(self._on_failed)
+
+    def start(self) -> 'BackgroundCall':
+        QThreadPool.globalInstance().start(_CallJob(self))
+        return self
+
+    def _on_succeeded(self, result):
+        self.deleteLater()
+        self.on_done(result)
+
+    def _on_failed(self, error):
+        self.deleteLater()
+        if self.on_error is None:
+            raise error
+        self.on_error(error)
+
+class _CallJob(QRunnable):
+    def __init__(self, call: BackgroundCall):
+        super().__init__()
+        self.call = call
+
+    def run(self):
+        try:
+            result = self.call.fn()
+        except Exception as e:
+            signal, value = self.call.failed, e
+        else:
+            signal, value = self.call.succeeded, result
+        try:
+            signal.emit(value)
+        except RuntimeError:
+            pass  # 父对象已销毁
+
+def run_in_background(fn: Callable[[], Any], on_done: Callable[[Any], None],
+                      on_error: Optional[Callable[[Exception], None]] = None,
+                      parent: Optional[QObject] = None) -> BackgroundCall:
+    """在线程池中执行 fn，完成后在界面线程调用 on_done(结果) 或 on_error(异常)"""
+    return BackgroundCall(fn, on_done, on_error, parent).start()
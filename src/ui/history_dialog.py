@@ -1,16 +1,25 @@
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QTableWidget, QTableWidgetItem,
-    QPushButton, QHBoxLayout, QHeaderView, QMessageBox
+    QPushButton, QHBoxLayout, QHeaderView, QMessageBox,
+    QFileDialog, QInputDialog
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QSize, QTimer
+from PyQt6.QtGui import QIcon
+from datetime import datetime, timedelta
 from utils.history import DownloadHistory, DownloadRecord
-from typing import Callable
+from utils.history_export import export_history
+from ui.background import run_in_background
+from ui.thumbnails import THUMBNAIL_HEIGHT, THUMBNAIL_WIDTH, ThumbnailLoader, visible_rows
+from typing import Callable, List, Optional
 
 class HistoryDialog(QDialog):
-    def __init__(self, redownload_callback: Callable[[str, str], None], parent=None):
+    def __init__(self, redownload_callback: Callable[[str, str], None],
+                 thumbnails: Optional[ThumbnailLoader] = None, parent=None):
         super().__init__(parent)
         self.history = DownloadHistory()
         self.redownload_callback = redownload_callback
+        self.thumbnails = thumbnails  # 与主窗口共用，已加载的缩略图不必重新读取
+        self.records: List[DownloadRecord] = []
         self.init_ui()
         self.load_history()
         
@@ -28,19 +37,39 @@ class HistoryDialog(QDialog):
         self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
         self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
         
+        if self.thumbnails:
+            self.table.setIconSize(QSize(THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT))
+            self.table.verticalHeader().setDefaultSectionSize(THUMBNAIL_HEIGHT + 6)
+            self.thumbnail_timer = QTimer(self)
+            self.thumbnail_timer.setSingleShot(True)
+            self.thumbnail_timer.setInterval(150)
+            self.thumbnail_timer.timeout.connect(self.load_visible_thumbnails)
+            self.table.verticalScrollBar().valueChanged.connect(lambda _value: self.thumbnail_timer.start())
+            self.thumbnails.loaded.connect(self._on_thumbnail_loaded)
+            self.finished.connect(self._release_thumbnails)
+        
         layout.addWidget(self.table)
         
         # 添加底部按钮
         btn_layout = QHBoxLayout()
         clear_btn = QPushButton("清空历史")
+        stats_btn = QPushButton("统计")
+        export_btn = self.export_btn = QPushButton("导出")
+        archive_btn = self.archive_btn = QPushButton("归档")
         refresh_btn = QPushButton("刷新")
         close_btn = QPushButton("关闭")
         
         clear_btn.clicked.connect(self.clear_history)
+        stats_btn.clicked.connect(self.show_analytics)
+        export_btn.clicked.connect(self.export_history)
+        archive_btn.clicked.connect(self.archive_history)
         refresh_btn.clicked.connect(self.load_history)
         close_btn.clicked.connect(self.accept)
         
         btn_layout.addWidget(clear_btn)
+        btn_layout.addWidget(stats_btn)
+        btn_layout.addWidget(export_btn)
+        btn_layout.addWidget(archive_btn)
         btn_layout.addWidget(refresh_btn)
         btn_layout.addWidget(close_btn)
         
@@ -48,7 +77,7 @@ class HistoryDialog(QDialog):
         
     def load_history(self):
         """加载历史记录"""
-        records = self.history.get_records()
+        records = self.records = self.history.get_records()
         self.table.setRowCount(len(records))
         
         for row, record in enumerate(records):
@@ -66,14 +95,98 @@ class HistoryDialog(QDialog):
                 lambda checked, r=record: self.redownload_callback(r.url, r.save_path)
             )
             self.table.setCellWidget(row, 5, redownload_btn)
+        
+        if self.thumbnails:
+            # 等对话框显示、视口有了大小之后再确定可见行
+            self.thumbnail_timer.start()
+            
+    def load_visible_thumbnails(self):
+        """只为可见行显示和加载缩略图"""
+        wanted = set()
+        for row in visible_rows(self.table):
+            if row >= len(self.records):
+                break
+            url = self.records[row].thumbnail_url
+            item = self.table.item(row, 0)
+            if not url or item is None or item.data(Qt.ItemDataRole.UserRole) == url:
+                continue
+            pixmap = self.thumbnails.get(url)
+            if pixmap is None:
+                wanted.add(url)
+            else:
+                item.setIcon(QIcon(pixmap))
+                item.setData(Qt.ItemDataRole.UserRole, url)
+        self.thumbnails.set_wanted(wanted, "history")
+
+    def _on_thumbnail_loaded(self, _url: str):
+        self.load_visible_thumbnails()
+
+    def _release_thumbnails(self, _result: int):
+        """对话框关闭后不再接收加载通知，等待中的请求也随之放弃"""
+        self.thumbnails.loaded.disconnect(self._on_thumbnail_loaded)
+        self.thumbnails.set_wanted(set(), "history")
+            
+    def show_analytics(self):
+        """显示下载统计"""
+        from ui.analytics_dialog import AnalyticsDialog
+        AnalyticsDialog(self.history, self).exec()
+        
+    def export_history(self):
+        """把全部历史记录（包括已归档的）导出到文件"""
+        path, selected = QFileDialog.getSaveFileName(
+            self, "导出历史记录", "history.jsonl.gz",
+            "JSON Lines (*.jsonl *.jsonl.gz);;列式压缩 (*.columnar.gz)"
+        )
+        if not path:
+            return
+        fmt = "columnar" if selected.startswith("列式") else "jsonl"
+        # 导出在线程池中进行，对话框保持响应
+        self.export_btn.setEnabled(False)
+        self.export_btn.setText("导出中...")
+        
+        def done(count):
+            self._restore_button(self.export_btn, "导出")
+            QMessageBox.information(self, "导出完成", f"已导出 {count} 条记录到 {path}")
+        
+        def failed(e):
+            self._restore_button(self.export_btn, "导出")
+            QMessageBox.warning(self, "导出失败", str(e))
+        
+        run_in_background(lambda: export_history(self.history, path, fmt), done, failed, self)
+        
+    def archive_history(self):
+        """把较早的已结束记录移到归档库，统计和导出仍包含这些记录"""
+        days, ok = QInputDialog.getInt(self, "归档", "归档多少天之前的已结束记录:", 90, 1, 3650)
+        if not ok:
+            return
+        self.archive_btn.setEnabled(False)
+        self.archive_btn.setText("归档中...")
+        
+        def done(moved):
+            self._restore_button(self.archive_btn, "归档")
+            QMessageBox.information(self, "归档完成", f"已归档 {moved} 条记录")
+            self.load_history()
+        
+        def failed(e):
+            self._restore_button(self.archive_btn, "归档")
+            QMessageBox.warning(self, "归档失败", str(e))
+        
+        cutoff = datetime.now() - timedelta(days=days)
+        run_in_background(lambda: self.history.archive(cutoff), done, failed, self)
+        
+    @staticmethod
+    def _restore_button(button: QPushButton, text: str):
+        button.setText(text)
+        button.setEnabled(True)
             
     def clear_history(self):
         """清空历史记录"""
         if QMessageBox.question(
             self,
             "确认",
-            "确定要清空所有下载历史记录吗？",
+            "确定要清空所有下载历史记录吗？已归档的记录也会一并删除。",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         ) == QMessageBox.StandardButton.Yes:
             self.history.clear_all()
+            self.records = []
             self.table.setRowCount(0)
\ No newline at end of file
@@ -3,22 +3,39 @@ from PyQt6.QtWidgets import (
     QPushButton, QLineEdit, QTableWidget, QTableWidgetItem,
     QLabel, QFileDialog, QHeaderView, QMessageBox,
     QProgressBar, QSystemTrayIcon, QMenu, QToolBar,
-    QApplication, QStyle, QSizePolicy
+    QApplication, QStyle, QSizePolicy, QCheckBox
 )
-from PyQt6.QtCore import Qt, QTimer, QUrl
+from PyQt6.QtCore import Qt, QTimer, QUrl, QSize
 from PyQt6.QtGui import QColor, QIcon, QAction, QDesktopServices
 import asyncio
 import os
 from functools import partial
 from downloader import TaskStatus
 from utils.config import AppConfig
+from utils.network import url_host
+from utils.search_index import SearchIndex
+from utils.throughput import sparkline
+from utils.profiler import profiler, profiled
+from utils.logs import log_manager
+from utils.thumbnails import ThumbnailStore
+from ui.thumbnails import THUMBNAIL_HEIGHT, THUMBNAIL_WIDTH, ThumbnailLoader, visible_rows
 
 class MainWindow(QMainWindow):
     def __init__(self, downloader):
         super().__init__()
         self.downloader = downloader
         self.config = AppConfig.load()
-        self.notified_tasks = set()  # 添加已通知任务的集合
+        self.pending_notifications = []  # 等待显示的完成通知（文件名）
+        self.downloader.listeners.append(self._on_task_transition)
+        self.archived_count = 0  # 已移出列表、只保存在历史记录中的任务数
+        self.search_index = SearchIndex()  # 内存中任务的搜索索引，随状态转换增量更新
+        self.history_index = None  # 勾选"包含历史"后才在线程池中从数据库建立
+        self.history_entries = {}  # URL -> (文件名, 状态)，用于显示历史搜索结果
+        self._history_loading = None  # 建立历史索引期间结束的任务，建好后补入
+        self.thumbnails = None  # 关闭缩略图时为None
+        if self.config.show_thumbnails:
+            store = ThumbnailStore(max_bytes=self.config.thumbnail_cache_mb * 1024 * 1024)
+            self.thumbnails = ThumbnailLoader(self.downloader.urlopen, store, parent=self)
         
         # 加载样式表
         self.load_stylesheet()
@@ -67,10 +84,19 @@ class MainWindow(QMainWindow):
         # 创建搜索区域
         search_layout = QHBoxLayout()
         self.search_input = QLineEdit()
-        self.search_input.setPlaceholderText("搜索任务...")
-        self.search_input.textChanged.connect(self.filter_tasks)
+        self.search_input.setPlaceholderText("搜索任务... 支持 status:error host:bilibili title: file: url:")
+        # 输入停顿后才执行搜索，避免每次按键都刷新整个列表
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.filter_tasks)
+        self.search_input.textChanged.connect(lambda _text: self.search_timer.start())
         search_layout.addWidget(self.search_input)
         
+        self.include_history = QCheckBox("包含历史")
+        self.include_history.toggled.connect(lambda _checked: self.filter_tasks())
+        search_layout.addWidget(self.include_history)
+        
         # URL输入区域
         input_layout = QHBoxLayout()
         self.url_input = QLineEdit()
@@ -94,6 +120,17 @@ class MainWindow(QMainWindow):
         self.task_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
         self.task_table.setSortingEnabled(True)  # 启用排序
         
+        if self.thumbnails:
+            self.task_table.setIconSize(QSize(THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT))
+            self.task_table.verticalHeader().setDefaultSectionSize(THUMBNAIL_HEIGHT + 6)
+            # 滚动停下后才请求新露出的行，快速滚过的行不会触发下载
+            self.thumbnail_timer = QTimer(self)
+            self.thumbnail_timer.setSingleShot(True)
+            self.thumbnail_timer.setInterval(150)
+            self.thumbnail_timer.timeout.connect(self._load_visible_thumbnails)
+            self.task_table.verticalScrollBar().valueChanged.connect(lambda _value: self.thumbnail_timer.start())
+            self.thumbnails.loaded.connect(lambda _url: self._load_visible_thumbnails())
+        
         # 设置右键菜单
         self.task_table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.task_table.customContextMenuRequested.connect(self.show_context_menu)
@@ -107,6 +144,8 @@ class MainWindow(QMainWindow):
         self.status_bar = self.statusBar()
         self.stats_label = QLabel()
         self.status_bar.addWidget(self.stats_label)
+        self.bandwidth_label = QLabel()
+        self.status_bar.addPermanentWidget(self.bandwidth_label)
         
         # 添加菜单栏
         self.create_menu_bar()
@@ -181,8 +220,13 @@ class MainWindow(QMainWindow):
         history_action = QAction('下载历史', self)
         history_action.triggered.connect(self.show_history)
         
+        profile_action = QAction('导出性能报告', self)
+        profile_action.triggered.connect(self.dump_profile_report)
+        
         settings_menu.addAction(preferences_action)
         settings_menu.addAction(history_action)
+        settings_menu.addSeparator()
+        settings_menu.addAction(profile_action)
         
     def create_tray_icon(self):
         """创建系统托盘图标"""
@@ -210,11 +254,18 @@ class MainWindow(QMainWindow):
         menu.addSeparator()
         copy_url_action = menu.addAction("复制URL")
         open_folder_action = menu.addAction("打开文件夹")
+        log_action = menu.addAction("查看日志")
         
         # 显示菜单
         action = menu.exec(self.task_table.mapToGlobal(pos))
         if not action:
             return
+        
+        if action == log_action:
+            from ui.task_log_dialog import TaskLogDialog
+            url = self.task_table.item(min(rows), 0).text()
+            TaskLogDialog(url, self).exec()
+            return
             
         # 处理菜单动作
         for row in rows:
@@ -226,21 +277,94 @@ class MainWindow(QMainWindow):
             elif action == copy_url_action:
                 QApplication.clipboard().setText(url)
             elif action == open_folder_action:
-                task = self.downloader.get_task(url)
+                # 已移出内存的任务从历史记录读取
+                task = self.downloader.get_task(url) or self.downloader.history.get_record(url)
                 if task and task.save_path:
                     QDesktopServices.openUrl(QUrl.fromLocalFile(task.save_path))
                     
+    @profiled("ui.filter_tasks")
     def filter_tasks(self):
-        """过滤任务列表"""
-        search_text = self.search_input.text().lower()
+        """按搜索条件过滤任务列表，勾选"包含历史"时追加匹配的历史记录"""
+        query = self.search_input.text().strip()
+        self._remove_history_rows()
+        matched = self.search_index.search(query) if query else None
         for row in range(self.task_table.rowCount()):
-            hidden = True
-            for col in range(self.task_table.columnCount() - 1):  # 跳过操作列
-                item = self.task_table.item(row, col)
-                if item and search_text in item.text().lower():
-                    hidden = False
-                    break
-            self.task_table.setRowHidden(row, hidden)
+            hidden = matched is not None and self.task_table.item(row, 0).text() not in matched
+            # 只改变显示状态有变化的行，避免每次查询都让表格重新布局所有行
+            if self.task_table.isRowHidden(row) != hidden:
+                self.task_table.setRowHidden(row, hidden)
+        if query and self.include_history.isChecked():
+            self._show_history_results(query)
+            
+    def _refilter(self):
+        """任务变化可能影响搜索结果，有搜索条件时重新过滤"""
+        if self.search_input.text().strip():
+            self.search_timer.start()
+            
+    def _show_history_results(self, query: str, limit: int = 200):
+        """把匹配的历史记录作为只读行追加到列表末尾，历史索引未建立时先在后台建立"""
+        if self.history_index is None:
+            if self._history_loading is None:
+                self._history_loading = []
+                asyncio.create_task(self._load_history_index())
+            self.status_bar.showMessage("正在加载历史记录...")
+            return
+        urls = [url for url in self.history_index.search(query) if not self.downloader.get_task(url)]
+        
+        self.task_table.setSortingEnabled(False)
+        for url in sorted(urls)[:limit]:
+            row = self.task_table.rowCount()
+            self.task_table.insertRow(row)
+            url_item = QTableWidgetItem(url)
+            url_item.setData(Qt.ItemDataRole.UserRole, "history")
+            self.task_table.setItem(row, 0, url_item)
+            filename, status = self.history_entries[url]
+            self.task_table.setItem(row, 1, QTableWidgetItem(filename))
+            self.task_table.setItem(row, 2, QTableWidgetItem(f"历史 · {status}"))
+            for col in range(3):
+                self.task_table.item(row, col).setForeground(QColor(128, 128, 128))
+        self.task_table.setSortingEnabled(True)
+        if len(urls) > limit:
+            self.status_bar.showMessage(f"历史记录中有 {len(urls)} 条匹配，仅显示前 {limit} 条", 5000)
+            
+    async def _load_history_index(self):
+        """在线程池中读取全部历史记录并建立索引，完成后重新过滤"""
+        def build():
+            index, entries = SearchIndex(), {}
+            for record in self.downloader.history.iter_records():
+                entries[record.url] = (record.filename, record.status)
+                index.update(record.url, url=record.url, filename=record.filename,
+                             host=url_host(record.url), status=record.status)
+            return index, entries
+        
+        try:
+            index, entries = await asyncio.get_event_loop().run_in_executor(None, build)
+        except Exception as e:
+            self._history_loading = None
+            self.status_bar.showMessage(f"加载历史记录失败: {e}", 5000)
+            return
+        self.history_index, self.history_entries = index, entries
+        pending, self._history_loading = self._history_loading, None
+        for url, filename, status in pending:
+            self._index_history_record(url, filename, status)
+        self.status_bar.clearMessage()
+        self.filter_tasks()
+            
+    def _index_history_record(self, url: str, filename: str, status: str):
+        if self.history_index is None:
+            if self._history_loading is not None:
+                self._history_loading.append((url, filename, status))
+            return
+        self.history_entries[url] = (filename, status)
+        self.history_index.update(url, url=url, filename=filename, host=url_host(url), status=status)
+            
+    def _is_history_row(self, row: int) -> bool:
+        return self.task_table.item(row, 0).data(Qt.ItemDataRole.UserRole) == "history"
+            
+    def _remove_history_rows(self):
+        for row in range(self.task_table.rowCount() - 1, -1, -1):
+            if self._is_history_row(row):
+                self.task_table.removeRow(row)
             
     def pause_all_tasks(self):
         """暂停所有任务"""
@@ -283,21 +407,34 @@ class MainWindow(QMainWindow):
                     
     def update_stats(self):
         """更新任务统计信息"""
+        self.update_bandwidth()
         if not self.config.show_task_stats:
             self.stats_label.clear()
             return
             
-        total = self.task_table.rowCount()
-        active = sum(1 for task in self.downloader.tasks.values() 
-                    if task.status == TaskStatus.DOWNLOADING)
-        completed = sum(1 for task in self.downloader.tasks.values() 
-                       if task.status == TaskStatus.COMPLETED)
-        failed = sum(1 for task in self.downloader.tasks.values() 
-                    if task.status == TaskStatus.ERROR)
+        # 计数随状态转换增量维护，不需要遍历任务
+        counts = self.downloader.status_counts.counts
+        total = self.downloader.status_counts.total
+        active = counts[TaskStatus.DOWNLOADING]
+        completed = counts[TaskStatus.COMPLETED]
+        failed = counts[TaskStatus.ERROR]
         
         stats = f"总任务: {total} | 下载中: {active} | 已完成: {completed} | 失败: {failed}"
+        if self.archived_count:
+            stats += f" | 已归档: {self.archived_count}(见下载历史)"
+        if self.downloader.coordinator:
+            stats += f" | 工作节点: {self.downloader.coordinator.worker_count}"
         self.stats_label.setText(stats)
         
+    def update_bandwidth(self):
+        """在状态栏绘制最近一分钟的总下载速度曲线"""
+        bandwidth = self.downloader.bandwidth
+        samples = bandwidth.history()
+        rate = bandwidth.rate()
+        self.bandwidth_label.setText(f"{sparkline(samples)} {rate/1024/1024:.1f} MB/s")
+        peak = max(samples, default=0)
+        self.bandwidth_label.setToolTip(f"最近 {len(samples)} 秒峰值: {peak/1024/1024:.1f} MB/s")
+        
     def closeEvent(self, event):
         """处理窗口关闭事件"""
         if self.config.minimize_to_tray and self.isVisible():
@@ -361,16 +498,31 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "提示", "文件中没有找到URL")
             return
         
+        # 同一视频的不同链接形式只保留第一个
+        unique = {}
+        for url in urls:
+            unique.setdefault(self.downloader.router.dedup_key(url), url)
+        urls = list(unique.values())
+        
         # 选择保存目录
         save_path = QFileDialog.getExistingDirectory(self, "选择保存目录")
         if not save_path:
             return
         
+        # 配置了闲时窗口时可以把整批任务留到闲时下载
+        off_peak = self.downloader.schedule.has_off_peak and QMessageBox.question(
+            self,
+            "闲时下载",
+            f"是否仅在闲时窗口内下载这 {len(urls)} 个任务？",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        ) == QMessageBox.StandardButton.Yes
+        
         # 添加所有下载任务
         for url in urls:
-            self.add_download_task(url, save_path)
+            self.add_download_task(url, save_path, off_peak)
+        asyncio.create_task(self.downloader.prefetch_metadata(urls))
 
-    def add_download_task(self, url: str, save_path: str):
+    def add_download_task(self, url: str, save_path: str, off_peak: bool = False):
         """添加下载任务"""
         row = self.task_table.rowCount()
         self.task_table.insertRow(row)
@@ -412,24 +564,21 @@ class MainWindow(QMainWindow):
         cancel_btn.clicked.connect(partial(self.handle_cancel_click, url))
         
         # 启动下载任务
-        asyncio.create_task(self.start_download(url, save_path))
+        asyncio.create_task(self.start_download(url, save_path, off_peak))
 
-    async def start_download(self, url: str, save_path: str):
+    async def start_download(self, url: str, save_path: str, off_peak: bool = False):
         """开始下载任务"""
         try:
-            await self.downloader.download(url, save_path)
+            await self.downloader.download(url, save_path, off_peak)
         except Exception as e:
             QMessageBox.critical(self, "错误", f"下载失败: {str(e)}")
 
     def handle_pause_click(self, url: str):
         """处理暂停按钮点击"""
-        task = self.downloader.get_task(url)
-        if task and task.status == TaskStatus.DOWNLOADING:
-            self.downloader.pause_task(url)
-            sender = self.sender()
+        sender = self.sender()
+        if self.downloader.pause_task(url):
             sender.setText("继续")
-        else:
-            self.downloader.resume_task(url)
+        elif self.downloader.resume_task(url):
             sender.setText("暂停")
 
     def handle_cancel_click(self, url: str):
@@ -442,22 +591,38 @@ class MainWindow(QMainWindow):
         ) == QMessageBox.StandardButton.Yes:
             self.downloader.cancel_task(url)
 
+    @profiled("ui.update_progress")
     def update_progress(self):
         """更新所有任务的进度显示"""
+        self._remove_evicted_rows()
+        self.downloader.refresh_speeds()
         for row in range(self.task_table.rowCount()):
             url = self.task_table.item(row, 0).text()
             task = self.downloader.get_task(url)
             if task:
-                # 更新文件名
-                self.task_table.setItem(row, 1, QTableWidgetItem(task.filename))
+                # 更新文件名，提示中显示选中的格式和理由
+                # 沿用原有的单元格，保留已设置的缩略图
+                filename_item = self.task_table.item(row, 1)
+                if filename_item is None:
+                    filename_item = QTableWidgetItem()
+                    self.task_table.setItem(row, 1, filename_item)
+                filename_item.setText(task.filename)
+                filename_item.setToolTip(task.format_info)
+                if self.search_index.update(url, filename=task.filename, title=task.title):
+                    self._refilter()
                 
-                # 更新进度条
+                # 更新进度条，已结束的任务换成文字以释放控件
                 progress_bar = self.task_table.cellWidget(row, 2)
-                if not progress_bar:
-                    progress_bar = QProgressBar()
-                    progress_bar.setRange(0, 100)
-                    self.task_table.setCellWidget(row, 2, progress_bar)
-                progress_bar.setValue(int(task.progress))
+                if task.finished:
+                    if progress_bar:
+                        self.task_table.removeCellWidget(row, 2)
+                    self.task_table.setItem(row, 2, QTableWidgetItem(f"{int(task.progress)}%"))
+                else:
+                    if not progress_bar:
+                        progress_bar = QProgressBar()
+                        progress_bar.setRange(0, 100)
+                        self.task_table.setCellWidget(row, 2, progress_bar)
+                    progress_bar.setValue(int(task.progress))
                 
                 # 更新速度
                 self.task_table.setItem(row, 3, QTableWidgetItem(task.speed))
@@ -472,24 +637,71 @@ class MainWindow(QMainWindow):
                     if item:
                         item.setForeground(color)
                         
-                # 控制按钮显示
-                btn_container = self.task_table.cellWidget(row, 5)
-                if btn_container:
-                    # 根据任务状态控制按钮容器的可见性
-                    if task.status in [TaskStatus.DOWNLOADING, TaskStatus.PAUSED, TaskStatus.PENDING]:
-                        btn_container.setVisible(True)
-                    else:  # 完成、取消或错误状态
-                        btn_container.setVisible(False)
-                
-                # 下载完成时显示通知（只提示一次）
-                if task.status == TaskStatus.COMPLETED and url not in self.notified_tasks:
-                    self.tray_icon.showMessage(
-                        "下载完成",
-                        f"文件 {task.filename} 已下载完成",
-                        QSystemTrayIcon.MessageIcon.Information,
-                        3000
-                    )
-                    self.notified_tasks.add(url)  # 添加到已通知集合
+                # 完成、取消或错误状态的任务不再需要操作按钮，直接删除控件
+                if task.finished and self.task_table.cellWidget(row, 5):
+                    self.task_table.removeCellWidget(row, 5)
+        self._load_visible_thumbnails()
+        self._show_pending_notifications()
+
+    def _load_visible_thumbnails(self):
+        """为可见行显示缩略图，内存中没有的交给加载器，不可见的行不加载"""
+        if not self.thumbnails:
+            return
+        wanted = set()
+        for row in visible_rows(self.task_table):
+            if self.task_table.isRowHidden(row) or self._is_history_row(row):
+                continue
+            task = self.downloader.get_task(self.task_table.item(row, 0).text())
+            item = self.task_table.item(row, 1)
+            if not task or not task.thumbnail_url or item is None:
+                continue
+            if item.data(Qt.ItemDataRole.UserRole) == task.thumbnail_url:
+                continue  # 已显示
+            pixmap = self.thumbnails.get(task.thumbnail_url)
+            if pixmap is None:
+                wanted.add(task.thumbnail_url)
+            else:
+                item.setIcon(QIcon(pixmap))
+                item.setData(Qt.ItemDataRole.UserRole, task.thumbnail_url)
+        self.thumbnails.set_wanted(wanted)
+
+    def _on_task_transition(self, task, old, new):
+        """下载器状态转换回调：维护搜索索引，任务完成时记录一次通知"""
+        if new is None:
+            self.search_index.remove(task.url)
+        else:
+            self.search_index.update(task.url, url=task.url, host=url_host(task.url), status=new.value)
+        if task.finished and new is not None:
+            # 结束的任务已写入历史记录
+            self._index_history_record(task.url, task.filename, new.value)
+        self._refilter()
+        if new == TaskStatus.COMPLETED:
+            self.pending_notifications.append(task.filename)
+
+    def _show_pending_notifications(self):
+        """显示下载完成通知"""
+        notifications, self.pending_notifications = self.pending_notifications, []
+        if not self.config.enable_tray_notifications:
+            return
+        for filename in notifications:
+            self.tray_icon.showMessage(
+                "下载完成",
+                f"文件 {filename} 已下载完成",
+                QSystemTrayIcon.MessageIcon.Information,
+                3000
+            )
+
+    def _remove_evicted_rows(self):
+        """删除已被下载器移出内存的任务所在的行"""
+        evicted = set(self.downloader.take_evicted())
+        if not evicted:
+            return
+        # 从后往前删除，避免行号变化
+        for row in range(self.task_table.rowCount() - 1, -1, -1):
+            url = self.task_table.item(row, 0).text()
+            if url in evicted and not self.downloader.get_task(url) and not self._is_history_row(row):
+                self.task_table.removeRow(row)
+                self.archived_count += 1
 
     def _get_status_color(self, status: TaskStatus) -> QColor:
         """获取任务状态对应的颜色"""
@@ -500,6 +712,7 @@ class MainWindow(QMainWindow):
             TaskStatus.PAUSED: QColor(128, 128, 0),     # 黄色
             TaskStatus.CANCELLED: QColor(128, 128, 128), # 灰色
             TaskStatus.PENDING: QColor(0, 0, 0),        # 黑色
+            TaskStatus.POSTPROCESSING: QColor(0, 128, 128), # 青色
         }
         return colors.get(status, QColor(0, 0, 0))
 
@@ -510,12 +723,29 @@ class MainWindow(QMainWindow):
         if dialog.exec():
             # 更新下载器配置
             self.downloader.update_config(self.config)
+            log_manager.set_levels(self.config.log_level, self.config.log_component_levels)
 
     def show_history(self):
         """显示下载历史"""
         from ui.history_dialog import HistoryDialog
         dialog = HistoryDialog(
             redownload_callback=self.add_download_task,
+            thumbnails=self.thumbnails,
             parent=self
         )
-        dialog.exec()
\ No newline at end of file
+        dialog.exec()
+
+    def dump_profile_report(self):
+        """导出性能分析报告"""
+        if not profiler.enabled:
+            QMessageBox.information(
+                self, "提示",
+                "性能分析未开启，请在设置中启用或设置环境变量 VIDEO_DOWNLOADER_PROFILE=1 后重启"
+            )
+            return
+        try:
+            path = profiler.dump()
+        except OSError as e:
+            QMessageBox.critical(self, "错误", f"导出性能报告失败: {str(e)}")
+            return
+        QMessageBox.information(self, "提示", f"性能报告已保存到:\n{path}")
\ No newline at end of file
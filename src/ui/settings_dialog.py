@@ -1,9 +1,12 @@
+from dataclasses import asdict
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel,
     QLineEdit, QCheckBox, QPushButton, QFileDialog,
-    QComboBox, QGroupBox, QSpinBox
+    QComboBox, QGroupBox, QSpinBox, QPlainTextEdit, QMessageBox
 )
 from utils.config import AppConfig
+from utils.schedule import ScheduleWindow
+from utils.logs import LEVELS, format_component_levels, parse_component_levels
 
 class SettingsDialog(QDialog):
     def __init__(self, config: AppConfig, parent=None):
@@ -32,7 +35,9 @@ class SettingsDialog(QDialog):
         format_layout = QHBoxLayout()
         format_layout.addWidget(QLabel("首选格式:"))
         self.format_combo = QComboBox()
+        self.format_combo.setEditable(True)  # 也可以直接填写yt-dlp格式选择器
         self.format_combo.addItems([
+            "1080p",
             "720p",      # 默认720p
             "480p",      # 清晰度适中
             "360p",      # 流畅
@@ -42,8 +47,47 @@ class SettingsDialog(QDialog):
         self.format_combo.setCurrentText(self.config.preferred_format)
         format_layout.addWidget(self.format_combo)
         
+        # 暂存目录
+        staging_layout = QHBoxLayout()
+        staging_layout.addWidget(QLabel("暂存目录:"))
+        self.staging_edit = QLineEdit(self.config.staging_dir)
+        self.staging_edit.setPlaceholderText("为空时直接下载到保存路径")
+        staging_layout.addWidget(self.staging_edit)
+        staging_browse_btn = QPushButton("浏览")
+        staging_browse_btn.clicked.connect(self.browse_staging_path)
+        staging_layout.addWidget(staging_browse_btn)
+        
+        # 最小剩余空间
+        free_space_layout = QHBoxLayout()
+        free_space_layout.addWidget(QLabel("最小剩余空间(MB):"))
+        self.free_space_spin = QSpinBox()
+        self.free_space_spin.setRange(0, 1024 * 1024)
+        self.free_space_spin.setValue(self.config.min_free_space_mb)
+        free_space_layout.addWidget(self.free_space_spin)
+        
+        # 单个任务下载量上限
+        task_size_layout = QHBoxLayout()
+        task_size_layout.addWidget(QLabel("单个任务大小上限(MB):"))
+        self.task_size_spin = QSpinBox()
+        self.task_size_spin.setRange(0, 1024 * 1024)
+        self.task_size_spin.setValue(self.config.max_task_size_mb)
+        self.task_size_spin.setSpecialValueText("不限制")
+        self.task_size_spin.setToolTip("按估计大小选择不超过上限的最高清晰度")
+        task_size_layout.addWidget(self.task_size_spin)
+        
         download_layout.addLayout(path_layout)
         download_layout.addLayout(format_layout)
+        download_layout.addLayout(staging_layout)
+        download_layout.addLayout(free_space_layout)
+        download_layout.addLayout(task_size_layout)
+        
+        # 完整性校验
+        self.validate_downloads = QCheckBox("下载完成后用ffprobe检查文件，损坏或不完整时自动重新下载")
+        self.validate_downloads.setChecked(self.config.validate_downloads)
+        self.deduplicate_files = QCheckBox("与已下载文件内容相同时替换为硬链接以节省空间")
+        self.deduplicate_files.setChecked(self.config.deduplicate_files)
+        download_layout.addWidget(self.validate_downloads)
+        download_layout.addWidget(self.deduplicate_files)
         download_group.setLayout(download_layout)
         
         # 代理设置组
@@ -58,8 +102,14 @@ class SettingsDialog(QDialog):
         self.proxy_edit = QLineEdit(self.config.proxy_url)
         proxy_input_layout.addWidget(self.proxy_edit)
         
+        # 代理池
+        self.proxy_pool_edit = QPlainTextEdit("\n".join(self.config.proxy_pool))
+        self.proxy_pool_edit.setPlaceholderText("更多代理，每行一个，按实测速度自动轮换")
+        self.proxy_pool_edit.setFixedHeight(60)
+        
         proxy_layout.addWidget(self.enable_proxy)
         proxy_layout.addLayout(proxy_input_layout)
+        proxy_layout.addWidget(self.proxy_pool_edit)
         proxy_group.setLayout(proxy_layout)
         
         # 下载限制设置组
@@ -83,8 +133,40 @@ class SettingsDialog(QDialog):
         self.speed_spin.setSpecialValueText("不限制")
         speed_layout.addWidget(self.speed_spin)
         
+        # 后处理并发数
+        postprocess_layout = QHBoxLayout()
+        postprocess_layout.addWidget(QLabel("最大并发后处理数:"))
+        self.postprocess_spin = QSpinBox()
+        self.postprocess_spin.setRange(0, 64)
+        self.postprocess_spin.setValue(self.config.max_concurrent_postprocess)
+        self.postprocess_spin.setSpecialValueText("按CPU核数")
+        postprocess_layout.addWidget(self.postprocess_spin)
+        
+        # 保留的已结束任务数
+        retention_layout = QHBoxLayout()
+        retention_layout.addWidget(QLabel("列表中保留的已结束任务数:"))
+        self.retention_spin = QSpinBox()
+        self.retention_spin.setRange(10, 100000)
+        self.retention_spin.setValue(self.config.finished_task_retention)
+        retention_layout.addWidget(self.retention_spin)
+        
         limit_layout.addLayout(concurrent_layout)
         limit_layout.addLayout(speed_layout)
+        limit_layout.addLayout(postprocess_layout)
+        limit_layout.addLayout(retention_layout)
+        
+        # 带宽计划
+        limit_layout.addWidget(QLabel("带宽计划(不在任何时间段内时使用上面的设置):"))
+        self.schedule_edit = QPlainTextEdit("\n".join(
+            str(ScheduleWindow(**w)) for w in self.config.bandwidth_schedule
+        ))
+        self.schedule_edit.setPlaceholderText(
+            "每行一个时间段，如:\n"
+            "09:00-18:00 limit=2048 concurrent=2 days=1-5\n"
+            "01:00-07:00 limit=0 concurrent=8 offpeak"
+        )
+        self.schedule_edit.setFixedHeight(80)
+        limit_layout.addWidget(self.schedule_edit)
         limit_group.setLayout(limit_layout)
         
         # 界面设置组
@@ -100,11 +182,77 @@ class SettingsDialog(QDialog):
         self.minimize_tray = QCheckBox("最小化到托盘")
         self.minimize_tray.setChecked(self.config.minimize_to_tray)
         
+        self.show_thumbnails = QCheckBox("显示缩略图（重启后生效）")
+        self.show_thumbnails.setChecked(self.config.show_thumbnails)
+        
         ui_layout.addWidget(self.show_stats)
         ui_layout.addWidget(self.enable_notifications)
         ui_layout.addWidget(self.minimize_tray)
+        ui_layout.addWidget(self.show_thumbnails)
         ui_group.setLayout(ui_layout)
         
+        # 高级设置组
+        advanced_group = QGroupBox("高级设置")
+        advanced_layout = QVBoxLayout()
+        
+        # 指标端口
+        metrics_layout = QHBoxLayout()
+        metrics_layout.addWidget(QLabel("指标服务端口:"))
+        self.metrics_port_spin = QSpinBox()
+        self.metrics_port_spin.setRange(0, 65535)
+        self.metrics_port_spin.setValue(self.config.metrics_port)
+        self.metrics_port_spin.setSpecialValueText("关闭")
+        metrics_layout.addWidget(self.metrics_port_spin)
+        
+        # 性能分析
+        self.enable_profiling = QCheckBox("启用性能分析(重启后生效)")
+        self.enable_profiling.setChecked(self.config.enable_profiling)
+        
+        self.trace_memory = QCheckBox("记录内存分配(tracemalloc)")
+        self.trace_memory.setChecked(self.config.profiling_trace_memory)
+        
+        slow_layout = QHBoxLayout()
+        slow_layout.addWidget(QLabel("事件循环卡顿阈值(ms):"))
+        self.slow_callback_spin = QSpinBox()
+        self.slow_callback_spin.setRange(10, 10000)
+        self.slow_callback_spin.setValue(self.config.profiling_slow_callback_ms)
+        slow_layout.addWidget(self.slow_callback_spin)
+        
+        # 分布式模式
+        queue_layout = QHBoxLayout()
+        queue_layout.addWidget(QLabel("共享队列(重启后生效):"))
+        self.queue_edit = QLineEdit(self.config.distributed_queue)
+        self.queue_edit.setPlaceholderText("为空时在本机下载；填写共享的SQLite文件路径后由工作节点下载")
+        queue_layout.addWidget(self.queue_edit)
+        
+        # 批量获取视频信息
+        api_key_layout = QHBoxLayout()
+        api_key_layout.addWidget(QLabel("YouTube API密钥:"))
+        self.api_key_edit = QLineEdit(self.config.youtube_api_key)
+        self.api_key_edit.setPlaceholderText("可选，批量下载时一次获取多个视频的标题")
+        self.api_key_edit.setEchoMode(QLineEdit.EchoMode.Password)
+        api_key_layout.addWidget(self.api_key_edit)
+        
+        # 日志级别
+        log_layout = QHBoxLayout()
+        log_layout.addWidget(QLabel("日志级别:"))
+        self.log_level_combo = QComboBox()
+        self.log_level_combo.addItems(LEVELS)
+        self.log_level_combo.setCurrentText(self.config.log_level)
+        log_layout.addWidget(self.log_level_combo)
+        self.log_components_edit = QLineEdit(format_component_levels(self.config.log_component_levels))
+        self.log_components_edit.setPlaceholderText("按组件设置，如 ytdlp=DEBUG, distributed=WARNING")
+        log_layout.addWidget(self.log_components_edit)
+        
+        advanced_layout.addLayout(metrics_layout)
+        advanced_layout.addLayout(queue_layout)
+        advanced_layout.addLayout(api_key_layout)
+        advanced_layout.addLayout(log_layout)
+        advanced_layout.addWidget(self.enable_profiling)
+        advanced_layout.addWidget(self.trace_memory)
+        advanced_layout.addLayout(slow_layout)
+        advanced_group.setLayout(advanced_layout)
+        
         # 按钮
         btn_layout = QHBoxLayout()
         save_btn = QPushButton("保存")
@@ -119,6 +267,7 @@ class SettingsDialog(QDialog):
         layout.addWidget(proxy_group)
         layout.addWidget(limit_group)
         layout.addWidget(ui_group)
+        layout.addWidget(advanced_group)
         layout.addLayout(btn_layout)
         
     def browse_path(self):
@@ -126,16 +275,53 @@ class SettingsDialog(QDialog):
         if path:
             self.path_edit.setText(path)
             
+    def browse_staging_path(self):
+        path = QFileDialog.getExistingDirectory(self, "选择暂存目录")
+        if path:
+            self.staging_edit.setText(path)
+            
     def save_settings(self):
+        try:
+            schedule = [
+                ScheduleWindow.parse(line) for line in self.schedule_edit.toPlainText().splitlines() if line.strip()
+            ]
+        except ValueError as e:
+            QMessageBox.warning(self, "带宽计划", str(e))
+            return
+        self.config.bandwidth_schedule = [asdict(window) for window in schedule]
+        try:
+            self.config.log_component_levels = parse_component_levels(self.log_components_edit.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "日志级别", str(e))
+            return
+        self.config.log_level = self.log_level_combo.currentText()
+        
         self.config.default_save_path = self.path_edit.text()
         self.config.preferred_format = self.format_combo.currentText()
+        self.config.staging_dir = self.staging_edit.text()
+        self.config.min_free_space_mb = self.free_space_spin.value()
+        self.config.max_task_size_mb = self.task_size_spin.value()
+        self.config.validate_downloads = self.validate_downloads.isChecked()
+        self.config.deduplicate_files = self.deduplicate_files.isChecked()
         self.config.enable_proxy = self.enable_proxy.isChecked()
         self.config.proxy_url = self.proxy_edit.text()
+        self.config.proxy_pool = [
+            line.strip() for line in self.proxy_pool_edit.toPlainText().splitlines() if line.strip()
+        ]
         self.config.max_concurrent_downloads = self.concurrent_spin.value()
         self.config.download_speed_limit = self.speed_spin.value()
+        self.config.max_concurrent_postprocess = self.postprocess_spin.value()
+        self.config.finished_task_retention = self.retention_spin.value()
         self.config.show_task_stats = self.show_stats.isChecked()
         self.config.enable_tray_notifications = self.enable_notifications.isChecked()
         self.config.minimize_to_tray = self.minimize_tray.isChecked()
+        self.config.show_thumbnails = self.show_thumbnails.isChecked()
+        self.config.metrics_port = self.metrics_port_spin.value()
+        self.config.distributed_queue = self.queue_edit.text().strip()
+        self.config.youtube_api_key = self.api_key_edit.text().strip()
+        self.config.enable_profiling = self.enable_profiling.isChecked()
+        self.config.profiling_trace_memory = self.trace_memory.isChecked()
+        self.config.profiling_slow_callback_ms = self.slow_callback_spin.value()
         
         self.config.save()
         self.accept() 
\ No newline at end of file
@@ -0,0 +1,50 @@
+import os
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QPushButton
+)
+from PyQt6.QtCore import QUrl
+from PyQt6.QtGui import QDesktopServices
+from utils.logs import log_manager
+
+class TaskLogDialog(QDialog):
+    """查看单个任务最近的日志，更早的记录在日志文件中"""
+    def __init__(self, url: str, parent=None):
+        super().__init__(parent)
+        self.url = url
+        self.init_ui()
+        self.load_logs()
+
+    def init_ui(self):
+        self.setWindowTitle(f"任务日志 - {self.url}")
+        self.setGeometry(200, 200, 800, 400)
+
+        layout = QVBoxLayout(self)
+
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        layout.addWidget(self.text)
+
+        btn_layout = QHBoxLayout()
+        open_btn = QPushButton("打开日志文件夹")
+        refresh_btn = QPushButton("刷新")
+        close_btn = QPushButton("关闭")
+
+        open_btn.clicked.connect(self.open_log_folder)
+        refresh_btn.clicked.connect(self.load_logs)
+        close_btn.clicked.connect(self.accept)
+
+        btn_layout.addWidget(open_btn)
+        btn_layout.addWidget(refresh_btn)
+        btn_layout.addWidget(close_btn)
+
+        layout.addLayout(btn_layout)
+
+    def load_logs(self):
+        """加载内存中保留的日志"""
+        lines = log_manager.task_logs.lines(self.url)
+        self.text.setPlainText("\n".join(lines) if lines else "没有该任务的日志，已移出列表的任务请查看日志文件")
+
+    def open_log_folder(self):
+        if log_manager.journal_path:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(os.path.dirname(log_manager.journal_path)))
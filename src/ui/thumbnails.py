@@ -0,0 +1,125 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice, QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap
+from utils.thumbnails import ThumbnailStore
+
+THUMBNAIL_WIDTH = 96
+THUMBNAIL_HEIGHT = 54
+
+def _downscale(data: bytes) -> Optional[bytes]:
+    """把原图缩小并重新编码为JPEG，无法解码时返回None；QImage可以在非界面线程使用"""
+    image = QImage.fromData(data)
+    if image.isNull():
+        return None
+    image = image.scaled(THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT, Qt.AspectRatioMode.KeepAspectRatio,
+                         Qt.TransformationMode.SmoothTransformation)
+    output = QByteArray()
+    buffer = QBuffer(output)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, "JPEG", 85)
+    return bytes(output)
+
+def visible_rows(table) -> range:
+    """表格视口中可见的行号范围（可能包含隐藏行），视口尚未布局时为空"""
+    height = table.viewport().height()
+    first = table.rowAt(0)
+    if height <= 0 or first < 0:
+        return range(0)
+    last = table.rowAt(height - 1)
+    if last < 0:  # 表格内容比视口短
+        last = table.rowCount() - 1
+    return range(first, last + 1)
+
+class _LoadSignals(QObject):
+    # 地址, 缩小后的图片数据(失败时为None), 是否因已不可见而跳过
+    finished = pyqtSignal(str, object, bool)
+
+class _LoadJob(QRunnable):
+    """在线程池中加载一张缩略图，结果通过信号回到界面线程"""
+    def __init__(self, loader: 'ThumbnailLoader', url: str):
+        super().__init__()
+        self.loader = loader
+        self.url = url
+
+    def run(self):
+        if not self.loader.is_wanted(self.url):
+            self.loader._signals.finished.emit(self.url, None, True)
+            return
+        self.loader._signals.finished.emit(self.url, self.loader._load_scaled(self.url), False)
+
+class ThumbnailLoader(QObject):
+    """异步加载缩略图，供任务列表和历史记录显示
+
+    内存中按LRU保留最近使用的图片；未命中时在专用的 QThreadPool 中依次查磁盘缓存、下载并缩小，
+    界面线程只做缩略图大小的 QPixmap 转换。加载不依赖asyncio事件循环，模态对话框打开期间也能进行。
+    同时进行的加载数为线程池大小，等待中的请求在轮到时已不被任何视图需要就直接放弃。
+    """
+    loaded = pyqtSignal(str)
+
+    def __init__(self, fetch: Callable[[str], bytes], store: Optional[ThumbnailStore] = None,
+                 max_concurrent: int = 4, memory_entries: int = 500, parent=None):
+        super().__init__(parent)
+        self.fetch = fetch  # 在线程池中调用，返回原图数据
+        self.store = store or ThumbnailStore()
+        self.memory_entries = memory_entries
+        self._pixmaps: OrderedDict = OrderedDict()
+        self._failed: Set[str] = set()  # 下载或解码失败的地址，本次运行不再尝试
+        self._pending: Set[str] = set()
+        self._wanted: Dict[str, Set[str]] = {}  # 视图名 -> 该视图可见行需要的地址
+        self._wanted_lock = threading.Lock()  # 加载线程也会读取
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max_concurrent)
+        self._signals = _LoadSignals(self)
+        self._signals.finished.connect(self._on_finished)
+
+    def get(self, url: str) -> Optional[QPixmap]:
+        """内存中已有时返回图片，不触发加载"""
+        pixmap = self._pixmaps.get(url)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(url)
+        return pixmap
+
+    def set_wanted(self, urls: Set[str], view: str = "tasks") -> None:
+        """某个视图当前可见行需要的缩略图，不再被任何视图需要的等待中请求在轮到时放弃"""
+        with self._wanted_lock:
+            self._wanted[view] = set(urls)
+        for url in urls:
+            if url not in self._pixmaps and url not in self._pending and url not in self._failed:
+                self._pending.add(url)
+                self._pool.start(_LoadJob(self, url))
+
+    def is_wanted(self, url: str) -> bool:
+        with self._wanted_lock:
+            return any(url in urls for urls in self._wanted.values())
+
+    def _on_finished(self, url: str, data: Optional[bytes], skipped: bool):
+        self._pending.discard(url)
+        if skipped:
+            return
+        if not data:
+            self._failed.add(url)
+            return
+        pixmap = QPixmap()
+        pixmap.loadFromData(data)
+        self._pixmaps[url] = pixmap
+        while len(self._pixmaps) > self.memory_entries:
+            self._pixmaps.popitem(last=False)
+        self.loaded.emit(url)
+
+    def _load_scaled(self, url: str) -> Optional[bytes]:
+        """在线程池中运行：读磁盘缓存，未命中时下载、缩小并写入缓存"""
+        data = self.store.get(url)
+        if data:
+            return data
+        try:
+            data = _downscale(self.fetch(url))
+        except Exception:
+            return None
+        if data:
+            try:
+                self.store.put(url, data)
+            except OSError:
+                pass
+        return data
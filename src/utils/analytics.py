@@ -0,0 +1,131 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+from utils.history import DownloadHistory
+
+@dataclass
+class HostDayBytes:
+    day: str    # YYYY-MM-DD，按结束时间
+    host: str
+    downloads: int
+    bytes: int
+
+@dataclass
+class ExtractorSuccess:
+    extractor: str
+    finished: int   # 完成、失败和取消的总数
+    completed: int
+    errors: int
+
+    @property
+    def success_rate(self) -> float:
+        return self.completed / self.finished if self.finished else 0.0
+
+@dataclass
+class CompletionTimes:
+    host: str   # "*" 表示全部主机
+    count: int
+    p50: float  # 完成耗时(秒)
+    p95: float
+
+def _since_clause(since: Optional[datetime]) -> Tuple[str, tuple]:
+    return ("AND start_time >= ?", (since.isoformat(),)) if since else ("", ())
+
+def _fetch_chunks(cursor, chunk_size: int = 1000) -> Iterator[tuple]:
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from rows
+
+def bytes_per_host_per_day(conn, since: Optional[datetime] = None) -> Iterator[HostDayBytes]:
+    """每天每个主机完成的下载量"""
+    where, params = _since_clause(since)
+    cursor = conn.execute(f"""
+        SELECT substr(end_time, 1, 10) AS day, COALESCE(host, ''), COUNT(*), COALESCE(SUM(file_size), 0)
+        FROM all_downloads
+        WHERE status = 'completed' AND end_time IS NOT NULL {where}
+        GROUP BY day, host
+        ORDER BY day, host
+    """, params)
+    for row in _fetch_chunks(cursor):
+        yield HostDayBytes(*row)
+
+def success_rate_by_extractor(conn, since: Optional[datetime] = None) -> Iterator[ExtractorSuccess]:
+    """每个提取器已结束任务中完成和失败的数量"""
+    where, params = _since_clause(since)
+    cursor = conn.execute(f"""
+        SELECT COALESCE(NULLIF(extractor, ''), 'unknown') AS name, COUNT(*),
+               SUM(status = 'completed'), SUM(status = 'error')
+        FROM all_downloads
+        WHERE status IN ('completed', 'error', 'cancelled') {where}
+        GROUP BY name
+        ORDER BY COUNT(*) DESC
+    """, params)
+    for row in _fetch_chunks(cursor):
+        yield ExtractorSuccess(*row)
+
+def completion_percentiles(conn, since: Optional[datetime] = None) -> Iterator[CompletionTimes]:
+    """已完成任务耗时的p50/p95，按主机和全部主机分别计算
+
+    用窗口函数按耗时排序编号，取最近秩 ceil(p*n) 处的值，不把耗时读到Python中排序。
+    """
+    where, params = _since_clause(since)
+    cursor = conn.execute(f"""
+        WITH done AS (
+            SELECT COALESCE(host, '') AS host, duration FROM all_downloads
+            WHERE status = 'completed' AND duration IS NOT NULL {where}
+        ),
+        grouped AS (
+            SELECT host, duration FROM done
+            UNION ALL
+            SELECT '*', duration FROM done
+        ),
+        ranked AS (
+            SELECT host, duration,
+                   ROW_NUMBER() OVER (PARTITION BY host ORDER BY duration) AS rank,
+                   COUNT(*) OVER (PARTITION BY host) AS n
+            FROM grouped
+        )
+        SELECT host, n,
+               MAX(CASE WHEN rank = (n * 50 + 99) / 100 THEN duration END),
+               MAX(CASE WHEN rank = (n * 95 + 99) / 100 THEN duration END)
+        FROM ranked
+        GROUP BY host
+        ORDER BY host = '*' DESC, n DESC
+    """, params)
+    for row in _fetch_chunks(cursor):
+        yield CompletionTimes(*row)
+
+@dataclass
+class HistoryReport:
+    since: Optional[datetime] = None
+    host_days: List[HostDayBytes] = field(default_factory=list)
+    extractors: List[ExtractorSuccess] = field(default_factory=list)
+    completion: List[CompletionTimes] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        mb = 1024 * 1024
+        lines = [f"统计范围: {self.since:%Y-%m-%d} 起" if self.since else "统计范围: 全部记录", "每天各主机下载量:"]
+        for item in self.host_days:
+            lines.append(f"  {item.day} {item.host or '-'}: {item.downloads} 个, {item.bytes / mb:.1f} MB")
+        lines.append("各提取器成功率:")
+        for item in self.extractors:
+            lines.append(f"  {item.extractor}: {item.success_rate:.1%} "
+                         f"(完成 {item.completed}, 失败 {item.errors}, 共 {item.finished})")
+        lines.append("完成耗时:")
+        for item in self.completion:
+            name = "全部" if item.host == "*" else item.host or "-"
+            lines.append(f"  {name}: p50 {item.p50:.1f} 秒, p95 {item.p95:.1f} 秒 ({item.count} 个)")
+        return "\n".join(lines)
+
+def build_report(history: DownloadHistory, since: Optional[datetime] = None,
+                 include_archive: bool = True) -> HistoryReport:
+    """在一个连接中计算全部统计，结果行数只与主机、天数和提取器数有关"""
+    with history.analytics_connection(include_archive) as conn:
+        return HistoryReport(
+            since=since,
+            host_days=list(bytes_per_host_per_day(conn, since)),
+            extractors=list(success_rate_by_extractor(conn, since)),
+            completion=list(completion_percentiles(conn, since)),
+        )
@@ -1,17 +1,27 @@
 import json
 import os
-from dataclasses import dataclass, asdict
-from typing import Optional
+from dataclasses import dataclass, asdict, field
+from typing import Dict, List, Optional
 
 @dataclass
 class AppConfig:
     # 下载设置
     default_save_path: str = ""
-    preferred_format: str = "best"
+    preferred_format: str = "best"  # "1080p"/"720p"等目标清晰度、"best"、"worst"，或yt-dlp格式选择器
+    max_task_size_mb: int = 0  # 单个任务的下载量上限，超出时降低清晰度，0表示不限制
+    staging_dir: str = ""  # 本地暂存目录，为空时直接写入保存路径
+    min_free_space_mb: int = 500  # 下载前预留后至少保留的剩余空间
+    validate_downloads: bool = False  # 完成后用ffprobe检查文件，不完整的自动重新下载
+    deduplicate_files: bool = False  # 与已下载文件内容相同时替换为硬链接
     
     # 代理设置
     enable_proxy: bool = False
     proxy_url: str = ""
+    proxy_pool: List[str] = field(default_factory=list)  # 额外代理，与 proxy_url 一起轮换
+    proxy_probe_url: str = "https://www.youtube.com"
+    
+    # 平台设置
+    youtube_api_key: str = ""  # 填写后批量任务通过 YouTube Data API 一次获取多个视频的标题
     
     # 窗口设置
     window_x: int = 100
@@ -22,11 +32,38 @@ class AppConfig:
     # 下载限制
     max_concurrent_downloads: int = 3
     download_speed_limit: int = 0  # 0表示不限速，单位KB/s
+    max_concurrent_postprocess: int = 0  # 0表示按CPU核数
+    finished_task_retention: int = 1000  # 内存和列表中保留的已结束任务数，更早的只保存在历史记录中
+    # 按时间段的限速和并发设置，每项为 ScheduleWindow 的字段，如
+    # {"start": "22:00", "end": "06:00", "speed_limit": 0, "max_concurrent": 6, "off_peak": true}
+    bandwidth_schedule: List[dict] = field(default_factory=list)
     
     # 界面设置
     show_task_stats: bool = True
     enable_tray_notifications: bool = True
     minimize_to_tray: bool = True
+    show_thumbnails: bool = True  # 任务列表和历史记录中显示缩略图，重启后生效
+    thumbnail_cache_mb: int = 100  # 缩略图磁盘缓存上限(~/.video_downloader/thumbnails)
+    
+    # 分布式模式
+    distributed_queue: str = ""  # 共享队列的SQLite文件路径，非空时任务交给工作节点(src/worker.py)执行
+    worker_lease_seconds: int = 60
+    
+    # 监控设置
+    metrics_port: int = 0  # 本地Prometheus指标端口，0表示关闭
+    enable_profiling: bool = False  # 也可通过环境变量 VIDEO_DOWNLOADER_PROFILE=1 开启
+    profiling_slow_callback_ms: int = 100
+    profiling_trace_memory: bool = False
+    
+    # 日志设置（日志文件位于 ~/.video_downloader/logs）
+    log_level: str = "INFO"
+    # 按组件单独设置级别，如 {"ytdlp": "DEBUG", "distributed": "WARNING"}
+    log_component_levels: Dict[str, str] = field(default_factory=dict)
+    log_max_mb: int = 10  # 单个日志文件的大小上限，超出后轮转
+    log_backups: int = 5
+    
+    # 历史记录
+    history_archive_days: int = 0  # 启动时把早于该天数的已结束记录移到归档库，0表示不自动归档
     
     @classmethod
     def load(cls) -> 'AppConfig':
@@ -0,0 +1,207 @@
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+_HEIGHT_PATTERN = re.compile(r"^(\d{3,4})p$")
+
+# 音频至少取这个码率(kbps)，再低音质损失明显
+MIN_AUDIO_BITRATE = 96
+
+@dataclass
+class FormatTarget:
+    """preferred_format 解析后的目标"""
+    max_height: Optional[int] = None  # None表示最高清晰度
+    worst: bool = False
+    selector: str = ""                # 用户直接填写的yt-dlp格式选择器，原样使用
+
+def parse_target(preferred: str) -> FormatTarget:
+    """把设置中的 "720p"/"best"/"worst" 或自定义选择器解析为目标"""
+    preferred = (preferred or "best").strip()
+    match = _HEIGHT_PATTERN.match(preferred)
+    if match:
+        return FormatTarget(max_height=int(match.group(1)))
+    if preferred == "best":
+        return FormatTarget()
+    if preferred == "worst":
+        return FormatTarget(worst=True)
+    return FormatTarget(selector=preferred)
+
+def fallback_selector(target: FormatTarget) -> str:
+    """元数据中没有可用格式列表时交给yt-dlp的等价选择器"""
+    if target.selector:
+        return target.selector
+    if target.worst:
+        return "worstvideo+worstaudio/worst"
+    if target.max_height:
+        h = target.max_height
+        return f"bestvideo[height<={h}]+bestaudio/best[height<={h}]/best"
+    return "bestvideo+bestaudio/best"
+
+@dataclass
+class FormatDecision:
+    """一次格式选择的结果和理由"""
+    formats: List[dict]
+    height: int
+    estimated_bytes: int
+    reason: str
+
+    @property
+    def selector(self) -> str:
+        return "+".join(str(f.get("format_id")) for f in self.formats)
+
+def _bitrate(fmt: dict) -> float:
+    """格式码率(kbps)，未知时返回0"""
+    return fmt.get("tbr") or (fmt.get("vbr") or 0) + (fmt.get("abr") or 0)
+
+def _estimated_bytes(fmt: dict, duration: Optional[float]) -> int:
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if size:
+        return int(size)
+    if duration and _bitrate(fmt):
+        return int(_bitrate(fmt) * 1000 / 8 * duration)
+    return 0
+
+def _has_video(fmt: dict) -> bool:
+    return fmt.get("vcodec") not in (None, "none") and bool(fmt.get("height"))
+
+def _has_audio(fmt: dict) -> bool:
+    return fmt.get("acodec") not in (None, "none")
+
+def _audio_only(fmt: dict) -> bool:
+    if fmt.get("vcodec") == "none":
+        return True
+    return fmt.get("vcodec") is None and _has_audio(fmt) and not fmt.get("height")
+
+def video_then_audio(streams: List[dict]) -> Optional[List[dict]]:
+    """把要合并的两个流按 视频、音频 排序，合并时按此顺序映射；不是一个视频加一个纯音频时返回None
+
+    yt-dlp的 requested_formats 按选择器的书写顺序排列，bestaudio+bestvideo 会把音频放在前面。
+    """
+    if len(streams) != 2:
+        return None
+    first, second = streams
+    if _audio_only(second) and not _audio_only(first):
+        return [first, second]
+    if _audio_only(first) and not _audio_only(second):
+        return [second, first]
+    return None
+
+def _codec(fmt: dict) -> str:
+    return (fmt.get("vcodec") or "").split(".")[0]
+
+def _language_preference(fmt: dict) -> int:
+    # yt-dlp为原始语言的音轨设置较高的 language_preference，配音音轨较低，未标注为-1
+    preference = fmt.get("language_preference")
+    return -1 if preference is None else preference
+
+def _preferred_language(formats: List[dict]) -> List[dict]:
+    """只保留语言优先级最高的格式，避免在有多条音轨的视频上选中配音"""
+    if not formats:
+        return formats
+    top = max(_language_preference(f) for f in formats)
+    return [f for f in formats if _language_preference(f) == top]
+
+def _pick_audio(audios: List[dict]) -> Optional[dict]:
+    """码率达到下限的音频中取最小的，都达不到时取码率最高的"""
+    if not audios:
+        return None
+    enough = [a for a in audios if _bitrate(a) >= MIN_AUDIO_BITRATE]
+    if enough:
+        return min(enough, key=_bitrate)
+    return max(audios, key=_bitrate)
+
+def _candidates(formats: List[dict], duration: Optional[float]) -> List[Tuple[int, float, int, List[dict]]]:
+    """所有可下载的组合：(高度, 帧率, 估计字节数, 格式列表)
+
+    与yt-dlp的默认选择器一样跳过有DRM的格式；带音频的格式优先原始语言。
+    """
+    formats = [f for f in formats if not f.get("has_drm")]
+    videos = [f for f in formats if _has_video(f) and not _has_audio(f)]
+    with_audio = _preferred_language([f for f in formats if _has_audio(f)])
+    audios = [f for f in with_audio if not _has_video(f)]
+    progressive = [f for f in with_audio if _has_video(f)]
+    audio = _pick_audio(audios)
+
+    combos = []
+    if audio:
+        for video in videos:
+            size = _estimated_bytes(video, duration) + _estimated_bytes(audio, duration)
+            combos.append((video["height"], video.get("fps") or 0, size, [video, audio]))
+    for fmt in progressive:
+        combos.append((fmt["height"], fmt.get("fps") or 0, _estimated_bytes(fmt, duration), [fmt]))
+    return combos
+
+def _size_key(size: int) -> float:
+    # 大小未知的排在已知的后面
+    return size if size else float("inf")
+
+def resolve_format(formats: List[dict], target: FormatTarget, duration: Optional[float] = None,
+                   byte_budget: int = 0) -> Optional[FormatDecision]:
+    """按目标清晰度选择传输量最小的格式组合
+
+    先确定目标下可达到的最高清晰度（和该清晰度下的最高帧率），再在满足条件的组合中
+    取估计字节数最小的，同一分辨率下会自然选中压缩效率更高的编码；超出字节预算时逐级降低清晰度。
+    无法决定时返回None，由yt-dlp按等价选择器处理。
+    """
+    if target.selector:
+        return None
+    combos = _candidates(formats, duration)
+    if not combos:
+        return None
+
+    heights = sorted({c[0] for c in combos}, reverse=True)
+    if target.worst:
+        ladder = sorted(heights)[:1]
+    elif target.max_height:
+        ladder = [h for h in heights if h <= target.max_height] or heights[-1:]
+    else:
+        ladder = heights
+
+    notes = []
+    for height in ladder:
+        at_height = [c for c in combos if c[0] == height]
+        max_fps = max(c[1] for c in at_height)
+        best = min((c for c in at_height if c[1] == max_fps), key=lambda c: _size_key(c[2]))
+        if byte_budget and best[2] > byte_budget and height != ladder[-1]:
+            notes.append(f"{height}p 约{best[2] / 1024 / 1024:.0f}MB 超出预算")
+            continue
+        break
+
+    _, fps, size, chosen = best
+    alternatives = [c for c in at_height if c[1] == max_fps and c is not best and c[2]]
+    summary = f"{height}p{int(fps) if fps > 30 else ''} {_codec(chosen[0]) or '未知编码'}"
+    if len(chosen) > 1:
+        summary += f" + {(chosen[1].get('acodec') or '').split('.')[0]} {_bitrate(chosen[1]):.0f}kbps"
+    reason = [summary]
+    reason.append(f"约{size / 1024 / 1024:.0f}MB" if size else "大小未知")
+    if alternatives and size:
+        largest = max(alternatives, key=lambda c: c[2])
+        if largest[2] > size:
+            reason.append(f"比 {_codec(largest[3][0])} 少 {(1 - size / largest[2]) * 100:.0f}%")
+    if byte_budget and size > byte_budget:
+        notes.append("最低清晰度仍超出预算")
+    reason.extend(notes)
+    return FormatDecision(formats=chosen, height=height, estimated_bytes=size, reason="，".join(reason))
+
+class InfoCache:
+    """缓存解析得到的视频信息，列出格式和开始下载共用一次解析
+
+    格式中的下载地址通常有时效且可能绑定请求时的出口IP，按 (URL, 代理) 缓存，取出即删除，重试时重新解析。
+    """
+    def __init__(self, ttl: float = 600.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[str, str], Tuple[float, dict]] = {}
+
+    def put(self, url: str, proxy: Optional[str], info: dict) -> None:
+        if len(self._entries) >= self.max_entries:
+            oldest = min(self._entries, key=lambda k: self._entries[k][0])
+            del self._entries[oldest]
+        self._entries[(url, proxy or "")] = (time.monotonic(), info)
+
+    def pop(self, url: str, proxy: Optional[str]) -> Optional[dict]:
+        entry = self._entries.pop((url, proxy or ""), None)
+        if entry and time.monotonic() - entry[0] <= self.ttl:
+            return entry[1]
+        return None
@@ -1,8 +1,21 @@
 import sqlite3
 import os
+import json
+from contextlib import contextmanager
 from datetime import datetime
-from dataclasses import dataclass
-from typing import List, Optional
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional
+from utils.network import url_host
+from utils.profiler import profiled
+
+_SELECT_COLUMNS = """
+    url, filename, save_path, start_time, end_time,
+    status, error_message, file_size, phase_timings, content_hash, format_info, thumbnail_url,
+    extractor
+"""
+# 表中保存的全部列，归档时按此顺序整行复制
+_STORED_COLUMNS = _SELECT_COLUMNS.strip() + ", host"
+FINISHED_STATUSES = ("completed", "error", "cancelled")
 
 @dataclass
 class DownloadRecord:
@@ -14,17 +27,30 @@ class DownloadRecord:
     status: str = "pending"
     error_message: str = ""
     file_size: int = 0
+    phase_timings: Dict[str, float] = field(default_factory=dict)  # 各阶段耗时(秒)
+    content_hash: str = ""  # 成品文件的sha256
+    format_info: str = ""   # 选中的格式及选择理由
+    thumbnail_url: str = ""
+    extractor: str = ""     # yt-dlp提取器，如 Youtube
     
 class DownloadHistory:
-    def __init__(self):
-        self.db_path = os.path.join(os.path.expanduser("~"), ".video_downloader", "history.db")
+    # 等待其他连接（如归档）释放写锁的秒数，超时抛出 sqlite3.OperationalError("database is locked")
+    BUSY_TIMEOUT = 5.0
+    
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.path.join(os.path.expanduser("~"), ".video_downloader", "history.db")
+        # 归档库与主库同目录，结构相同，只在导出和统计时读取
+        self.archive_path = os.path.splitext(self.db_path)[0] + "-archive.db"
         self._init_db()
         
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=self.BUSY_TIMEOUT)
+        
     def _init_db(self):
         """初始化数据库"""
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS downloads (
                     url TEXT PRIMARY KEY,
@@ -38,12 +64,47 @@ class DownloadHistory:
                 )
             """)
             
+            # 旧版本数据库补充新增列
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(downloads)")}
+            if "phase_timings" not in columns:
+                conn.execute("ALTER TABLE downloads ADD COLUMN phase_timings TEXT")
+            if "content_hash" not in columns:
+                conn.execute("ALTER TABLE downloads ADD COLUMN content_hash TEXT")
+            if "format_info" not in columns:
+                conn.execute("ALTER TABLE downloads ADD COLUMN format_info TEXT")
+            if "thumbnail_url" not in columns:
+                conn.execute("ALTER TABLE downloads ADD COLUMN thumbnail_url TEXT")
+            if "extractor" not in columns:
+                conn.execute("ALTER TABLE downloads ADD COLUMN extractor TEXT")
+            if "host" not in columns:
+                # 主机名单独成列，按主机统计时可以直接 GROUP BY
+                conn.execute("ALTER TABLE downloads ADD COLUMN host TEXT")
+                self._fill_hosts(conn)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_downloads_hash ON downloads(content_hash)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_downloads_start ON downloads(start_time)")
+    
+    @staticmethod
+    def _fill_hosts(conn, chunk_size: int = 1000):
+        """为旧记录补上主机名，分批读取"""
+        cursor = conn.execute("SELECT rowid, url FROM downloads WHERE host IS NULL")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            conn.executemany("UPDATE downloads SET host = ? WHERE rowid = ?",
+                             [(url_host(url), rowid) for rowid, url in rows])
+            
+    @profiled("history.add_record")
     def add_record(self, record: DownloadRecord):
         """添加下载记录"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.execute("""
-                INSERT OR REPLACE INTO downloads
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT OR REPLACE INTO downloads (
+                    url, filename, save_path, start_time, end_time,
+                    status, error_message, file_size, phase_timings, content_hash, format_info,
+                    thumbnail_url, extractor, host
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 record.url,
                 record.filename,
@@ -52,43 +113,155 @@ class DownloadHistory:
                 record.end_time.isoformat() if record.end_time else None,
                 record.status,
                 record.error_message,
-                record.file_size
+                record.file_size,
+                json.dumps(record.phase_timings),
+                record.content_hash,
+                record.format_info,
+                record.thumbnail_url,
+                record.extractor,
+                url_host(record.url)
             ))
             
     def get_records(self, limit: int = 100) -> List[DownloadRecord]:
         """获取下载记录"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.execute("""
-                SELECT * FROM downloads
+                SELECT {_SELECT_COLUMNS}
+                FROM downloads
                 ORDER BY start_time DESC
                 LIMIT ?
-            """, (limit,))
+            """.format(_SELECT_COLUMNS=_SELECT_COLUMNS), (limit,))
+            
+            return [self._row_to_record(row) for row in cursor.fetchall()]
             
-            return [
-                DownloadRecord(
-                    url=row[0],
-                    filename=row[1],
-                    save_path=row[2],
-                    start_time=datetime.fromisoformat(row[3]),
-                    end_time=datetime.fromisoformat(row[4]) if row[4] else None,
-                    status=row[5],
-                    error_message=row[6],
-                    file_size=row[7]
+    def iter_records(self) -> Iterator[DownloadRecord]:
+        """逐条读取全部下载记录，不一次性载入内存"""
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                SELECT {_SELECT_COLUMNS}
+                FROM downloads
+            """.format(_SELECT_COLUMNS=_SELECT_COLUMNS))
+            for row in cursor:
+                yield self._row_to_record(row)
+            
+    def average_size(self, limit: int = 100) -> int:
+        """最近 limit 个已完成下载的平均文件大小，没有记录时为0"""
+        with self._connect() as conn:
+            row = conn.execute("""
+                SELECT AVG(file_size) FROM (
+                    SELECT file_size FROM downloads
+                    WHERE status = 'completed' AND file_size > 0
+                    ORDER BY start_time DESC LIMIT ?
                 )
-                for row in cursor.fetchall()
-            ]
+            """, (limit,)).fetchone()
+        return int(row[0] or 0)
+            
+    def find_by_hash(self, content_hash: str) -> List[DownloadRecord]:
+        """查找内容相同的已完成下载"""
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                SELECT {_SELECT_COLUMNS}
+                FROM downloads
+                WHERE content_hash = ? AND status = 'completed'
+            """.format(_SELECT_COLUMNS=_SELECT_COLUMNS), (content_hash,))
+            return [self._row_to_record(row) for row in cursor.fetchall()]
+            
+    def get_record(self, url: str) -> Optional[DownloadRecord]:
+        """按URL获取单条下载记录"""
+        with self._connect() as conn:
+            row = conn.execute("""
+                SELECT {_SELECT_COLUMNS}
+                FROM downloads
+                WHERE url = ?
+            """.format(_SELECT_COLUMNS=_SELECT_COLUMNS), (url,)).fetchone()
+            
+        return self._row_to_record(row) if row else None
+    
+    @staticmethod
+    def _row_to_record(row) -> DownloadRecord:
+        return DownloadRecord(
+            url=row[0],
+            filename=row[1],
+            save_path=row[2],
+            start_time=datetime.fromisoformat(row[3]),
+            end_time=datetime.fromisoformat(row[4]) if row[4] else None,
+            status=row[5],
+            error_message=row[6],
+            file_size=row[7],
+            phase_timings=json.loads(row[8]) if row[8] else {},
+            content_hash=row[9] or "",
+            format_info=row[10] or "",
+            thumbnail_url=row[11] or "",
+            extractor=row[12] or ""
+        )
             
     def update_status(self, url: str, status: str, error_message: str = ""):
         """更新下载状态"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             conn.execute("""
                 UPDATE downloads
                 SET status = ?, error_message = ?, end_time = ?
                 WHERE url = ?
             """, (status, error_message, datetime.now().isoformat(), url)) 
             
+    @contextmanager
+    def analytics_connection(self, include_archive: bool = True) -> Iterator[sqlite3.Connection]:
+        """导出和统计用的连接
+
+        临时视图 all_downloads 合并主库和归档库的记录，并附加完成耗时 duration(秒)。
+        """
+        conn = self._connect()
+        try:
+            source = f"SELECT {_STORED_COLUMNS} FROM main.downloads"
+            if include_archive and os.path.exists(self.archive_path):
+                DownloadHistory(self.archive_path)  # 补齐旧归档库缺少的列
+                conn.execute("ATTACH DATABASE ? AS archive", (self.archive_path,))
+                source += f" UNION ALL SELECT {_STORED_COLUMNS} FROM archive.downloads"
+            conn.execute(f"""
+                CREATE TEMP VIEW all_downloads AS
+                SELECT *, ROUND((julianday(end_time) - julianday(start_time)) * 86400.0, 3) AS duration
+                FROM ({source})
+            """)
+            yield conn
+        finally:
+            conn.close()
+            
+    def archive(self, before: datetime, chunk_size: int = 500) -> int:
+        """把开始时间早于 before 的已结束记录移到归档库，返回移动的条数
+
+        分批复制和删除，每批一个事务，不会长时间锁住主库。不执行 VACUUM：它要独占主库，
+        期间下载器无法写入记录；腾出的页面会被之后的记录复用。
+        """
+        DownloadHistory(self.archive_path)
+        moved = 0
+        conn = self._connect()
+        try:
+            conn.execute("ATTACH DATABASE ? AS archive", (self.archive_path,))
+            while True:
+                with conn:
+                    rowids = [row[0] for row in conn.execute("""
+                        SELECT rowid FROM main.downloads
+                        WHERE start_time < ? AND status IN (?, ?, ?)
+                        LIMIT ?
+                    """, (before.isoformat(), *FINISHED_STATUSES, chunk_size))]
+                    if not rowids:
+                        break
+                    placeholders = ", ".join("?" * len(rowids))
+                    conn.execute(f"""
+                        INSERT OR REPLACE INTO archive.downloads ({_STORED_COLUMNS})
+                        SELECT {_STORED_COLUMNS} FROM main.downloads WHERE rowid IN ({placeholders})
+                    """, rowids)
+                    conn.execute(f"DELETE FROM main.downloads WHERE rowid IN ({placeholders})", rowids)
+                moved += len(rowids)
+        finally:
+            conn.close()
+        return moved
+            
     def clear_all(self):
-        """清空所有历史记录"""
-        with sqlite3.connect(self.db_path) as conn:
+        """清空所有历史记录，包括归档库"""
+        with self._connect() as conn:
             conn.execute("DELETE FROM downloads")
-            conn.execute("VACUUM")  # 清理数据库文件 
\ No newline at end of file
+            conn.commit()  # VACUUM 不能在事务中执行
+            conn.execute("VACUUM")  # 清理数据库文件
+        if os.path.exists(self.archive_path):
+            os.remove(self.archive_path) 
\ No newline at end of file
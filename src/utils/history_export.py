@@ -0,0 +1,72 @@
+import gzip
+import json
+from datetime import datetime
+from typing import IO, Iterator, List, Optional
+from utils.history import DownloadHistory
+
+# 导出的列，duration 为完成耗时(秒)，由结束时间减开始时间得到
+EXPORT_COLUMNS = (
+    "url", "host", "extractor", "filename", "save_path", "status", "error_message",
+    "file_size", "start_time", "end_time", "duration", "phase_timings",
+    "content_hash", "format_info", "thumbnail_url",
+)
+EXPORT_FORMATS = ("jsonl", "columnar")
+COLUMNAR_MAGIC = "video-downloader-history"
+
+def iter_export_chunks(history: DownloadHistory, chunk_size: int = 1000, since: Optional[datetime] = None,
+                       include_archive: bool = True) -> Iterator[List[tuple]]:
+    """按开始时间顺序分批读取导出的行，每批最多 chunk_size 条"""
+    where, params = ("WHERE start_time >= ?", (since.isoformat(),)) if since else ("", ())
+    with history.analytics_connection(include_archive) as conn:
+        cursor = conn.execute(f"""
+            SELECT {", ".join(EXPORT_COLUMNS)}
+            FROM all_downloads {where}
+            ORDER BY start_time
+        """, params)
+        timings = EXPORT_COLUMNS.index("phase_timings")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [row[:timings] + (json.loads(row[timings]) if row[timings] else {},) + row[timings + 1:]
+                   for row in rows]
+
+def _open_output(path: str, compress: bool) -> IO[str]:
+    if compress:
+        return gzip.open(path, "wt", encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+def export_history(history: DownloadHistory, path: str, fmt: str = "jsonl", chunk_size: int = 1000,
+                   since: Optional[datetime] = None, include_archive: bool = True) -> int:
+    """把历史记录流式导出到文件，返回导出的条数
+
+    jsonl: 每行一条记录，文件名以 .gz 结尾时压缩。
+    columnar: gzip压缩，第一行是列名，之后每行是一批记录按列存放的数组，
+    同一列的值相邻，比逐条记录重复键名小得多，读取方式见 read_columnar。
+    内存占用只与 chunk_size 有关，与历史记录总数无关。
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    count = 0
+    with _open_output(path, fmt == "columnar" or path.endswith(".gz")) as f:
+        if fmt == "columnar":
+            f.write(json.dumps({"format": COLUMNAR_MAGIC, "version": 1, "columns": EXPORT_COLUMNS}) + "\n")
+        for rows in iter_export_chunks(history, chunk_size, since, include_archive):
+            if fmt == "columnar":
+                f.write(json.dumps([list(column) for column in zip(*rows)], ensure_ascii=False) + "\n")
+            else:
+                for row in rows:
+                    f.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n")
+            count += len(rows)
+    return count
+
+def read_columnar(path: str) -> Iterator[dict]:
+    """逐条读取 columnar 格式的导出文件"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != COLUMNAR_MAGIC:
+            raise ValueError(f"不是历史记录导出文件: {path}")
+        columns = header["columns"]
+        for line in f:
+            for values in zip(*json.loads(line)):
+                yield dict(zip(columns, values))
@@ -0,0 +1,82 @@
+import hashlib
+import os
+from typing import Tuple
+
+HASH_ALGORITHM = "sha256"
+_CHUNK_SIZE = 1024 * 1024
+
+class StreamHasher:
+    """跟随下载进度增量计算文件哈希
+
+    进度回调每写入一块数据就通知一次，这里只读取上次之后新写入的部分，数据刚写入仍在页缓存中，
+    不需要下载结束后再完整读一遍文件。.part 文件改名为成品后继续按新路径读取；
+    文件变小说明重新开始写，从头计算。同一个实例只在一个下载线程中使用。
+    """
+    def __init__(self, min_step: int = 4 * 1024 * 1024):
+        self.min_step = min_step  # 积累到这么多新数据才读取一次，减少小块读
+        self.offset = 0
+        self.valid = True
+        self._hash = hashlib.new(HASH_ALGORITHM)
+
+    def advance(self, path: str, size: int, force: bool = False) -> None:
+        """文件已写到 size 字节，读取并计算新增部分"""
+        if size < self.offset:
+            self.offset = 0
+            self.valid = True
+            self._hash = hashlib.new(HASH_ALGORITHM)
+        if not self.valid or size - self.offset < (1 if force else self.min_step):
+            return
+        # 每次重新打开，不长期占用文件句柄，避免在Windows上妨碍yt-dlp改名
+        try:
+            with open(path, "rb") as f:
+                f.seek(self.offset)
+                remaining = size - self.offset
+                while remaining > 0:
+                    chunk = f.read(min(_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    self._hash.update(chunk)
+                    self.offset += len(chunk)
+                    remaining -= len(chunk)
+        except OSError:
+            # 读不到就放弃增量结果，结束时完整计算
+            self.valid = False
+
+    def finalize(self, final_path: str) -> Tuple[str, int]:
+        """返回成品文件的 (哈希, 大小)
+
+        大小与已计算的字节数一致时直接使用增量结果，否则（例如之后被修复或重新封装过）重新完整计算。
+        """
+        size = os.path.getsize(final_path)
+        if self.valid and self.offset == size:
+            return self._hash.hexdigest(), size
+        return file_digest(final_path)
+
+def file_digest(path: str) -> Tuple[str, int]:
+    """完整读取文件计算 (哈希, 大小)"""
+    digest = hashlib.new(HASH_ALGORITHM)
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+def link_duplicate(existing: str, duplicate: str) -> bool:
+    """把内容相同的新文件替换为已有文件的硬链接，不在同一设备或不支持时返回False"""
+    if os.path.samefile(existing, duplicate):
+        return False
+    if os.stat(existing).st_dev != os.stat(duplicate).st_dev:
+        return False
+    temp = duplicate + ".link"
+    try:
+        os.link(existing, temp)
+        os.replace(temp, duplicate)
+        return True
+    except OSError:
+        if os.path.exists(temp):
+            os.remove(temp)
+        return False
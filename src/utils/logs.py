@@ -0,0 +1,193 @@
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+LOG_DIR = os.path.join(os.path.expanduser("~"), ".video_downloader", "logs")
+
+_LEVEL_CHARS = {
+    logging.DEBUG: "D", logging.INFO: "I", logging.WARNING: "W", logging.ERROR: "E", logging.CRITICAL: "C",
+}
+
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+def parse_component_levels(text: str) -> Dict[str, str]:
+    """解析 "ytdlp=DEBUG, distributed=WARNING" 格式的组件级别"""
+    levels = {}
+    for item in text.replace("，", ",").split(","):
+        if not item.strip():
+            continue
+        name, _, level = item.partition("=")
+        name, level = name.strip(), level.strip().upper()
+        if not name or level not in LEVELS:
+            raise ValueError(f"无效的组件级别: {item.strip()}，应为 组件=级别，级别为 {'/'.join(LEVELS)}")
+        levels[name] = level
+    return levels
+
+def format_component_levels(levels: Dict[str, str]) -> str:
+    return ", ".join(f"{name}={level}" for name, level in levels.items())
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n").replace("\t", " ")
+
+class CompactFormatter(logging.Formatter):
+    """日志文件的紧凑行格式：时间、级别、组件、任务URL、消息，以制表符分隔，每条记录一行
+
+    消息和异常堆栈中的换行转义为 \\n，按行 grep 或 cut 即可筛选某个任务或组件。
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        created = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created))
+        message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            message = f"{message}\n{record.exc_text}"
+        level = _LEVEL_CHARS.get(record.levelno, record.levelname[:1])
+        return (f"{created}.{int(record.msecs):03d}\t{level}\t{record.name}\t"
+                f"{getattr(record, 'url', '') or '-'}\t{_escape(message)}")
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """写入有界队列，队列满时丢弃并计数，不阻塞调用方"""
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class TaskLogBuffer(logging.Handler):
+    """按任务保存最近的日志，供界面按需查看
+
+    只收集带 url 字段的记录（extra={"url": ...}），每个任务保留最近 capacity 条，
+    在调用线程中直接追加；任务从列表移除时调用 discard 释放。
+    """
+    def __init__(self, capacity: int = 200):
+        super().__init__(logging.DEBUG)
+        self.capacity = capacity
+        self._buffers: Dict[str, Deque[Tuple[float, int, str, str]]] = {}
+
+    def emit(self, record: logging.LogRecord) -> None:
+        url = getattr(record, "url", None)
+        if not url:
+            return
+        message = record.getMessage()
+        if record.exc_info:
+            # 不保留异常对象，避免其中的调用帧长期占用内存
+            message = f"{message}\n{logging.Formatter().formatException(record.exc_info)}"
+        buffer = self._buffers.get(url)
+        if buffer is None:
+            buffer = self._buffers[url] = deque(maxlen=self.capacity)
+        buffer.append((record.created, record.levelno, record.name, message))
+
+    def lines(self, url: str) -> List[str]:
+        result = []
+        for created, levelno, name, message in list(self._buffers.get(url, ())):
+            stamp = time.strftime("%H:%M:%S", time.localtime(created))
+            result.append(f"{stamp} {logging.getLevelName(levelno)} [{name}] {message}")
+        return result
+
+    def discard(self, url: str) -> None:
+        self._buffers.pop(url, None)
+
+class LogManager:
+    """日志子系统
+
+    各模块用 logging.getLogger(__name__) 记录，调用方只把记录放进有界队列，
+    由后台线程写入按大小轮转的日志文件（以及命令行模式下的控制台）；
+    带任务URL的记录同时进入该任务的内存环形缓冲。各组件的级别可以单独设置，
+    低于级别的记录在调用处就被过滤，不产生格式化开销。
+    """
+    def __init__(self):
+        self.task_logs = TaskLogBuffer()
+        self.journal_path = ""
+        self._queue_handler: Optional[_DroppingQueueHandler] = None
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._component_levels: Dict[str, int] = {}
+
+    @property
+    def dropped(self) -> int:
+        """队列满而丢弃的记录数"""
+        return self._queue_handler.dropped if self._queue_handler else 0
+
+    def start(self, level: str = "INFO", component_levels: Optional[Dict[str, str]] = None,
+              journal_max_mb: int = 10, journal_backups: int = 5, console: bool = False,
+              queue_size: int = 10000, directory: Optional[str] = None) -> None:
+        """配置根日志器并启动后台写入线程，重复调用时先停止之前的配置"""
+        self.stop()
+        directory = directory or LOG_DIR
+        os.makedirs(directory, exist_ok=True)
+        self.journal_path = os.path.join(directory, "journal.log")
+
+        journal = logging.handlers.RotatingFileHandler(
+            self.journal_path, maxBytes=journal_max_mb * 1024 * 1024,
+            backupCount=journal_backups, encoding="utf-8", delay=True
+        )
+        journal.setFormatter(CompactFormatter())
+        handlers: List[logging.Handler] = [journal]
+        if console:
+            stream = logging.StreamHandler(sys.stderr)
+            stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+            handlers.append(stream)
+
+        self._queue_handler = _DroppingQueueHandler(queue.Queue(queue_size))
+        self._listener = logging.handlers.QueueListener(
+            self._queue_handler.queue, *handlers, respect_handler_level=True
+        )
+        root = logging.getLogger()
+        root.addHandler(self._queue_handler)
+        root.addHandler(self.task_logs)
+        self.set_levels(level, component_levels or {})
+        self._listener.start()
+
+    def set_levels(self, level: str, component_levels: Dict[str, str]) -> None:
+        """设置全局级别，并按组件（日志器名称，如 "downloader"、"ytdlp"）单独设置，未列出的组件沿用全局级别"""
+        logging.getLogger().setLevel(level.upper())
+        for name in self._component_levels:
+            if name not in component_levels:
+                logging.getLogger(name).setLevel(logging.NOTSET)
+        self._component_levels = {}
+        for name, level in component_levels.items():
+            logger = logging.getLogger(name)
+            logger.setLevel(level.upper())
+            self._component_levels[name] = logger.level
+
+    def stop(self) -> None:
+        """写完队列中剩余的记录后停止后台线程"""
+        root = logging.getLogger()
+        if self._listener:
+            root.removeHandler(self._queue_handler)
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+        root.removeHandler(self.task_logs)
+
+log_manager = LogManager()
+
+class YtdlpLogger:
+    """把yt-dlp的输出转入日志系统，代替直接写控制台
+
+    yt-dlp的普通输出（包括进度行）都以 debug 级别送来，默认的 INFO 级别下直接被过滤。
+    """
+    def __init__(self, url: str = ""):
+        self._logger = logging.getLogger("ytdlp")
+        self._extra = {"url": url} if url else None
+
+    def debug(self, message: str) -> None:
+        self._logger.debug(message, extra=self._extra)
+
+    def info(self, message: str) -> None:
+        self._logger.info(message, extra=self._extra)
+
+    def warning(self, message: str) -> None:
+        self._logger.warning(message, extra=self._extra)
+
+    def error(self, message: str) -> None:
+        self._logger.error(message, extra=self._extra)
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+# 直方图默认分桶
+SPEED_BUCKETS = (64e3, 256e3, 1e6, 4e6, 16e6, 64e6)  # 字节/秒
+DURATION_BUCKETS = (0.1, 0.5, 1, 5, 15, 60, 300, 1800)  # 秒
+
+logger = logging.getLogger(__name__)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key: LabelKey, extra: str = "") -> str:
+    parts = []
+    for k, v in key:
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{k}="{v}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Histogram:
+    """按标签分组的累计直方图"""
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.series: Dict[LabelKey, list] = {}  # key -> [各桶计数..., sum, count]
+
+    def observe(self, value: float, key: LabelKey):
+        data = self.series.get(key)
+        if data is None:
+            data = self.series[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                data[i] += 1
+        data[-2] += value
+        data[-1] += 1
+
+class DownloadMetrics:
+    """下载指标汇总，可导出为Prometheus文本格式
+
+    进度回调运行在线程池中，所有更新都在锁内完成。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Histogram] = {
+            "download_speed_bytes_per_second": Histogram(SPEED_BUCKETS),
+            "download_phase_seconds": Histogram(DURATION_BUCKETS),
+        }
+        self._help = {
+            "downloads_total": "按最终状态统计的任务数",
+            "download_retries_total": "重试次数",
+            "download_errors_total": "按提取器统计的错误数",
+            "downloaded_bytes_total": "已下载字节数",
+            "download_queue_depth": "等待中的任务数",
+            "active_downloads": "正在下载的任务数",
+            "tasks": "按当前状态统计的内存中任务数",
+            "download_speed_bytes_per_second": "任务平均下载速度",
+            "download_phase_seconds": "任务各阶段耗时",
+        }
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._port = 0
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """累加计数器"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """设置瞬时值"""
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """记录直方图样本"""
+        with self._lock:
+            self._histograms[name].observe(value, _label_key(labels))
+
+    def observe_phases(self, timings: Dict[str, float]):
+        """记录任务各阶段耗时"""
+        for phase, seconds in timings.items():
+            self.observe("download_phase_seconds", seconds, phase=phase)
+
+    def render(self) -> str:
+        """生成Prometheus文本格式"""
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, series in sorted(metrics.items()):
+                    lines.append(f"# HELP {name} {self._help.get(name, name)}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in series.items():
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, hist in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, data in hist.series.items():
+                    for bound, count in zip(hist.buckets, data):
+                        le = 'le="%g"' % bound
+                        lines.append(f"{name}_bucket{_format_labels(key, le)} {count}")
+                    le = 'le="+Inf"'
+                    lines.append(f"{name}_bucket{_format_labels(key, le)} {data[-1]}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {data[-2]}")
+                    lines.append(f"{name}_count{_format_labels(key)} {data[-1]}")
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, port: int, host: str = "127.0.0.1"):
+        """在本地端口提供 /metrics，端口为0时关闭服务；端口被占用时记录日志并在没有指标服务的情况下继续"""
+        if port == self._port and (self._server or port == 0):
+            return
+        await self.stop()
+        if port > 0:
+            try:
+                self._server = await asyncio.start_server(self._handle_request, host, port)
+            except OSError as e:
+                logger.error("无法在端口 %d 启动指标服务: %s", port, e)
+                return
+            self._port = port
+
+    async def stop(self):
+        """关闭指标服务"""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        self._server = None
+        self._port = 0
+
+    async def _handle_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            # 丢弃请求头
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[1].split("?")[0] in ("/", "/metrics"):
+                status, body = "200 OK", self.render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.0 {status}\r\n"
+                f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
@@ -0,0 +1,110 @@
+import errno
+import random
+import re
+import time
+from enum import Enum
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from utils.storage import InsufficientSpaceError
+
+def url_host(url: str) -> str:
+    """提取URL主机名，去掉 www. / m. 前缀"""
+    host = (urlparse(url).hostname or "").lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    return host
+
+class ErrorKind(Enum):
+    TRANSIENT = "transient"      # 网络抖动、连接中断，可从当前偏移续传
+    THROTTLED = "throttled"      # HTTP 429/403，主机限流
+    EXTRACTOR = "extractor"      # 解析失败，重试无意义
+    DISK_FULL = "disk_full"      # 磁盘已满
+    UNKNOWN = "unknown"
+
+_THROTTLE_PATTERN = re.compile(r"HTTP Error (429|403)|Too Many Requests|rate.?limit", re.IGNORECASE)
+_TRANSIENT_NAMES = {
+    "ConnectionError", "TimeoutError", "timeout", "URLError", "IncompleteRead",
+    "ContentTooShortError", "TransportError", "RemoteDisconnected", "SSLError",
+}
+_TRANSIENT_PATTERN = re.compile(
+    r"timed? ?out|Connection (reset|refused|aborted)|Temporary failure|IncompleteRead|"
+    r"HTTP Error 5\d\d|Unable to download video data|Got error",
+    re.IGNORECASE,
+)
+
+def _unwrap(exc: BaseException) -> BaseException:
+    """yt-dlp 的 DownloadError 把原始异常放在 exc_info 中"""
+    seen = set()
+    while id(exc) not in seen:
+        seen.add(id(exc))
+        exc_info = getattr(exc, "exc_info", None)
+        inner = exc_info[1] if exc_info and len(exc_info) > 1 else None
+        inner = inner or exc.__cause__
+        if not isinstance(inner, BaseException):
+            break
+        exc = inner
+    return exc
+
+def classify_error(exc: BaseException) -> ErrorKind:
+    """按异常类型和消息对下载错误分类"""
+    for candidate in (exc, _unwrap(exc)):
+        if isinstance(candidate, InsufficientSpaceError):
+            return ErrorKind.DISK_FULL
+        if isinstance(candidate, OSError) and candidate.errno in (errno.ENOSPC, errno.EDQUOT):
+            return ErrorKind.DISK_FULL
+
+    message = f"{exc} {_unwrap(exc)}"
+    if _THROTTLE_PATTERN.search(message):
+        return ErrorKind.THROTTLED
+
+    names = {cls.__name__ for cls in type(_unwrap(exc)).__mro__}
+    if names & _TRANSIENT_NAMES or _TRANSIENT_PATTERN.search(message):
+        return ErrorKind.TRANSIENT
+    if names & {"ExtractorError", "UnsupportedError", "GeoRestrictedError"} or "Unsupported URL" in message:
+        return ErrorKind.EXTRACTOR
+    return ErrorKind.UNKNOWN
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """带完全抖动的指数退避"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+class HostCircuitBreaker:
+    """按主机的熔断器
+
+    主机返回限流错误时熔断一段时间，冷却时间随连续限流次数翻倍；成功一次即复位。
+    熔断期间该主机的排队任务延后调度，而不是各自消耗重试次数。
+    """
+    def __init__(self, base_cooldown: float = 30.0, max_cooldown: float = 900.0):
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self._open_until: Dict[str, float] = {}
+        self._strikes: Dict[str, int] = {}
+
+    def record_failure(self, host: str, kind: ErrorKind) -> Optional[float]:
+        """记录失败，触发熔断时返回冷却秒数"""
+        if kind != ErrorKind.THROTTLED or not host:
+            return None
+        strikes = self._strikes.get(host, 0)
+        cooldown = min(self.base_cooldown * 2 ** strikes, self.max_cooldown)
+        self._strikes[host] = strikes + 1
+        self._open_until[host] = max(self._open_until.get(host, 0), time.monotonic() + cooldown)
+        return cooldown
+
+    def record_success(self, host: str):
+        """主机请求成功，复位熔断状态"""
+        self._strikes.pop(host, None)
+        self._open_until.pop(host, None)
+
+    def remaining(self, host: str) -> float:
+        """熔断剩余秒数，未熔断返回0"""
+        until = self._open_until.get(host)
+        if until is None:
+            return 0.0
+        left = until - time.monotonic()
+        if left <= 0:
+            # 冷却结束进入半开状态，放行请求但保留失败次数
+            del self._open_until[host]
+            return 0.0
+        return left
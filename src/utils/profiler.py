@@ -0,0 +1,155 @@
+import asyncio
+import functools
+import os
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List, Optional
+
+PROFILE_ENV = "VIDEO_DOWNLOADER_PROFILE"
+
+class Profiler:
+    """内置性能分析器
+
+    关闭时被 @profiled 包装的函数只多一次属性判断。开启后累计各热点函数耗时，
+    通过看门狗线程检测事件循环卡顿并记录卡顿时主线程调用栈，可选 tracemalloc 快照。
+    """
+    def __init__(self):
+        self.enabled = False
+        self.slow_callback_threshold = 0.1  # 秒
+        self._lock = threading.Lock()
+        self._stats: Dict[str, List[float]] = {}  # name -> [调用次数, 总耗时, 最大耗时]
+        self._slow_callbacks: List[str] = []
+        self._max_slow_callbacks = 50
+        self._heartbeat = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._tracemalloc_baseline: Optional[tracemalloc.Snapshot] = None
+        self._started_at: Optional[datetime] = None
+
+    @staticmethod
+    def env_enabled() -> bool:
+        """环境变量是否要求开启性能分析"""
+        return os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes", "on", "tracemalloc")
+
+    def start(self, slow_callback_ms: int = 100, trace_memory: bool = False):
+        """开启性能分析，需要在事件循环中调用"""
+        if self.enabled:
+            return
+        self.enabled = True
+        self._started_at = datetime.now()
+        self.slow_callback_threshold = slow_callback_ms / 1000
+
+        if trace_memory or os.environ.get(PROFILE_ENV, "").lower() == "tracemalloc":
+            tracemalloc.start()
+            self._tracemalloc_baseline = tracemalloc.take_snapshot()
+
+        # 事件循环心跳 + 看门狗线程
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop_event.clear()
+        asyncio.create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, name="profiler-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        """关闭性能分析"""
+        self.enabled = False
+        self._stop_event.set()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._tracemalloc_baseline = None
+
+    async def _beat(self):
+        """事件循环心跳，间隔远小于卡顿阈值"""
+        interval = self.slow_callback_threshold / 4
+        while self.enabled:
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(interval)
+
+    def _watch(self):
+        """看门狗：心跳超时说明事件循环被阻塞，记录主线程当前调用栈"""
+        interval = self.slow_callback_threshold / 2
+        reported = 0.0
+        while not self._stop_event.wait(interval):
+            stalled = time.monotonic() - self._heartbeat
+            if stalled < self.slow_callback_threshold or self._heartbeat == reported:
+                continue
+            reported = self._heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame, limit=12)) if frame else ""
+            entry = f"[{datetime.now():%H:%M:%S}] 事件循环阻塞 {stalled * 1000:.0f}ms\n{stack}"
+            with self._lock:
+                self._slow_callbacks.append(entry)
+                del self._slow_callbacks[:-self._max_slow_callbacks]
+
+    def record(self, name: str, elapsed: float):
+        """累计一次调用耗时"""
+        with self._lock:
+            stat = self._stats.get(name)
+            if stat is None:
+                self._stats[name] = [1, elapsed, elapsed]
+            else:
+                stat[0] += 1
+                stat[1] += elapsed
+                if elapsed > stat[2]:
+                    stat[2] = elapsed
+
+    def report(self) -> str:
+        """生成文本报告"""
+        lines = [f"性能分析报告 {datetime.now():%Y-%m-%d %H:%M:%S}"]
+        if self._started_at:
+            lines.append(f"开始时间: {self._started_at:%Y-%m-%d %H:%M:%S}")
+        lines.append("")
+        lines.append(f"{'函数':<32}{'调用次数':>10}{'总耗时(ms)':>14}{'平均(ms)':>12}{'最大(ms)':>12}")
+        with self._lock:
+            stats = sorted(self._stats.items(), key=lambda item: item[1][1], reverse=True)
+            slow_callbacks = list(self._slow_callbacks)
+        for name, (count, total, worst) in stats:
+            lines.append(
+                f"{name:<32}{count:>10}{total * 1000:>14.1f}{total / count * 1000:>12.2f}{worst * 1000:>12.1f}"
+            )
+
+        lines.append("")
+        lines.append(f"事件循环阻塞 (阈值 {self.slow_callback_threshold * 1000:.0f}ms): {len(slow_callbacks)} 次")
+        lines.extend(slow_callbacks)
+
+        if tracemalloc.is_tracing() and self._tracemalloc_baseline:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            lines.append("")
+            lines.append(f"内存: 当前 {current / 1024 / 1024:.1f} MB, 峰值 {peak / 1024 / 1024:.1f} MB")
+            lines.append("相对启动时增长最多的分配位置:")
+            for stat in snapshot.compare_to(self._tracemalloc_baseline, "lineno")[:20]:
+                lines.append(str(stat))
+        return "\n".join(lines) + "\n"
+
+    def dump(self, directory: Optional[str] = None) -> str:
+        """将报告写入文件，返回文件路径"""
+        directory = directory or os.path.join(os.path.expanduser("~"), ".video_downloader", "profiles")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"profile-{datetime.now():%Y%m%d-%H%M%S}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.report())
+        return path
+
+profiler = Profiler()
+
+def profiled(name: str):
+    """累计函数耗时的装饰器，分析器关闭时直接调用原函数"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record(name, time.perf_counter() - started)
+        return wrapper
+    return decorator
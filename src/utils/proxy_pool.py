@@ -0,0 +1,163 @@
+import asyncio
+import base64
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from urllib.parse import unquote, urlparse
+
+class ProxyThrottledError(ConnectionError):
+    """代理返回限流/拒绝"""
+    pass
+
+@dataclass
+class ProxyStats:
+    url: str
+    latency: float = 0.0      # 探测延迟EWMA(秒)，0表示未知
+    throughput: float = 0.0   # 实测下载速度EWMA(字节/秒)，0表示未知
+    failures: int = 0         # 连续失败次数
+    evicted_until: float = 0  # 被剔除到的时间点(time.monotonic)
+    probation: bool = False   # 被剔除过，重新探测通过前不分配
+    active: int = 0           # 当前使用该代理的任务数
+
+    @property
+    def evicted(self) -> bool:
+        return self.probation or self.evicted_until > time.monotonic()
+
+class ProxyPool:
+    """带健康检查的代理池
+
+    后台定期通过每个代理向探测地址发起 CONNECT，记录延迟；任务结束后回报实测吞吐。
+    分配时选择"吞吐/在用任务数"最高的代理，未测过吞吐的代理优先试用；
+    连续失败或被限流的代理会被剔除一段时间，到期后重新探测通过才恢复。
+    """
+    SMOOTHING = 0.3
+
+    def __init__(self, probe_url: str = "https://www.youtube.com", probe_interval: float = 60.0,
+                 probe_timeout: float = 10.0, max_failures: int = 3, eviction_time: float = 600.0):
+        self.probe_url = probe_url
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.max_failures = max_failures
+        self.eviction_time = eviction_time
+        self._proxies: Dict[str, ProxyStats] = {}
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def set_proxies(self, urls: List[str]):
+        """更新代理列表，保留已有代理的统计"""
+        urls = [u.strip() for u in urls if u.strip()]
+        self._proxies = {u: self._proxies.get(u) or ProxyStats(u) for u in dict.fromkeys(urls)}
+        if self._proxies and (self._probe_task is None or self._probe_task.done()):
+            self._probe_task = asyncio.create_task(self._probe_loop())
+
+    @property
+    def proxies(self) -> List[ProxyStats]:
+        return list(self._proxies.values())
+
+    def choose(self) -> Optional[str]:
+        """选择当前最合适的代理，代理池为空时返回None
+
+        全部被剔除时仍返回失败最少的代理，避免绕过代理直连。
+        """
+        if not self._proxies:
+            return None
+        candidates = [p for p in self._proxies.values() if not p.evicted]
+        if not candidates:
+            return min(self._proxies.values(), key=lambda p: (p.failures, p.evicted_until)).url
+
+        def score(p: ProxyStats):
+            # 没有连续失败的优先；空闲且未测过吞吐的优先试用；再按分摊后的吞吐和延迟（未知按最差）
+            return (
+                p.failures == 0,
+                p.throughput == 0 and p.active == 0,
+                p.throughput / (p.active + 1),
+                -(p.latency or self.probe_timeout),
+            )
+        return max(candidates, key=score).url
+
+    def acquire(self) -> Optional[str]:
+        """选择代理并计入在用数，用完需调用 release"""
+        proxy = self.choose()
+        if proxy:
+            self._proxies[proxy].active += 1
+        return proxy
+
+    def release(self, proxy: Optional[str], ok: Optional[bool] = None, nbytes: int = 0,
+                seconds: float = 0, throttled: bool = False):
+        """归还代理并回报本次结果，ok 为None表示结果与代理无关（如任务被取消）"""
+        stats = self._proxies.get(proxy) if proxy else None
+        if not stats:
+            return
+        stats.active = max(stats.active - 1, 0)
+        if ok is None:
+            return
+        if ok:
+            stats.failures = 0
+            if nbytes and seconds > 0:
+                self._smooth(stats, "throughput", nbytes / seconds)
+        else:
+            self._record_failure(stats, throttled)
+
+    def _smooth(self, stats: ProxyStats, attr: str, value: float):
+        current = getattr(stats, attr)
+        setattr(stats, attr, value if current == 0 else current + self.SMOOTHING * (value - current))
+
+    def _record_failure(self, stats: ProxyStats, throttled: bool = False):
+        stats.failures += 1
+        if throttled or stats.failures >= self.max_failures:
+            stats.evicted_until = time.monotonic() + self.eviction_time
+            stats.probation = True
+
+    async def _probe_loop(self):
+        """后台健康检查，代理池清空后退出"""
+        while self._proxies:
+            await asyncio.gather(*(self.check(p) for p in self.proxies))
+            await asyncio.sleep(self.probe_interval)
+
+    async def check(self, stats: ProxyStats):
+        """探测一个代理并更新状态
+
+        被剔除的代理到期前不探测；到期后仍不分配，探测通过才恢复，失败则再剔除一段时间。
+        """
+        if stats.evicted_until > time.monotonic():
+            return
+        try:
+            latency = await asyncio.wait_for(self._probe(stats.url), self.probe_timeout)
+        except ProxyThrottledError:
+            self._record_failure(stats, throttled=True)
+        except (OSError, asyncio.TimeoutError, ValueError):
+            self._record_failure(stats)
+        else:
+            stats.failures = 0
+            stats.evicted_until = 0
+            stats.probation = False
+            self._smooth(stats, "latency", latency)
+
+    async def _probe(self, proxy: str) -> float:
+        """通过代理建立到探测地址的隧道，返回耗时"""
+        parsed = urlparse(proxy)
+        target = urlparse(self.probe_url)
+        target_host = target.hostname
+        target_port = target.port or (443 if target.scheme == "https" else 80)
+        default_port = 1080 if parsed.scheme.startswith("socks") else 8080
+
+        started = time.monotonic()
+        reader, writer = await asyncio.open_connection(
+            parsed.hostname, parsed.port or default_port, ssl=parsed.scheme == "https" or None
+        )
+        try:
+            if not parsed.scheme.startswith("socks"):
+                headers = f"CONNECT {target_host}:{target_port} HTTP/1.1\r\nHost: {target_host}:{target_port}\r\n"
+                if parsed.username:
+                    credentials = f"{unquote(parsed.username)}:{unquote(parsed.password or '')}"
+                    headers += f"Proxy-Authorization: Basic {base64.b64encode(credentials.encode()).decode()}\r\n"
+                writer.write((headers + "\r\n").encode("latin-1"))
+                await writer.drain()
+                status_line = (await reader.readline()).decode("latin-1").split()
+                status = int(status_line[1]) if len(status_line) > 1 else 0
+                if status in (403, 429):
+                    raise ProxyThrottledError(f"代理返回 {status}")
+                if status != 200:
+                    raise ConnectionError(f"代理返回 {status or '无效响应'}")
+            return time.monotonic() - started
+        finally:
+            writer.close()
@@ -0,0 +1,180 @@
+import asyncio
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Deque, List, Optional
+
+_WINDOW_PATTERN = re.compile(r"^(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})$")
+
+@dataclass
+class ScheduleWindow:
+    """一个时间段内的带宽和并发设置
+
+    结束时间早于开始时间表示跨过午夜，如 22:00-06:00。
+    """
+    start: str = "00:00"
+    end: str = "00:00"
+    speed_limit: int = 0      # 总限速，单位KB/s，0表示不限速
+    max_concurrent: int = 0   # 0表示沿用全局并发数
+    off_peak: bool = False    # 闲时窗口，标记为"仅闲时"的任务只在这些窗口内开始
+    days: List[int] = field(default_factory=list)  # 生效的星期(1=周一 ... 7=周日)，为空表示每天
+
+    @staticmethod
+    def _minutes(value: str) -> int:
+        hours, minutes = value.split(":")
+        return int(hours) * 60 + int(minutes)
+
+    def contains(self, now: datetime) -> bool:
+        start, end = self._minutes(self.start), self._minutes(self.end)
+        minute = now.hour * 60 + now.minute
+        if start < end:
+            return start <= minute < end and self._on_day(now)
+        # 跨午夜的时间段，午夜后的部分属于前一天的窗口
+        if minute >= start:
+            return self._on_day(now)
+        if minute < end:
+            return self._on_day(now - timedelta(days=1))
+        return False
+
+    def _on_day(self, day: datetime) -> bool:
+        return not self.days or day.isoweekday() in self.days
+
+    def boundaries(self) -> List[int]:
+        """窗口开始和结束的分钟数"""
+        return [self._minutes(self.start), self._minutes(self.end)]
+
+    @classmethod
+    def parse(cls, line: str) -> 'ScheduleWindow':
+        """解析 "22:00-06:00 limit=0 concurrent=6 offpeak days=1-5" 格式的一行"""
+        parts = line.split()
+        match = _WINDOW_PATTERN.match(parts[0]) if parts else None
+        if not match:
+            raise ValueError(f"无效的时间段: {line}")
+        h1, m1, h2, m2 = (int(g) for g in match.groups())
+        if h1 > 23 or h2 > 23 or m1 > 59 or m2 > 59:
+            raise ValueError(f"无效的时间段: {line}")
+        window = cls(start=f"{h1:02d}:{m1:02d}", end=f"{h2:02d}:{m2:02d}")
+        for part in parts[1:]:
+            key, _, value = part.partition("=")
+            if key == "offpeak":
+                window.off_peak = True
+            elif key == "limit":
+                window.speed_limit = int(value)
+            elif key == "concurrent":
+                window.max_concurrent = int(value)
+            elif key == "days":
+                window.days = _parse_days(value)
+            else:
+                raise ValueError(f"无法识别的选项: {part}")
+        return window
+
+    def __str__(self) -> str:
+        parts = [f"{self.start}-{self.end}", f"limit={self.speed_limit}"]
+        if self.max_concurrent:
+            parts.append(f"concurrent={self.max_concurrent}")
+        if self.off_peak:
+            parts.append("offpeak")
+        if self.days:
+            parts.append("days=" + ",".join(str(d) for d in self.days))
+        return " ".join(parts)
+
+def _parse_days(value: str) -> List[int]:
+    days = set()
+    for item in value.split(","):
+        first, _, last = item.partition("-")
+        days.update(range(int(first), int(last or first) + 1))
+    if not days <= set(range(1, 8)):
+        raise ValueError(f"星期应为1-7: {value}")
+    return sorted(days)
+
+@dataclass
+class ScheduleState:
+    """某一时刻生效的设置"""
+    speed_limit: int          # KB/s，0表示不限速
+    max_concurrent: int
+    off_peak: bool
+    window: Optional[ScheduleWindow] = None
+
+class BandwidthSchedule:
+    """按时间段切换的带宽计划，第一个包含当前时间的窗口生效，都不包含时使用默认设置"""
+    def __init__(self, windows: Optional[List[ScheduleWindow]] = None,
+                 default_speed_limit: int = 0, default_concurrent: int = 3):
+        self.windows = windows or []
+        self.default_speed_limit = default_speed_limit
+        self.default_concurrent = default_concurrent
+
+    @classmethod
+    def from_config(cls, config) -> 'BandwidthSchedule':
+        return cls(
+            [ScheduleWindow(**w) for w in config.bandwidth_schedule],
+            config.download_speed_limit,
+            config.max_concurrent_downloads,
+        )
+
+    @property
+    def has_off_peak(self) -> bool:
+        return any(w.off_peak for w in self.windows)
+
+    def current(self, now: Optional[datetime] = None) -> ScheduleState:
+        now = now or datetime.now()
+        for window in self.windows:
+            if window.contains(now):
+                return ScheduleState(
+                    speed_limit=window.speed_limit,
+                    max_concurrent=window.max_concurrent or self.default_concurrent,
+                    # 没有配置闲时窗口时"仅闲时"的任务不需要等待
+                    off_peak=window.off_peak or not self.has_off_peak,
+                    window=window,
+                )
+        return ScheduleState(self.default_speed_limit, self.default_concurrent, not self.has_off_peak)
+
+    def seconds_until_change(self, now: Optional[datetime] = None) -> float:
+        """距离下一个窗口边界的秒数，没有窗口时返回一小时"""
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        ahead = [
+            (boundary - minute) % (24 * 60) or 24 * 60
+            for window in self.windows for boundary in window.boundaries()
+        ]
+        if not ahead:
+            return 3600.0
+        return min(ahead) * 60 - now.second - now.microsecond / 1e6
+
+class AdjustableLimit:
+    """上限可以随时调整的并发限制
+
+    与 asyncio.Semaphore 用法相同；调低上限时已占用的槽位不受影响，释放后才按新上限放行。
+    """
+    def __init__(self, limit: int):
+        self.limit = max(limit, 1)
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def set_limit(self, limit: int) -> None:
+        self.limit = max(limit, 1)
+        self._wake()
+
+    async def acquire(self) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # 已分到槽位但调用方被取消
+            raise
+
+    def release(self) -> None:
+        self.active = max(self.active - 1, 0)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.active < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(None)
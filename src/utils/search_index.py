@@ -0,0 +1,176 @@
+import bisect
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# 中日韩文字没有空格分隔，按相邻两字切分；其他文字按连续的字母数字分词
+_CJK = "\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af"
+_CJK_PATTERN = re.compile(f"[{_CJK}]")
+_TOKEN_PATTERN = re.compile(f"[{_CJK}]+|[^\\W_{_CJK}]+")
+_QUERY_PATTERN = re.compile(r'(\w+):("[^"]*"|\S+)|"([^"]*)"|(\S+)')
+
+# 查询中可用的字段名
+FIELD_ALIASES = {
+    "url": "url",
+    "title": "title",
+    "file": "filename",
+    "filename": "filename",
+    "host": "host",
+    "status": "status",
+}
+
+def tokenize(text: str, query: bool = False) -> List[str]:
+    tokens = []
+    for word in _TOKEN_PATTERN.findall(text.lower()):
+        if len(word) > 1 and _CJK_PATTERN.match(word):
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+            if not query:
+                # 建索引时末字单独保留，这样任意单字都能按前缀命中
+                tokens.append(word[-1])
+        else:
+            tokens.append(word)
+    return tokens
+
+def parse_query(query: str) -> List[Tuple[Optional[str], str]]:
+    """把查询拆成 (字段, 词) 列表，字段为None表示在所有字段中查找
+
+    例如 `status:error host:bilibili 合集` 或 `title:"my video"`；不认识的前缀（如 https:）按普通词处理。
+    """
+    terms = []
+    for match in _QUERY_PATTERN.finditer(query.lower()):
+        name, value, quoted, word = match.groups()
+        if name is not None and name in FIELD_ALIASES:
+            terms.append((FIELD_ALIASES[name], value.strip('"')))
+        elif name is not None:
+            terms.append((None, match.group(0)))
+        else:
+            terms.append((None, quoted if quoted is not None else word))
+    return [(field, term) for field, term in terms if term]
+
+class SearchIndex:
+    """任务搜索用的倒排索引
+
+    每个字段维护 词 -> 文档键集合，另有排序的词表；文档更新时只增删变化的词。
+    查询的词在词表中按子串查找（"tube" 能命中 "youtube"），短词只按前缀查找；
+    多个词或包含标点、中文的词再用原文做子串校验，所有条件取交集。
+    """
+    FIELDS = ("url", "title", "filename", "host", "status")
+    MIN_SUBSTRING = 3  # 短于这个长度的词只按前缀查找，避免匹配几乎所有词
+
+    def __init__(self):
+        self._keys: Set[str] = set()
+        self._text: Dict[str, Dict[str, str]] = {field: {} for field in self.FIELDS}  # 字段 -> 文档键 -> 小写原文
+        self._postings: Dict[str, Dict[str, Set[str]]] = {field: {} for field in self.FIELDS}
+        self._vocab: Dict[str, List[str]] = {field: [] for field in self.FIELDS}
+        self._dirty: Set[str] = set()  # 词表需要重新排序的字段
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def keys(self) -> Iterable[str]:
+        return self._keys
+
+    def update(self, key: str, **fields: Optional[str]) -> bool:
+        """新增或更新文档的字段，值未变化的字段不做处理，有变化时返回True"""
+        changed = key not in self._keys
+        self._keys.add(key)
+        for field, value in fields.items():
+            value = (value or "").lower()
+            text = self._text[field]
+            old = text.get(key, "")
+            if value == old:
+                continue
+            changed = True
+            postings = self._postings[field]
+            old_tokens, new_tokens = set(tokenize(old)), set(tokenize(value))
+            for token in old_tokens - new_tokens:
+                keys = postings.get(token)
+                if keys is None:
+                    continue
+                keys.discard(key)
+                if not keys:
+                    del postings[token]
+                    self._dirty.add(field)
+            for token in new_tokens - old_tokens:
+                keys = postings.get(token)
+                if keys is None:
+                    keys = postings[token] = set()
+                    self._dirty.add(field)
+                keys.add(key)
+            if value:
+                text[key] = value
+            else:
+                text.pop(key, None)
+        return changed
+
+    def remove(self, key: str) -> None:
+        if key in self._keys:
+            self.update(key, **{field: "" for field in self.FIELDS})
+            self._keys.discard(key)
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def search(self, query: str) -> Set[str]:
+        """返回匹配查询的文档键，空查询匹配全部"""
+        result: Optional[Set[str]] = None
+        for field, term in parse_query(query):
+            matched = self._match(field, term)
+            result = matched if result is None else result & matched
+            if not result:
+                return set()
+        return set(self._keys) if result is None else result
+
+    def _match(self, field: Optional[str], term: str) -> Set[str]:
+        tokens = tokenize(term, query=True)
+        if not tokens:
+            # 只有标点的词无法走索引，直接扫描原文
+            fields = (field,) if field else self.FIELDS
+            return {key for f in fields for key, text in self._text[f].items() if term in text}
+
+        matched: Set[str] = set()
+        for f in ((field,) if field else self.FIELDS):
+            candidates: Optional[Set[str]] = None
+            for token in tokens:
+                keys = self._lookup(f, token)
+                candidates = keys if candidates is None else candidates & keys
+                if not candidates:
+                    break
+            if not candidates:
+                continue
+            if len(tokens) > 1 or term != tokens[0]:
+                # 词内各部分必须按原顺序相邻出现
+                text = self._text[f]
+                candidates = {key for key in candidates if term in text[key]}
+            matched |= candidates
+        return matched
+
+    def _lookup(self, field: str, token: str) -> Set[str]:
+        """字段中包含 token 的所有词对应的文档，token 较短时只找以它开头的词"""
+        if len(token) < self.MIN_SUBSTRING:
+            return self._prefix(field, token)
+        postings = self._postings[field]
+        keys: Set[str] = set()
+        for word in self._sorted_vocab(field):
+            if token in word:
+                keys |= postings[word]
+        return keys
+
+    def _sorted_vocab(self, field: str) -> List[str]:
+        if field in self._dirty:
+            self._vocab[field] = sorted(self._postings[field])
+            self._dirty.discard(field)
+        return self._vocab[field]
+
+    def _prefix(self, field: str, prefix: str) -> Set[str]:
+        """字段中以 prefix 开头的所有词对应的文档"""
+        vocab = self._sorted_vocab(field)
+        postings = self._postings[field]
+        keys: Set[str] = set()
+        i = bisect.bisect_left(vocab, prefix)
+        while i < len(vocab) and vocab[i].startswith(prefix):
+            keys |= postings[vocab[i]]
+            i += 1
+        return keys
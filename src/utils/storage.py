@@ -0,0 +1,133 @@
+import asyncio
+import os
+import shutil
+import threading
+from typing import Dict, List, Optional, Tuple
+
+class InsufficientSpaceError(Exception):
+    """磁盘剩余空间不足"""
+    pass
+
+def _existing_dir(path: str) -> str:
+    """向上查找第一个已存在的目录，用于取设备号和剩余空间"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+class DiskSpaceReserver:
+    """按设备汇总所有进行中任务的空间预留"""
+    def __init__(self, min_free_mb: int = 500):
+        self.min_free_bytes = min_free_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._reserved: Dict[int, int] = {}  # 设备号 -> 已预留字节
+        self._by_task: Dict[str, List[Tuple[int, int]]] = {}
+
+    def reserve(self, key: str, path: str, size: int) -> None:
+        """为任务在 path 所在设备预留 size 字节，空间不足时抛出 InsufficientSpaceError"""
+        if size <= 0:
+            return
+        directory = _existing_dir(path)
+        device = os.stat(directory).st_dev
+        free = shutil.disk_usage(directory).free
+        with self._lock:
+            reserved = self._reserved.get(device, 0)
+            available = free - reserved - self.min_free_bytes
+            if size > available:
+                raise InsufficientSpaceError(
+                    f"磁盘空间不足: 需要 {size / 1024 / 1024:.0f} MB，"
+                    f"可用 {max(available, 0) / 1024 / 1024:.0f} MB ({directory})"
+                )
+            self._reserved[device] = reserved + size
+            self._by_task.setdefault(key, []).append((device, size))
+
+    def release(self, key: str, path: Optional[str] = None) -> None:
+        """释放任务的预留，指定 path 时只释放该路径所在设备上的部分"""
+        device = os.stat(_existing_dir(path)).st_dev if path else None
+        with self._lock:
+            kept = []
+            for dev, size in self._by_task.pop(key, []):
+                if device is not None and dev != device:
+                    kept.append((dev, size))
+                    continue
+                self._reserved[dev] = max(self._reserved.get(dev, 0) - size, 0)
+            if kept:
+                self._by_task[key] = kept
+
+    def reserved_bytes(self, path: str) -> int:
+        """path 所在设备当前的预留总量"""
+        device = os.stat(_existing_dir(path)).st_dev
+        with self._lock:
+            return self._reserved.get(device, 0)
+
+def preallocate(fd: int, size: int) -> None:
+    """为文件预分配空间以减少碎片，不支持的平台或文件系统忽略"""
+    if size <= 0 or not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except OSError:
+        pass
+
+class FileMover:
+    """后台文件搬运：把暂存目录中完成的文件移动到最终保存路径
+
+    同一设备上直接原子重命名；跨设备时先预分配并复制到目标目录的临时文件，再原子重命名。
+    保存路径中已有同名文件时改用带序号的文件名。
+    """
+    CHUNK_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, max_workers: int = 2):
+        self.semaphore = asyncio.Semaphore(max(max_workers, 1))
+
+    async def move(self, src: str, dest_dir: str) -> str:
+        """移动文件到 dest_dir，返回目标路径"""
+        async with self.semaphore:
+            return await asyncio.get_event_loop().run_in_executor(None, self._move, src, dest_dir)
+
+    @staticmethod
+    def _claim_path(dest: str) -> str:
+        """以独占方式创建目标文件占住文件名，已存在时在文件名后加序号，不覆盖保存路径中的已有文件"""
+        root, ext = os.path.splitext(dest)
+        index = 0
+        while True:
+            candidate = f"{root} ({index}){ext}" if index else dest
+            try:
+                with open(candidate, "xb"):
+                    return candidate
+            except FileExistsError:
+                index += 1
+
+    def _move(self, src: str, dest_dir: str) -> str:
+        os.makedirs(dest_dir, exist_ok=True)
+        dest = self._claim_path(os.path.join(dest_dir, os.path.basename(src)))
+        try:
+            os.replace(src, dest)  # 替换的是刚创建的占位文件
+            return dest
+        except OSError:
+            pass  # 跨设备，改为复制
+
+        temp = dest + ".moving"
+        try:
+            with open(src, "rb") as fin, open(temp, "wb") as fout:
+                preallocate(fout.fileno(), os.fstat(fin.fileno()).st_size)
+                while True:
+                    chunk = fin.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    fout.write(chunk)
+                # 预分配可能超出实际大小，按实际写入量截断
+                fout.truncate()
+            shutil.copystat(src, temp)
+            os.replace(temp, dest)
+        except BaseException:
+            os.remove(dest)  # 复制失败时删除占位文件
+            raise
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+        os.remove(src)
+        return dest
@@ -0,0 +1,88 @@
+import threading
+import time
+from array import array
+from typing import List, Optional
+
+class ThroughputEstimator:
+    """基于环形缓冲区的吞吐估计
+
+    下载字节按固定时间片累计，每个时间片结束时把平均速度写入定长的数值环形缓冲，
+    同时更新指数加权平均（EWMA）。显示速度和剩余时间都取平滑后的值，不随瞬时速度跳动；
+    没有数据的时间片按0计入，下载停滞时速度会逐渐下降。进度回调在多个线程中调用，内部加锁。
+    """
+    def __init__(self, slots: int = 60, interval: float = 1.0, smoothing: float = 0.3):
+        self.interval = interval
+        self.smoothing = smoothing
+        self.samples = array("d", bytes(8 * slots))  # 每个时间片的平均速度(字节/秒)
+        self._index = 0    # 下一个写入位置
+        self._count = 0    # 已写入的时间片数，最多为 slots
+        self._rate = 0.0
+        self._bucket_start: Optional[float] = None
+        self._bucket_bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, nbytes: int, now: Optional[float] = None) -> None:
+        """记录新下载的字节数"""
+        if nbytes <= 0:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._roll(now)
+            self._bucket_bytes += nbytes
+
+    def _roll(self, now: float) -> None:
+        """结束已经过去的时间片"""
+        if self._bucket_start is None:
+            self._bucket_start = now
+            return
+        elapsed = int((now - self._bucket_start) // self.interval)
+        if elapsed <= 0:
+            return
+        # 长时间没有数据时最多补满一圈0，EWMA 按实际经过的时间片衰减
+        for i in range(min(elapsed, len(self.samples))):
+            self._push(self._bucket_bytes / self.interval if i == 0 else 0.0)
+        if elapsed > len(self.samples):
+            self._rate *= (1 - self.smoothing) ** (elapsed - len(self.samples))
+        self._bucket_bytes = 0
+        self._bucket_start += elapsed * self.interval
+
+    def _push(self, sample: float) -> None:
+        self.samples[self._index] = sample
+        self._index = (self._index + 1) % len(self.samples)
+        # 第一个时间片直接作为初值，避免从0缓慢爬升
+        self._rate = sample if self._count == 0 else self._rate + self.smoothing * (sample - self._rate)
+        self._count = min(self._count + 1, len(self.samples))
+
+    def rate(self, now: Optional[float] = None) -> float:
+        """平滑后的速度(字节/秒)，还没有完整时间片时返回0"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._roll(now)
+            return self._rate
+
+    def eta(self, remaining_bytes: int, now: Optional[float] = None) -> Optional[int]:
+        """按平滑速度估算剩余秒数，速度未知时返回None"""
+        rate = self.rate(now)
+        if rate <= 0:
+            return None
+        return int(max(remaining_bytes, 0) / rate)
+
+    def history(self, now: Optional[float] = None) -> List[float]:
+        """按时间先后返回缓冲中的速度样本"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._roll(now)
+            size = len(self.samples)
+            start = (self._index - self._count) % size
+            return [self.samples[(start + i) % size] for i in range(self._count)]
+
+_SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+def sparkline(values: List[float], width: int = 30) -> str:
+    """用方块字符绘制速度曲线，取最近 width 个样本"""
+    values = values[-width:]
+    peak = max(values, default=0)
+    if peak <= 0:
+        return _SPARK_CHARS[0] * len(values)
+    top = len(_SPARK_CHARS) - 1
+    return "".join(_SPARK_CHARS[min(int(v / peak * top + 0.5), top)] for v in values)
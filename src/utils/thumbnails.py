@@ -0,0 +1,74 @@
+import hashlib
+import os
+import threading
+from typing import Optional
+
+THUMBNAIL_DIR = os.path.join(os.path.expanduser("~"), ".video_downloader", "thumbnails")
+
+class ThumbnailStore:
+    """缩略图的磁盘缓存，总大小超过上限时删除最久未使用的文件
+
+    文件名取缩略图URL的哈希，保存的是已缩小过的图片。读取时更新修改时间作为最近使用时间。
+    由线程池中的加载线程调用，内部加锁。
+    """
+    def __init__(self, directory: str = THUMBNAIL_DIR, max_bytes: int = 100 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total: Optional[int] = None  # 第一次写入时扫描目录得到
+
+    def path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".jpg")
+
+    def get(self, url: str) -> Optional[bytes]:
+        path = self.path(url)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, url: str, data: bytes) -> None:
+        path = self.path(url)
+        with self._lock:
+            if self._total is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._total = self._scan_size()
+            try:
+                previous = os.path.getsize(path)
+            except OSError:
+                previous = 0
+            temp = path + ".tmp"
+            with open(temp, "wb") as f:
+                f.write(data)
+            os.replace(temp, path)
+            self._total += len(data) - previous
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _scan_size(self) -> int:
+        total = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    total += entry.stat().st_size
+        return total
+
+    def _evict(self) -> None:
+        """按最近使用时间删除到上限的九成，调用方需持有锁"""
+        with os.scandir(self.directory) as entries:
+            files = sorted(
+                (entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                for entry in entries if entry.is_file()
+            )
+        target = self.max_bytes * 0.9
+        for _, size, path in files:
+            if self._total <= target:
+                break
+            try:
+                os.remove(path)
+                self._total -= size
+            except OSError:
+                pass
@@ -0,0 +1,249 @@
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+# 任务在共享队列中的状态
+QUEUED = "queued"        # 等待工作节点领取
+LEASED = "leased"        # 已被某个节点租用，租约到期前需要续租
+FINISHED = "finished"    # 已结束，task_status 为最终状态
+CANCELLED = "cancelled"  # 被协调端取消，持有的节点在下次心跳时停止
+
+# 工作节点可以回报的字段
+PROGRESS_FIELDS = (
+    "task_status", "progress", "speed_bps", "eta_seconds", "downloaded_bytes", "total_bytes",
+    "filename", "note", "error_message", "file_size", "content_hash",
+)
+
+@dataclass
+class Job:
+    url: str
+    save_path: str
+    off_peak: bool = False
+    state: str = QUEUED
+    task_status: str = ""
+    worker: str = ""
+    lease_until: float = 0
+    attempts: int = 0
+    progress: float = 0.0
+    speed_bps: Optional[float] = None
+    eta_seconds: Optional[int] = None
+    downloaded_bytes: int = 0
+    total_bytes: int = 0
+    filename: str = ""
+    note: str = ""
+    error_message: str = ""
+    file_size: int = 0
+    content_hash: str = ""
+    version: int = 0
+
+_JOB_COLUMNS = ", ".join(Job.__dataclass_fields__)
+
+class SharedQueue:
+    """基于共享SQLite文件的任务队列
+
+    多个进程（可以在不同机器上，通过共享存储访问同一个文件）通过租约领取任务：
+    领取时写入租约到期时间，持有者定期心跳续租并回报进度；节点失联导致租约过期后，
+    任务重新回到队列由其他节点领取，超过最大次数则判定失败。每次修改都递增 version，
+    协调端只读取上次之后变化的行。租约使用各节点的本地时钟，节点之间需要时间同步。
+    """
+    def __init__(self, db_path: str, max_attempts: int = 3):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        # 手动管理事务，写操作用 BEGIN IMMEDIATE 串行化，保证同一任务只被一个节点拿到；
+        # 未提交就关闭连接时事务自动回滚
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    url TEXT PRIMARY KEY,
+                    save_path TEXT,
+                    off_peak INTEGER DEFAULT 0,
+                    state TEXT,
+                    task_status TEXT DEFAULT '',
+                    worker TEXT DEFAULT '',
+                    lease_until REAL DEFAULT 0,
+                    attempts INTEGER DEFAULT 0,
+                    progress REAL DEFAULT 0,
+                    speed_bps REAL,
+                    eta_seconds INTEGER,
+                    downloaded_bytes INTEGER DEFAULT 0,
+                    total_bytes INTEGER DEFAULT 0,
+                    filename TEXT DEFAULT '',
+                    note TEXT DEFAULT '',
+                    error_message TEXT DEFAULT '',
+                    file_size INTEGER DEFAULT 0,
+                    content_hash TEXT DEFAULT '',
+                    version INTEGER DEFAULT 0,
+                    enqueued_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state, enqueued_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_version ON jobs(version)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS workers (
+                    id TEXT PRIMARY KEY,
+                    heartbeat_at REAL,
+                    active INTEGER
+                )
+            """)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _next_version(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM jobs").fetchone()[0]
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Job:
+        job = Job(**{name: row[name] for name in Job.__dataclass_fields__})
+        job.off_peak = bool(job.off_peak)
+        return job
+
+    def enqueue(self, url: str, save_path: str, off_peak: bool = False) -> None:
+        """提交任务，同一URL已有记录时重置为待领取"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("""
+                INSERT OR REPLACE INTO jobs (url, save_path, off_peak, state, version, enqueued_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (url, save_path, int(off_peak), QUEUED, self._next_version(conn), time.time()))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def lease(self, worker_id: str, lease_seconds: float) -> Optional[Job]:
+        """领取一个任务，没有可领取的任务时返回None"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            version = self._reclaim(conn, now)
+            row = conn.execute("""
+                SELECT url FROM jobs WHERE state = ? ORDER BY enqueued_at LIMIT 1
+            """, (QUEUED,)).fetchone()
+            job = None
+            if row:
+                conn.execute("""
+                    UPDATE jobs SET state = ?, worker = ?, lease_until = ?, task_status = '', version = ?
+                    WHERE url = ?
+                """, (LEASED, worker_id, now + lease_seconds, version, row["url"]))
+                job = self._row_to_job(conn.execute(
+                    f"SELECT {_JOB_COLUMNS} FROM jobs WHERE url = ?", (row["url"],)
+                ).fetchone())
+            conn.execute("COMMIT")
+            return job
+        finally:
+            conn.close()
+
+    def reclaim_expired(self) -> None:
+        """把租约过期的任务放回队列"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._reclaim(conn, time.time())
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _reclaim(self, conn: sqlite3.Connection, now: float) -> int:
+        """在当前事务中回收过期租约，返回本事务可用的 version"""
+        version = self._next_version(conn)
+        conn.execute("""
+            UPDATE jobs SET state = ?, task_status = 'error', error_message = '工作节点多次失联', version = ?
+            WHERE state = ? AND lease_until < ? AND attempts + 1 >= ?
+        """, (FINISHED, version, LEASED, now, self.max_attempts))
+        conn.execute("""
+            UPDATE jobs SET state = ?, worker = '', attempts = attempts + 1, task_status = '',
+                            speed_bps = NULL, eta_seconds = NULL, note = '工作节点失联，等待重新分配', version = ?
+            WHERE state = ? AND lease_until < ?
+        """, (QUEUED, version, LEASED, now))
+        return version
+
+    def heartbeat(self, worker_id: str, progress: Dict[str, dict], lease_seconds: float) -> Set[str]:
+        """续租并回报进度，返回已不再由本节点持有（被取消或重新分配）的URL"""
+        conn = self._connect()
+        lost = set()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            now = time.time()
+            version = self._next_version(conn)
+            for url, fields in progress.items():
+                updates = {k: v for k, v in fields.items() if k in PROGRESS_FIELDS}
+                assignments = "".join(f", {k} = ?" for k in updates)
+                cursor = conn.execute(
+                    f"UPDATE jobs SET lease_until = ?, version = ?{assignments} "
+                    f"WHERE url = ? AND worker = ? AND state = ?",
+                    (now + lease_seconds, version, *updates.values(), url, worker_id, LEASED)
+                )
+                if cursor.rowcount == 0:
+                    lost.add(url)
+            conn.execute("""
+                INSERT OR REPLACE INTO workers (id, heartbeat_at, active) VALUES (?, ?, ?)
+            """, (worker_id, now, len(progress) - len(lost)))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return lost
+
+    def complete(self, url: str, worker_id: str, fields: dict) -> bool:
+        """回报任务结束，任务已不由本节点持有时返回False"""
+        updates = {k: v for k, v in fields.items() if k in PROGRESS_FIELDS}
+        assignments = "".join(f", {k} = ?" for k in updates)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                f"UPDATE jobs SET state = ?, version = ?{assignments} WHERE url = ? AND worker = ? AND state = ?",
+                (FINISHED, self._next_version(conn), *updates.values(), url, worker_id, LEASED)
+            )
+            conn.execute("COMMIT")
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def cancel(self, url: str) -> None:
+        """取消未结束的任务，持有它的节点在下次心跳时停止"""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("""
+                UPDATE jobs SET state = ?, task_status = 'cancelled', version = ?
+                WHERE url = ? AND state IN (?, ?)
+            """, (CANCELLED, self._next_version(conn), url, QUEUED, LEASED))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def changes(self, since_version: int) -> Tuple[List[Job], int]:
+        """读取 version 大于 since_version 的任务，返回 (任务列表, 最新version)"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT {_JOB_COLUMNS} FROM jobs WHERE version > ? ORDER BY version", (since_version,)
+            ).fetchall()
+        finally:
+            conn.close()
+        jobs = [self._row_to_job(row) for row in rows]
+        return jobs, max((job.version for job in jobs), default=since_version)
+
+    def live_workers(self, timeout: float) -> int:
+        """最近 timeout 秒内有心跳的节点数"""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT COUNT(*) FROM workers WHERE heartbeat_at > ?", (time.time() - timeout,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
@@ -0,0 +1,117 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import yt_dlp
+
+# 每个任务都不同、在借出时单独设置的选项，不参与分组
+_PER_TASK_KEYS = ("outtmpl", "paths", "progress_hooks", "ratelimit", "logger")
+
+def options_key(opts: Dict[str, Any]) -> str:
+    """按有效选项（代理、格式、限速等）生成分组键"""
+    effective = {k: v for k, v in opts.items() if k not in _PER_TASK_KEYS}
+    return json.dumps(effective, sort_keys=True, default=repr)
+
+class DownloaderPool:
+    """长期存活的 YoutubeDL 实例池
+
+    YoutubeDL 持有HTTP会话、Cookie和已初始化的提取器，复用可以省去每个任务的
+    TCP/TLS握手和初始化开销。实例不是线程安全的，同一时间只借给一个使用者，
+    归还后按选项分组缓存，空闲过久或超出上限的实例会被关闭。
+
+    总限速在借出用于传输（transfer=True）的实例之间平分，只借去解析或发请求的实例不限速
+    也不占份额。yt-dlp 每写入一块数据都会重新读取 params 中的 ratelimit，所以调整总限速或
+    传输数量变化时，正在进行的传输会立即按新的份额限速。
+    """
+    def __init__(self, max_idle_per_key: int = 4, idle_timeout: float = 300.0,
+                 factory: Callable[[Dict[str, Any]], Any] = yt_dlp.YoutubeDL):
+        self.max_idle_per_key = max_idle_per_key
+        self.idle_timeout = idle_timeout
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._idle: Dict[str, List[Tuple[float, Any]]] = {}  # 分组键 -> [(归还时间, 实例)]
+        self._transferring: Set[Any] = set()  # 借出用于传输的实例，总限速在其中平分
+        self.ratelimit: Optional[float] = None  # 所有借出实例合计的限速(字节/秒)，None表示不限速
+
+    @contextmanager
+    def acquire(self, opts: Dict[str, Any], outtmpl: Optional[str] = None,
+                logger: Optional[Any] = None, transfer: bool = False) -> Iterator[Any]:
+        """借出一个实例，outtmpl 为本次使用的输出模板，logger 为本次使用的yt-dlp日志对象，
+        transfer 为True时本次用于下载数据，参与分配总限速"""
+        key = options_key(opts)
+        ydl = self._take(key)
+        if ydl is None:
+            ydl = self._factory(dict(opts))
+        if outtmpl:
+            ydl.params["outtmpl"]["default"] = outtmpl
+        # 实例被不同任务复用，每次借出都重新设置，避免输出记到上一个任务名下
+        ydl.params["logger"] = logger or opts.get("logger")
+        ydl.params["ratelimit"] = None
+        if transfer:
+            with self._lock:
+                self._transferring.add(ydl)
+                self._rebalance()
+        try:
+            yield ydl
+        finally:
+            if transfer:
+                with self._lock:
+                    self._transferring.discard(ydl)
+                    self._rebalance()
+            self._give_back(key, ydl)
+
+    def set_ratelimit(self, ratelimit: Optional[float]):
+        """设置总限速并立即应用到借出中的实例"""
+        with self._lock:
+            self.ratelimit = ratelimit or None
+            self._rebalance()
+
+    def _rebalance(self):
+        """按传输中的实例数平分总限速，调用方需持有锁"""
+        share = self.ratelimit / len(self._transferring) if self.ratelimit and self._transferring else None
+        for ydl in self._transferring:
+            ydl.params["ratelimit"] = share
+
+    def _take(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        expired = []
+        found = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                returned_at, ydl = idle.pop()
+                if now - returned_at > self.idle_timeout:
+                    expired.append(ydl)
+                    continue
+                found = ydl
+                break
+        for ydl in expired:
+            self._close(ydl)
+        return found
+
+    def _give_back(self, key: str, ydl: Any):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_key:
+                idle.append((time.monotonic(), ydl))
+                return
+        self._close(ydl)
+
+    def clear(self):
+        """关闭所有空闲实例，配置变更后调用"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for instances in idle.values():
+            for _, ydl in instances:
+                self._close(ydl)
+
+    @staticmethod
+    def _close(ydl: Any):
+        close = getattr(ydl, "close", None)
+        if close:
+            try:
+                close()
+            except Exception:
+                pass
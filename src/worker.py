@@ -0,0 +1,40 @@
+import argparse
+import asyncio
+import logging
+from downloader import VideoDownloader
+from distributed import Worker
+from utils.config import AppConfig
+from utils.logs import log_manager
+from utils.work_queue import SharedQueue
+
+logger = logging.getLogger("worker")
+
+async def main():
+    config = AppConfig.load()
+    parser = argparse.ArgumentParser(description="分布式下载工作节点")
+    parser.add_argument("--queue", default=config.distributed_queue, help="共享队列的SQLite文件路径")
+    parser.add_argument("--id", default="", help="节点名称，默认为 主机名-进程号")
+    parser.add_argument("--slots", type=int, default=config.max_concurrent_downloads, help="同时领取的任务数")
+    parser.add_argument("--lease", type=float, default=config.worker_lease_seconds, help="租约时长(秒)")
+    args = parser.parse_args()
+    if not args.queue:
+        parser.error("请通过 --queue 或配置文件的 distributed_queue 指定共享队列")
+    
+    # 命令行运行，日志同时输出到控制台
+    log_manager.start(config.log_level, config.log_component_levels, config.log_max_mb,
+                      config.log_backups, console=True)
+    
+    # 工作节点使用本机配置（限速、带宽计划、暂存目录等）
+    downloader = VideoDownloader(config=config)
+    
+    worker = Worker(downloader, SharedQueue(args.queue), args.id, args.slots, args.lease)
+    logger.info("工作节点 %s 已启动，队列: %s", worker.worker_id, args.queue)
+    await worker.run()
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        log_manager.stop()
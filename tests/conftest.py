@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 源代码以 src 为根目录导入（与 python src/main.py 运行时相同）
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,205 @@
+import asyncio
+
+import pytest
+
+from utils.proxy_pool import ProxyStats
+
+PROXIES = ["http://127.0.0.1:1", "http://127.0.0.1:2"]
+
+@pytest.fixture
+def make_downloader(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))  # 历史记录写到临时目录
+    from downloader import VideoDownloader
+
+    def make():
+        downloader = VideoDownloader()
+        downloader.proxies._proxies = {url: ProxyStats(url) for url in PROXIES}  # 不启动后台探测
+        return downloader
+    return make
+
+def test_extraction_and_transfer_share_proxy(make_downloader, tmp_path):
+    from downloader import TaskStatus
+
+    async def scenario():
+        downloader = make_downloader()
+        calls = []
+
+        async def extract(url, proxy):
+            calls.append(("extract", proxy))
+            other.append(downloader.proxies.acquire())  # 另一个任务在解析期间开始下载
+
+        async def fetch(url, save_path, proxy=None):
+            calls.append(("fetch", proxy))
+            return []
+        other = []
+        downloader._extract_info, downloader._fetch_streams = extract, fetch
+        downloader.add_task("https://example.com/a", str(tmp_path))
+        await downloader._do_download("https://example.com/a", str(tmp_path))
+
+        assert calls[0][0] == "extract" and calls[0][1] in PROXIES
+        assert calls == [("extract", calls[0][1]), ("fetch", calls[0][1])]
+        assert other[0] != calls[0][1]
+        downloader.proxies.release(other[0])
+        assert all(p.active == 0 for p in downloader.proxies.proxies)
+        assert downloader.get_task("https://example.com/a").status == TaskStatus.COMPLETED
+
+    asyncio.run(scenario())
+
+def test_throttled_transfer_rotates_to_acquired_proxy(make_downloader, tmp_path):
+    from downloader import TaskStatus
+
+    async def scenario():
+        downloader = make_downloader()
+        used = []
+
+        async def extract(url, proxy):
+            used.append(proxy)
+
+        async def fetch(url, save_path, proxy=None):
+            used.append(proxy)
+            # 每次尝试期间恰好只占用自己的代理
+            assert [p.url for p in downloader.proxies.proxies if p.active] == [proxy]
+            if len(used) == 2:
+                raise OSError("HTTP Error 429: Too Many Requests")
+            return []
+        downloader._extract_info, downloader._fetch_streams = extract, fetch
+        downloader.add_task("https://example.com/a", str(tmp_path))
+        await downloader._do_download("https://example.com/a", str(tmp_path))
+
+        first, rotated = used[1], used[2]
+        assert used[0] == first and rotated != first and len(used) == 3
+        assert downloader.proxies._proxies[first].evicted
+        assert all(p.active == 0 for p in downloader.proxies.proxies)
+        assert downloader.get_task("https://example.com/a").status == TaskStatus.COMPLETED
+
+    asyncio.run(scenario())
+
+def test_finished_tasks_beyond_retention_are_evicted(make_downloader, tmp_path):
+    from downloader import TaskStatus
+
+    async def scenario():
+        downloader = make_downloader()
+        downloader.finished_task_retention = 2
+        urls = [f"https://example.com/{i}" for i in range(4)]
+        for url in urls:
+            downloader.add_task(url, str(tmp_path))
+        downloader.add_task("https://example.com/queued", str(tmp_path))
+        for url in urls:
+            downloader.cancel_task(url)
+
+        assert downloader.take_evicted() == urls[:2]
+        assert downloader.take_evicted() == []
+        assert set(downloader.tasks) == set(urls[2:]) | {"https://example.com/queued"}
+        assert downloader.status_counts.total == 3
+        assert downloader.status_counts.counts[TaskStatus.CANCELLED] == 2
+        # 移出内存的任务仍保留在历史记录中
+        assert {r.url for r in downloader.history.get_records()} == set(urls)
+
+    asyncio.run(scenario())
+
+def test_redownloading_task_is_not_evicted(make_downloader, tmp_path):
+    async def scenario():
+        downloader = make_downloader()
+        downloader.finished_task_retention = 1
+        downloader.add_task("https://example.com/a", str(tmp_path))
+        downloader.cancel_task("https://example.com/a")
+        downloader.add_task("https://example.com/a", str(tmp_path))  # 重新下载，新任务尚未结束
+        downloader.add_task("https://example.com/b", str(tmp_path))
+        downloader.cancel_task("https://example.com/b")
+
+        assert downloader.take_evicted() == []
+        assert not downloader.get_task("https://example.com/a").finished
+        assert downloader.status_counts.total == 2
+
+    asyncio.run(scenario())
+
+def test_transition_table(make_downloader, tmp_path):
+    from downloader import InvalidTransitionError, TaskStatus, _TRANSITIONS
+
+    async def scenario():
+        downloader = make_downloader()
+        for old in TaskStatus:
+            for new in TaskStatus:
+                if new == old:
+                    continue
+                task = downloader.add_task(f"https://example.com/{old.value}-{new.value}", str(tmp_path))
+                task.status = old
+                if new in _TRANSITIONS[old]:
+                    assert downloader._set_status(task, new)
+                    assert task.status == new
+                else:
+                    with pytest.raises(InvalidTransitionError):
+                        downloader._set_status(task, new)
+                    assert task.status == old
+
+    asyncio.run(scenario())
+
+def test_listeners_and_status_counter(make_downloader, tmp_path):
+    from downloader import TaskStatus
+
+    async def scenario():
+        downloader = make_downloader()
+        events = []
+        downloader.listeners.append(lambda task, old, new: events.append((old, new)))
+        task = downloader.add_task("https://example.com/a", str(tmp_path))
+        downloader._set_status(task, TaskStatus.DOWNLOADING)
+        assert not downloader._set_status(task, TaskStatus.DOWNLOADING)  # 状态不变时不通知
+        downloader._set_status(task, TaskStatus.COMPLETED)
+
+        assert events == [(None, TaskStatus.PENDING), (TaskStatus.PENDING, TaskStatus.DOWNLOADING),
+                          (TaskStatus.DOWNLOADING, TaskStatus.COMPLETED)]
+        counts = downloader.status_counts.counts
+        assert downloader.status_counts.total == 1
+        assert counts[TaskStatus.COMPLETED] == 1
+        assert counts[TaskStatus.PENDING] == counts[TaskStatus.DOWNLOADING] == 0
+
+    asyncio.run(scenario())
+
+def test_pause_resume_restores_previous_status(make_downloader, tmp_path):
+    from downloader import TaskStatus
+
+    async def scenario():
+        downloader = make_downloader()
+        queued = downloader.add_task("https://example.com/queued", str(tmp_path))
+        running = downloader.add_task("https://example.com/running", str(tmp_path))
+        downloader._set_status(running, TaskStatus.DOWNLOADING)
+        for task in (queued, running):
+            assert downloader.pause_task(task.url)
+            assert not downloader.pause_task(task.url)
+            assert task.status == TaskStatus.PAUSED
+            assert downloader.resume_task(task.url)
+            assert not downloader.resume_task(task.url)
+        assert queued.status == TaskStatus.PENDING
+        assert running.status == TaskStatus.DOWNLOADING
+
+    asyncio.run(scenario())
+
+def test_cancel_wins_over_engine_updates(make_downloader, tmp_path):
+    from downloader import TaskStatus
+
+    async def scenario():
+        downloader = make_downloader()
+        task = downloader.add_task("https://example.com/a", str(tmp_path))
+        downloader._set_status(task, TaskStatus.DOWNLOADING)
+        downloader._running.add(task.url)  # 执行中的任务由 _do_download 记录
+        assert downloader.cancel_task(task.url)
+        assert not downloader.cancel_task(task.url)
+        # 取消后引擎的状态更新被忽略，不抛出异常
+        assert not downloader._set_status(task, TaskStatus.COMPLETED)
+        assert task.status == TaskStatus.CANCELLED
+        assert downloader.history.get_record(task.url) is None
+        assert not downloader.pause_task(task.url)
+
+    asyncio.run(scenario())
+
+def test_cancelling_queued_task_records_history(make_downloader, tmp_path):
+    from downloader import TaskStatus
+
+    async def scenario():
+        downloader = make_downloader()
+        task = downloader.add_task("https://example.com/a", str(tmp_path))
+        assert downloader.cancel_task(task.url)
+        assert task.status == TaskStatus.CANCELLED
+        assert downloader.history.get_record(task.url).status == TaskStatus.CANCELLED.value
+
+    asyncio.run(scenario())
@@ -0,0 +1,56 @@
+from utils.formats import video_then_audio
+
+VIDEO = {"format_id": "137", "vcodec": "avc1.640028", "acodec": "none", "height": 1080}
+AUDIO = {"format_id": "140", "vcodec": "none", "acodec": "mp4a.40.2", "abr": 128}
+
+def test_video_then_audio_orders_streams():
+    assert video_then_audio([VIDEO, AUDIO]) == [VIDEO, AUDIO]
+    # bestaudio+bestvideo 的顺序
+    assert video_then_audio([AUDIO, VIDEO]) == [VIDEO, AUDIO]
+    # 视频流未标注编码时按高度判断
+    unknown = {"format_id": "x", "height": 720}
+    assert video_then_audio([AUDIO, unknown]) == [unknown, AUDIO]
+
+def test_video_then_audio_rejects_other_pairs():
+    assert video_then_audio([VIDEO, dict(VIDEO, format_id="136")]) is None
+    assert video_then_audio([AUDIO, dict(AUDIO, format_id="251")]) is None
+    assert video_then_audio([VIDEO]) is None
+
+from utils.formats import parse_target, resolve_format
+
+MB = 1024 * 1024
+
+def _video(fid, height, size, vcodec="avc1", fps=30, **extra):
+    return dict(format_id=fid, vcodec=vcodec, acodec="none", height=height, fps=fps, filesize=size, **extra)
+
+def _audio(fid, abr, size, **extra):
+    return dict(format_id=fid, vcodec="none", acodec="opus", abr=abr, tbr=abr, filesize=size, **extra)
+
+def test_resolve_format_picks_smallest_at_best_height():
+    formats = [_video("1080h264", 1080, 300 * MB), _video("1080vp9", 1080, 200 * MB, vcodec="vp9"),
+               _video("720", 720, 100 * MB), _audio("a128", 128, 5 * MB), _audio("a64", 64, 3 * MB)]
+    decision = resolve_format(formats, parse_target("best"))
+    assert decision.selector == "1080vp9+a128"
+    assert "少 33%" in decision.reason
+    assert resolve_format(formats, parse_target("720p")).selector == "720+a128"
+
+def test_resolve_format_steps_down_for_byte_budget():
+    formats = [_video("1080", 1080, 300 * MB), _video("720", 720, 150 * MB), _video("480", 480, 80 * MB),
+               _audio("a", 128, 5 * MB)]
+    decision = resolve_format(formats, parse_target("best"), byte_budget=160 * MB)
+    assert decision.selector == "720+a" and decision.height == 720
+    assert "1080p" in decision.reason and "超出预算" in decision.reason
+    # 最低清晰度仍超出时照常下载并说明
+    decision = resolve_format(formats, parse_target("best"), byte_budget=10 * MB)
+    assert decision.selector == "480+a" and "最低清晰度仍超出预算" in decision.reason
+
+def test_resolve_format_prefers_original_audio_and_skips_drm():
+    formats = [_video("drm", 2160, 100 * MB, has_drm=True), _video("1080", 1080, 200 * MB),
+               _audio("dub", 128, 4 * MB, language="de", language_preference=-1),
+               _audio("orig", 160, 6 * MB, language="en", language_preference=10)]
+    decision = resolve_format(formats, parse_target("best"))
+    assert decision.selector == "1080+orig"
+
+def test_resolve_format_defers_custom_selectors():
+    assert resolve_format([_video("1080", 1080, MB), _audio("a", 128, MB)], parse_target("bv*+ba")) is None
+    assert resolve_format([], parse_target("best")) is None
@@ -0,0 +1,37 @@
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from utils.history import DownloadHistory, DownloadRecord
+
+def _record(url, days_ago, status="completed"):
+    start = datetime.now() - timedelta(days=days_ago)
+    return DownloadRecord(url=url, filename="f.mp4", save_path="/tmp", start_time=start,
+                          end_time=start + timedelta(seconds=10), status=status, file_size=100)
+
+def test_archive_and_clear_all(tmp_path):
+    history = DownloadHistory(str(tmp_path / "history.db"))
+    history.add_record(_record("https://example.com/old", 100))
+    history.add_record(_record("https://example.com/new", 1))
+    assert history.archive(datetime.now() - timedelta(days=30)) == 1
+    assert [r.url for r in history.get_records()] == ["https://example.com/new"]
+    with history.analytics_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM all_downloads").fetchone()[0] == 2
+
+    history.clear_all()
+    assert history.get_records() == []
+    with history.analytics_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM all_downloads").fetchone()[0] == 0
+
+def test_add_record_waits_for_writer(tmp_path):
+    history = DownloadHistory(str(tmp_path / "history.db"))
+    conn = sqlite3.connect(history.db_path, check_same_thread=False)
+    conn.execute("BEGIN IMMEDIATE")  # 另一个连接持有写锁
+    timer = threading.Timer(0.3, conn.commit)
+    timer.start()
+    try:
+        history.add_record(_record("https://example.com/a", 0))
+    finally:
+        timer.join()
+        conn.close()
+    assert history.get_record("https://example.com/a") is not None
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from postprocessing import MediaValidator, ValidationError
+from utils.integrity import StreamHasher, file_digest, link_duplicate
+
+def test_stream_hasher_matches_full_digest(tmp_path):
+    part = tmp_path / "v.mp4.part"
+    hasher = StreamHasher(min_step=4)
+    data = b""
+    for chunk in (b"ab", b"cdef", b"ghijklmn", b"o"):
+        data += chunk
+        part.write_bytes(data)
+        hasher.advance(str(part), len(data))
+    assert hasher.offset == 14  # 不足 min_step 的尾部等到结束时再读
+    hasher.advance(str(part), len(data), force=True)
+    final = tmp_path / "v.mp4"
+    part.rename(final)
+    assert hasher.finalize(str(final)) == file_digest(str(final))
+
+def test_stream_hasher_restarts_when_file_shrinks(tmp_path):
+    path = tmp_path / "v.mp4"
+    hasher = StreamHasher(min_step=1)
+    path.write_bytes(b"stale data")
+    hasher.advance(str(path), 10)
+    path.write_bytes(b"new")
+    hasher.advance(str(path), 3)
+    assert hasher.finalize(str(path)) == file_digest(str(path))
+
+def test_stream_hasher_falls_back_after_file_changes(tmp_path):
+    path = tmp_path / "v.mp4"
+    hasher = StreamHasher(min_step=1)
+    hasher.advance(str(tmp_path / "missing"), 5)
+    assert not hasher.valid
+    path.write_bytes(b"remuxed")
+    assert hasher.finalize(str(path)) == file_digest(str(path))
+
+def test_link_duplicate(tmp_path):
+    existing, duplicate = tmp_path / "a.mp4", tmp_path / "b.mp4"
+    existing.write_bytes(b"same")
+    duplicate.write_bytes(b"same")
+    assert link_duplicate(str(existing), str(duplicate))
+    assert os.path.samefile(existing, duplicate)
+    assert not link_duplicate(str(existing), str(duplicate))  # 已经是同一个文件
+    assert not (tmp_path / "b.mp4.link").exists()
+
+def _validator(monkeypatch, returncode=0, duration=None, streams=True, stderr=b""):
+    validator = MediaValidator(max_workers=1)
+    validator.ffprobe = "ffprobe"
+    info = {"streams": [{"codec_type": "video"}] if streams else []}
+    if duration is not None:
+        info["format"] = {"duration": str(duration)}
+
+    async def fake_probe(path):
+        return returncode, json.dumps(info).encode(), stderr
+    monkeypatch.setattr(validator, "_probe", fake_probe)
+    return validator
+
+def test_validator_accepts_complete_file(monkeypatch):
+    timings = {}
+    validator = _validator(monkeypatch, duration=99.5)
+    assert asyncio.run(validator.validate("v.mp4", expected_duration=100, timings=timings)) == 99.5
+    assert "validate" in timings
+
+@pytest.mark.parametrize("kwargs, message", [
+    ({"duration": 50}, "短于预期"),
+    ({"returncode": 1, "stderr": b"moov atom not found\n"}, "moov atom not found"),
+    ({"duration": None}, "无法读取媒体时长"),
+    ({"duration": 100, "streams": False}, "没有音视频流"),
+])
+def test_validator_rejects_broken_file(monkeypatch, kwargs, message):
+    validator = _validator(monkeypatch, **kwargs)
+    with pytest.raises(ValidationError, match=message):
+        asyncio.run(validator.validate("v.mp4", expected_duration=100))
+
+def test_duplicate_download_is_replaced_by_hard_link(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    from downloader import VideoDownloader
+    from utils.history import DownloadRecord
+
+    async def scenario():
+        downloader = VideoDownloader()
+        first, second = tmp_path / "first.mp4", tmp_path / "second.mp4"
+        first.write_bytes(b"same content")
+        second.write_bytes(b"same content")
+        content_hash, size = file_digest(str(first))
+        downloader.history.add_record(DownloadRecord(
+            url="https://example.com/first", filename="first.mp4", save_path=str(tmp_path),
+            start_time=datetime.now(), status="completed", content_hash=content_hash, file_size=size))
+
+        task = downloader.add_task("https://example.com/second", str(tmp_path))
+        record = DownloadRecord(url=task.url, filename="", save_path=str(tmp_path), start_time=datetime.now())
+        downloader.deduplicate_files = True
+        await downloader._verify_output(task, record, str(second))
+
+        assert record.content_hash == content_hash and record.file_size == size
+        assert os.path.samefile(first, second)
+        assert task.note == "完成(与已有文件相同)"
+
+    asyncio.run(scenario())
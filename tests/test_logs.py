@@ -0,0 +1,80 @@
+import logging
+import queue
+import sys
+
+import pytest
+
+from utils.logs import (CompactFormatter, LogManager, TaskLogBuffer, YtdlpLogger, _DroppingQueueHandler,
+                        format_component_levels, parse_component_levels)
+
+def _record(message, url=None, level=logging.INFO, name="downloader", exc_info=None):
+    record = logging.LogRecord(name, level, __file__, 1, message, None, exc_info)
+    if url:
+        record.url = url
+    return record
+
+def test_parse_component_levels():
+    levels = parse_component_levels("ytdlp=debug，distributed = WARNING, ")
+    assert levels == {"ytdlp": "DEBUG", "distributed": "WARNING"}
+    assert format_component_levels(levels) == "ytdlp=DEBUG, distributed=WARNING"
+    with pytest.raises(ValueError):
+        parse_component_levels("ytdlp=LOUD")
+
+def test_compact_formatter_keeps_one_line_per_record():
+    line = CompactFormatter().format(_record("第一行\n第二行\t尾", url="https://example.com/a",
+                                             level=logging.WARNING))
+    fields = line.split("\t")
+    assert fields[1:] == ["W", "downloader", "https://example.com/a", "第一行\\n第二行 尾"]
+    assert CompactFormatter().format(_record("x")).split("\t")[3] == "-"
+
+def test_task_log_buffer_is_bounded_per_task():
+    buffer = TaskLogBuffer(capacity=3)
+    for i in range(5):
+        buffer.emit(_record(f"m{i}", url="https://example.com/a"))
+    buffer.emit(_record("no url"))
+    lines = buffer.lines("https://example.com/a")
+    assert [line.rsplit(" ", 1)[-1] for line in lines] == ["m2", "m3", "m4"]
+    assert "INFO [downloader]" in lines[0]
+    assert buffer.lines("https://example.com/b") == []
+    buffer.discard("https://example.com/a")
+    assert buffer.lines("https://example.com/a") == []
+
+def test_task_log_buffer_formats_exceptions_eagerly():
+    buffer = TaskLogBuffer()
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        buffer.emit(_record("failed", url="u", level=logging.ERROR, exc_info=sys.exc_info()))
+    [line] = buffer.lines("u")
+    assert "RuntimeError: boom" in line
+    assert isinstance(buffer._buffers["u"][0][3], str)
+
+def test_dropping_queue_handler_never_blocks():
+    handler = _DroppingQueueHandler(queue.Queue(2))
+    for i in range(5):
+        handler.handle(_record(f"m{i}"))
+    assert handler.queue.qsize() == 2 and handler.dropped == 3
+
+def test_log_manager_writes_journal_and_routes_ytdlp(tmp_path):
+    manager = LogManager()
+    root_level = logging.getLogger().level
+    manager.start("INFO", {"ytdlp": "DEBUG"}, directory=str(tmp_path))
+    try:
+        ytdlp = YtdlpLogger("https://example.com/a")
+        ytdlp.debug("[download] 10.0% of 1MiB")
+        logging.getLogger("downloader").debug("filtered")
+        logging.getLogger("downloader").info("kept", extra={"url": "https://example.com/a"})
+        manager.set_levels("INFO", {})
+        ytdlp.debug("filtered after reset")
+        assert logging.getLogger("ytdlp").level == logging.NOTSET
+    finally:
+        manager.stop()
+        logging.getLogger().setLevel(root_level)
+
+    lines = (tmp_path / "journal.log").read_text(encoding="utf-8").splitlines()
+    assert [line.split("\t")[2:] for line in lines] == [
+        ["ytdlp", "https://example.com/a", "[download] 10.0% of 1MiB"],
+        ["downloader", "https://example.com/a", "kept"],
+    ]
+    assert len(manager.task_logs.lines("https://example.com/a")) == 2
+    assert manager.task_logs not in logging.getLogger().handlers
@@ -0,0 +1,72 @@
+import asyncio
+import socket
+
+from utils.metrics import DownloadMetrics
+
+def test_render_prometheus_text():
+    metrics = DownloadMetrics()
+    metrics.inc("downloads_total", status="completed")
+    metrics.inc("downloads_total", status="completed")
+    metrics.set_gauge("active_downloads", 2)
+    metrics.observe_phases({"extraction": 0.3, "transfer": 20.0})
+    text = metrics.render()
+    assert '# TYPE downloads_total counter' in text
+    assert 'downloads_total{status="completed"} 2' in text
+    assert 'active_downloads 2' in text
+    assert 'download_phase_seconds_bucket{phase="extraction",le="0.5"} 1' in text
+    assert 'download_phase_seconds_bucket{phase="transfer",le="15"} 0' in text
+    assert 'download_phase_seconds_count{phase="transfer"} 1' in text
+
+def test_serve_metrics_and_busy_port():
+    async def scenario():
+        metrics = DownloadMetrics()
+        metrics.inc("downloads_total", status="error")
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        await metrics.serve(port)
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /metrics HTTP/1.0\r\n\r\n")
+            response = (await reader.read()).decode()
+            writer.close()
+            assert response.startswith("HTTP/1.0 200")
+            assert 'downloads_total{status="error"} 1' in response
+
+            # 端口被占用时不抛出，继续运行
+            other = DownloadMetrics()
+            await other.serve(port)
+            assert other._server is None
+        finally:
+            await metrics.stop()
+
+    asyncio.run(scenario())
+
+def test_phase_timings_recorded_for_task(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    from downloader import VideoDownloader
+
+    async def scenario():
+        downloader = VideoDownloader()
+
+        async def extract(url, proxy):
+            await asyncio.sleep(0.01)
+
+        async def fetch(url, save_path, proxy=None):
+            task = downloader.get_task(url)
+            task.first_byte_at = task.transfer_started_at
+            task.downloaded_bytes = 1000
+            await asyncio.sleep(0.01)
+            task.finished_at = task.first_byte_at + 0.5
+            return []
+        downloader._extract_info, downloader._fetch_streams = extract, fetch
+        downloader.add_task("https://example.com/a", str(tmp_path))
+        await downloader._do_download("https://example.com/a", str(tmp_path))
+        record = downloader.history.get_record("https://example.com/a")
+        assert {"extraction", "first_byte", "transfer"} <= set(record.phase_timings)
+        assert record.phase_timings["transfer"] == 0.5
+        text = downloader.metrics.render()
+        assert 'downloads_total{status="completed"} 1' in text
+        assert 'downloaded_bytes_total 1000' in text
+
+    asyncio.run(scenario())
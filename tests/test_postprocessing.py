@@ -0,0 +1,83 @@
+import asyncio
+
+from postprocessing import PostProcessor, merged_filename
+
+def test_merged_filename():
+    assert merged_filename("/d/t.f137.mp4", "/d/t.f140.m4a") == "/d/t.mp4"
+    assert merged_filename("/d/t.f248.webm", "/d/t.f251.webm") == "/d/t.webm"
+    assert merged_filename("/d/t.f248.webm", "/d/t.f140.m4a") == "/d/t.mkv"
+
+def test_merge_maps_video_then_audio_and_removes_parts(tmp_path, monkeypatch):
+    video, audio = tmp_path / "t.f137.mp4", tmp_path / "t.f140.m4a"
+    video.write_bytes(b"v")
+    audio.write_bytes(b"a")
+    processor = PostProcessor(max_workers=1)
+    processor.ffmpeg = "ffmpeg"
+    commands = []
+
+    async def fake_exec(args):
+        commands.append(args)
+        with open(args[-1], "wb") as f:
+            f.write(b"merged")
+    monkeypatch.setattr(processor, "_exec", fake_exec)
+
+    timings = {}
+    output = asyncio.run(processor.merge(str(video), str(audio), timings=timings))
+    assert output == str(tmp_path / "t.mp4")
+    assert commands[0][:8] == ["-i", str(video), "-i", str(audio), "-map", "0:v:0", "-map", "1:a:0"]
+    assert (tmp_path / "t.mp4").read_bytes() == b"merged"
+    assert not video.exists() and not audio.exists()
+    assert "postprocess" in timings and "postprocess_wait" in timings
+
+def test_concurrent_ffmpeg_runs_are_limited(monkeypatch):
+    processor = PostProcessor(max_workers=2)
+    processor.ffmpeg = "ffmpeg"
+    running = peak = 0
+
+    async def fake_exec(args):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+    monkeypatch.setattr(processor, "_exec", fake_exec)
+
+    async def scenario():
+        await asyncio.gather(*(processor.run(["-i", str(i)]) for i in range(6)))
+
+    asyncio.run(scenario())
+    assert peak == 2
+
+def test_network_slot_released_before_merge(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    from downloader import TaskStatus, VideoDownloader
+
+    async def scenario():
+        downloader = VideoDownloader()
+        merging = asyncio.Event()
+        finish_merge = asyncio.Event()
+
+        async def extract(url, proxy):
+            pass
+
+        async def fetch(url, save_path, proxy=None):
+            return [str(tmp_path / "t.f137.mp4"), str(tmp_path / "t.f140.m4a")]
+
+        async def postprocess(task, files):
+            merging.set()
+            await finish_merge.wait()
+            (tmp_path / "t.mp4").write_bytes(b"merged")
+            return str(tmp_path / "t.mp4")
+        downloader._extract_info, downloader._fetch_streams = extract, fetch
+        downloader._postprocess = postprocess
+
+        await downloader.download("https://example.com/a", str(tmp_path))
+        await asyncio.wait_for(merging.wait(), 5)
+        task = downloader.get_task("https://example.com/a")
+        assert task.status == TaskStatus.POSTPROCESSING
+        assert downloader.download_semaphore.active == 0 and downloader.active_downloads == 0
+        finish_merge.set()
+        await asyncio.wait_for(downloader.download_queue.join(), 5)
+        assert task.status == TaskStatus.COMPLETED and task.filename == "t.mp4"
+
+    asyncio.run(scenario())
@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+from utils.profiler import Profiler, profiled, profiler
+
+def test_profiled_is_passthrough_when_disabled():
+    calls = []
+
+    @profiled("test.disabled")
+    def work(x):
+        calls.append(x)
+        return x * 2
+
+    assert not profiler.enabled
+    assert work(3) == 6 and calls == [3]
+    assert "test.disabled" not in profiler.report()
+
+def test_profiled_records_and_reports_stalls(monkeypatch):
+    instance = Profiler()
+    monkeypatch.setattr("utils.profiler.profiler", instance)
+
+    @profiled("test.enabled")
+    def work():
+        return 1
+
+    async def scenario():
+        instance.start(slow_callback_ms=40)
+        try:
+            for _ in range(3):
+                work()
+            await asyncio.sleep(0.05)
+            time.sleep(0.2)  # 阻塞事件循环
+            await asyncio.sleep(0.1)
+        finally:
+            instance.stop()
+
+    asyncio.run(scenario())
+    report = instance.report()
+    line = next(line for line in report.splitlines() if line.startswith("test.enabled"))
+    assert line.split()[1] == "3"
+    assert "事件循环阻塞" in report and "time.sleep(0.2)" in report
+
+def test_dump_writes_report(tmp_path):
+    path = Profiler().dump(str(tmp_path))
+    assert open(path, encoding="utf-8").read().startswith("性能分析报告")
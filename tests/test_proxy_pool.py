@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+from utils.proxy_pool import ProxyPool
+
+async def _connect_proxy(statuses):
+    """本地 CONNECT 代理，依次用 statuses 中的状态码应答，用完后一直用最后一个"""
+    requests = []
+
+    async def handle(reader, writer):
+        request = await reader.readuntil(b"\r\n\r\n")
+        requests.append(request.split(b"\r\n", 1)[0].decode())
+        status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+        writer.write(f"HTTP/1.1 {status} OK\r\n\r\n".encode())
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}", requests
+
+def _pool(proxies, eviction_time):
+    pool = ProxyPool(probe_url="https://example.com", probe_timeout=2, eviction_time=eviction_time)
+    pool.set_proxies(proxies)
+    pool._probe_task.cancel()  # 测试中手动探测
+    return pool
+
+def test_evicted_proxy_readmitted_only_after_successful_probe():
+    async def scenario():
+        server, url, requests = await _connect_proxy([429, 502, 200])
+        async with server:
+            pool = _pool([url], eviction_time=0.2)
+            stats = pool.proxies[0]
+
+            await pool.check(stats)
+            assert stats.evicted and requests == ["CONNECT example.com:443 HTTP/1.1"]
+            # 剔除期间不探测
+            await pool.check(stats)
+            assert len(requests) == 1
+
+            # 到期后未经探测不恢复
+            await asyncio.sleep(0.25)
+            assert stats.evicted
+            assert pool.choose() == url  # 全部被剔除时仍使用失败最少的代理
+
+            # 探测失败继续剔除
+            await pool.check(stats)
+            assert len(requests) == 2 and stats.evicted
+
+            await pool.check(stats)
+            assert len(requests) == 3
+            assert not stats.evicted and stats.failures == 0 and stats.latency > 0
+
+    asyncio.run(scenario())
+
+def test_choose_skips_proxy_on_probation():
+    async def scenario():
+        bad_server, bad, _ = await _connect_proxy([403])
+        good_server, good, _ = await _connect_proxy([200])
+        async with bad_server, good_server:
+            pool = _pool([bad, good], eviction_time=0.1)
+            await asyncio.gather(*(pool.check(p) for p in pool.proxies))
+            await asyncio.sleep(0.15)
+            assert pool._proxies[bad].evicted_until < time.monotonic()
+            assert pool.choose() == good
+
+    asyncio.run(scenario())
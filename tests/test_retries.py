@@ -0,0 +1,111 @@
+import asyncio
+import errno
+
+import pytest
+from yt_dlp.utils import DownloadError, ExtractorError
+
+from utils.network import ErrorKind, HostCircuitBreaker, backoff_delay, classify_error, url_host
+from utils.storage import InsufficientSpaceError
+
+@pytest.mark.parametrize("exc, kind", [
+    (ConnectionResetError("Connection reset by peer"), ErrorKind.TRANSIENT),
+    (TimeoutError("timed out"), ErrorKind.TRANSIENT),
+    (OSError("HTTP Error 503: Service Unavailable"), ErrorKind.TRANSIENT),
+    (OSError("HTTP Error 429: Too Many Requests"), ErrorKind.THROTTLED),
+    (OSError("HTTP Error 403: Forbidden"), ErrorKind.THROTTLED),
+    (ExtractorError("Video unavailable"), ErrorKind.EXTRACTOR),
+    (DownloadError("ERROR: Unsupported URL: https://example.com"), ErrorKind.EXTRACTOR),
+    (OSError(errno.ENOSPC, "No space left on device"), ErrorKind.DISK_FULL),
+    (InsufficientSpaceError("磁盘空间不足"), ErrorKind.DISK_FULL),
+    (ValueError("something else"), ErrorKind.UNKNOWN),
+])
+def test_classify_error(exc, kind):
+    assert classify_error(exc) == kind
+
+def test_classify_unwraps_download_error():
+    inner = ConnectionResetError("Connection reset by peer")
+    wrapped = DownloadError("ERROR: unable to download", exc_info=(type(inner), inner, None))
+    assert classify_error(wrapped) == ErrorKind.TRANSIENT
+
+def test_backoff_delay_is_capped():
+    assert all(0 <= backoff_delay(n, base=1.0, cap=60.0) <= min(60.0, 2 ** n) for n in range(10) for _ in range(20))
+
+def test_circuit_breaker(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("time.monotonic", lambda: now[0])
+    breaker = HostCircuitBreaker(base_cooldown=30, max_cooldown=100)
+    assert breaker.record_failure("a.example", ErrorKind.TRANSIENT) is None
+    assert breaker.remaining("a.example") == 0
+    assert breaker.record_failure("a.example", ErrorKind.THROTTLED) == 30
+    assert breaker.remaining("a.example") == 30
+    assert breaker.remaining("b.example") == 0
+    assert breaker.record_failure("a.example", ErrorKind.THROTTLED) == 60
+    assert breaker.record_failure("a.example", ErrorKind.THROTTLED) == 100  # 上限
+    now[0] += 100
+    assert breaker.remaining("a.example") == 0  # 半开
+    assert breaker.record_failure("a.example", ErrorKind.THROTTLED) == 100  # 仍保留失败次数
+    breaker.record_success("a.example")
+    assert breaker.remaining("a.example") == 0
+    assert breaker.record_failure("a.example", ErrorKind.THROTTLED) == 30
+
+@pytest.fixture
+def downloader_with(tmp_path, monkeypatch):
+    """按给定的异常序列模拟每次传输的结果，退避不等待"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr("downloader.backoff_delay", lambda attempt: 0)
+    from downloader import VideoDownloader
+
+    def run(outcomes, progress_per_attempt=0):
+        async def scenario():
+            downloader = VideoDownloader()
+            attempts = []
+
+            async def extract(url, proxy):
+                pass
+
+            async def fetch(url, save_path, proxy=None):
+                attempts.append(url)
+                task = downloader.get_task(url)
+                task.downloaded_bytes += progress_per_attempt
+                outcome = outcomes[min(len(attempts), len(outcomes)) - 1]
+                if outcome is not None:
+                    raise outcome
+                return []
+            downloader._extract_info, downloader._fetch_streams = extract, fetch
+            downloader.add_task("https://host.example/a", str(tmp_path))
+            try:
+                await downloader._do_download("https://host.example/a", str(tmp_path))
+            except Exception:
+                pass
+            return downloader, downloader.get_task("https://host.example/a"), len(attempts)
+        return asyncio.run(scenario())
+    return run
+
+def test_transient_errors_retry_then_succeed(downloader_with):
+    from downloader import TaskStatus
+    reset = ConnectionResetError("Connection reset by peer")
+    _, task, attempts = downloader_with([reset, reset, None])
+    assert task.status == TaskStatus.COMPLETED and attempts == 3
+
+def test_transient_errors_without_progress_use_up_retries(downloader_with):
+    from downloader import TaskStatus
+    _, task, attempts = downloader_with([ConnectionResetError("Connection reset by peer")])
+    assert task.status == TaskStatus.ERROR and attempts == 3
+
+def test_resumed_progress_does_not_consume_retries(downloader_with):
+    from downloader import TaskStatus
+    reset = ConnectionResetError("Connection reset by peer")
+    _, task, attempts = downloader_with([reset] * 6 + [None], progress_per_attempt=100)
+    assert task.status == TaskStatus.COMPLETED and attempts == 7
+
+def test_extractor_errors_are_not_retried(downloader_with):
+    from downloader import TaskStatus
+    _, task, attempts = downloader_with([ExtractorError("Video unavailable")])
+    assert task.status == TaskStatus.ERROR and attempts == 1
+
+def test_throttled_host_defers_task(downloader_with):
+    from downloader import TaskStatus
+    downloader, task, attempts = downloader_with([OSError("HTTP Error 429: Too Many Requests")])
+    assert attempts == 1
+    assert task.status == TaskStatus.PENDING and task.throttle_deferrals == 1
+    assert downloader.breaker.remaining(url_host(task.url)) > 0
@@ -0,0 +1,52 @@
+import pytest
+
+from platforms.router import PlatformRouter
+
+VIDEO = "dQw4w9WgXcQ"
+
+@pytest.fixture(scope="module")
+def router():
+    return PlatformRouter()
+
+@pytest.mark.parametrize("url", [
+    f"https://www.youtube.com/watch?v={VIDEO}",
+    f"https://youtube.com/watch?feature=share&v={VIDEO}",
+    f"https://m.youtube.com/watch?v={VIDEO}",
+    f"https://music.youtube.com/watch?v={VIDEO}",
+    f"https://www.youtube.com/shorts/{VIDEO}",
+    f"https://www.youtube.com/embed/{VIDEO}",
+    f"https://www.youtube-nocookie.com/embed/{VIDEO}",
+    f"https://youtu.be/{VIDEO}",
+])
+def test_youtube_video_urls_use_youtube_extractor(router, url):
+    assert router.ie_key(url) == "Youtube"
+    assert router.dedup_key(url) == ("youtube", VIDEO)
+
+@pytest.mark.parametrize("url", [
+    f"https://www.youtube.com/watch?v={VIDEO}&list=PLx0sYbCqOb8TBPRdmBHs5Iftvv9TPboYG",
+    f"https://youtu.be/{VIDEO}?list=PLx0sYbCqOb8TBPRdmBHs5Iftvv9TPboYG",
+])
+def test_playlist_parameter_leaves_extractor_choice_to_ytdlp(router, url):
+    # YoutubeIE.suitable 拒绝带 list= 的地址，强制指定会导致 "No suitable extractor"
+    assert router.ie_key(url) is None
+    assert router.dedup_key(url) == ("youtube", VIDEO)
+
+@pytest.mark.parametrize("url", [
+    "https://www.bilibili.com/video/BV1xx411c7mD",
+    "https://www.bilibili.com/video/BV1xx411c7mD?p=1",
+    "https://bilibili.com/video/av170001/",
+])
+def test_bilibili_video_urls_use_bilibili_extractor(router, url):
+    assert router.ie_key(url) == "BiliBili"
+
+@pytest.mark.parametrize("url", [
+    "https://m.bilibili.com/video/BV1xx411c7mD",
+    "https://b23.tv/abcdef",
+    "https://www.youtube.com/playlist?list=PLx0sYbCqOb8TBPRdmBHs5Iftvv9TPboYG",
+    "https://example.com/video.mp4",
+    "not a url",
+])
+def test_unrouted_urls(router, url):
+    assert router.classify(url) is None
+    assert router.ie_key(url) is None
+    assert router.dedup_key(url) == url
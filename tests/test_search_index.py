@@ -0,0 +1,29 @@
+from utils.search_index import SearchIndex
+
+def _index():
+    index = SearchIndex()
+    index.update("a", url="https://www.youtube.com/watch?v=abc", title="Concert Highlights", host="youtube.com")
+    index.update("b", url="https://www.bilibili.com/video/BV1xx", title="演唱会合集", host="bilibili.com")
+    index.update("c", url="https://example.com/tube.mp4", title="Tube map", host="example.com", status="error")
+    return index
+
+def test_substring_within_words():
+    index = _index()
+    assert index.search("tube") == {"a", "c"}
+    assert index.search("light") == {"a"}
+    assert index.search("host:tube") == {"a"}
+    assert index.search("合集") == {"b"}
+
+def test_short_terms_match_prefix_only():
+    index = _index()
+    assert index.search("title:co") == {"a"}
+    assert index.search("title:ap") == set()  # map
+
+def test_fields_and_updates():
+    index = _index()
+    assert index.search("status:error tube") == {"c"}
+    index.update("c", title="Underground")
+    assert index.search("title:tube") == set()
+    assert index.search("title:ground") == {"c"}
+    index.remove("a")
+    assert index.search("youtube") == set()
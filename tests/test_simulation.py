@@ -0,0 +1,33 @@
+from simulation import HostProfile, Simulator, Workload
+from utils.config import AppConfig
+
+def _hosts():
+    return {
+        "reliable.example": HostProfile(bandwidth=10 * 1024 * 1024, extraction_latency=1.0, failure_rate=0.0),
+        "broken.example": HostProfile(bandwidth=10 * 1024 * 1024, extraction_latency=1.0, failure_rate=0.0,
+                                      extractor_error_rate=1.0),
+    }
+
+def test_seeded_simulation_counts(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    workload = Workload.synthetic(40, hosts=_hosts(), median_size_mb=5, seed=3)
+    expected_broken = sum(job.host == "broken.example" for job in workload.jobs)
+    report = Simulator(workload, seed=3).run()
+
+    assert report.unfinished == 0
+    assert report.completed == len(workload.jobs) - expected_broken
+    assert report.failed == expected_broken
+    assert report.hosts["reliable.example"].failed == 0
+    # 相同的种子得到相同的结果
+    again = Simulator(Workload.synthetic(40, hosts=_hosts(), median_size_mb=5, seed=3), seed=3).run()
+    assert (again.completed, again.failed, again.makespan) == (report.completed, report.failed, report.makespan)
+
+def test_simulation_leaves_user_environment_alone(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    config = AppConfig(metrics_port=1, staging_dir=str(tmp_path / "staging"))
+    simulator = Simulator(Workload.synthetic(5, seed=1), config, seed=1)
+    report = simulator.run()
+    assert report.unfinished == 0
+    assert not (tmp_path / ".video_downloader").exists()
+    assert not (tmp_path / "staging").exists()
+    assert simulator.downloader.metrics._server is None
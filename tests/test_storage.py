@@ -0,0 +1,78 @@
+import asyncio
+
+from utils.storage import FileMover
+
+def test_move_keeps_existing_file(tmp_path):
+    staging, save = tmp_path / "staging", tmp_path / "save"
+    staging.mkdir()
+    save.mkdir()
+    (save / "video.mp4").write_bytes(b"old")
+    (save / "video (1).mp4").write_bytes(b"older")
+    (staging / "video.mp4").write_bytes(b"new")
+
+    dest = asyncio.run(FileMover().move(str(staging / "video.mp4"), str(save)))
+    assert dest == str(save / "video (2).mp4")
+    assert (save / "video.mp4").read_bytes() == b"old"
+    assert (save / "video (1).mp4").read_bytes() == b"older"
+    assert (save / "video (2).mp4").read_bytes() == b"new"
+    assert not (staging / "video.mp4").exists()
+
+def test_cross_device_copy_failure_leaves_no_placeholder(tmp_path, monkeypatch):
+    staging, save = tmp_path / "staging", tmp_path / "save"
+    staging.mkdir()
+    (staging / "video.mp4").write_bytes(b"new")
+
+    def cross_device(src, dest):
+        raise OSError("cross-device link")
+    monkeypatch.setattr("os.replace", cross_device)
+    monkeypatch.setattr("shutil.copystat", lambda src, dest: (_ for _ in ()).throw(OSError("copy failed")))
+
+    try:
+        FileMover()._move(str(staging / "video.mp4"), str(save))
+    except OSError:
+        pass
+    assert list(save.iterdir()) == []
+    assert (staging / "video.mp4").exists()
+
+def test_queued_tasks_reserve_space(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))  # 历史记录写到临时目录
+    import shutil
+    from downloader import TaskStatus, VideoDownloader
+
+    async def scenario():
+        downloader = VideoDownloader()
+        downloader.storage.min_free_bytes = 0
+        free = shutil.disk_usage(tmp_path).free
+        downloader.max_task_bytes = free // 2 + 1
+        await downloader.download("https://example.com/a", str(tmp_path))
+        await downloader.download("https://example.com/b", str(tmp_path))
+        assert downloader.get_task("https://example.com/a").status == TaskStatus.PENDING
+        assert downloader.storage.reserved_bytes(str(tmp_path)) == downloader.max_task_bytes
+        # 第二个排队任务已经放不下
+        task = downloader.get_task("https://example.com/b")
+        assert task.status == TaskStatus.ERROR and "磁盘空间不足" in task.error_message
+
+        downloader.cancel_task("https://example.com/a")
+        assert downloader.storage.reserved_bytes(str(tmp_path)) == 0
+
+    asyncio.run(scenario())
+
+def test_download_fails_loudly_when_queueing_breaks(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    import pytest
+    from downloader import TaskStatus, VideoDownloader
+
+    async def scenario():
+        downloader = VideoDownloader()
+
+        def broken(limit=100):
+            raise RuntimeError("history unavailable")
+        downloader.history.average_size = broken
+        with pytest.raises(RuntimeError):
+            await downloader.download("https://example.com/a", str(tmp_path))
+        # 任务不会停在等待状态
+        task = downloader.get_task("https://example.com/a")
+        assert task.status == TaskStatus.ERROR and "history unavailable" in task.error_message
+        assert downloader.download_queue.empty()
+
+    asyncio.run(scenario())
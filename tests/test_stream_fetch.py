@@ -0,0 +1,76 @@
+import asyncio
+import os
+import threading
+
+from utils.ydl_pool import DownloaderPool
+
+class FakeYDL:
+    """记录调用的 YoutubeDL 替身，两个流的下载必须同时进行才能通过屏障"""
+    barrier = None
+
+    def __init__(self, params):
+        self.params = dict(params, outtmpl={"default": "%(title)s.%(ext)s"})
+        self.processed = []
+
+    def prepare_filename(self, info):
+        template = self.params["outtmpl"]["default"]
+        return template.replace("%(title)s", info["title"]).replace(
+            "%(format_id)s", str(info.get("format_id"))).replace("%(ext)s", info["ext"])
+
+    def process_info(self, info):
+        assert "requested_formats" not in info  # 每次只下载一个流，yt-dlp不会自己合并
+        FakeYDL.barrier.wait()
+        self.processed.append(info["format_id"])
+
+INFO = {
+    "title": "clip", "ext": "mp4", "webpage_url": "https://example.com/a", "duration": 10,
+    "formats": [
+        {"format_id": "137", "vcodec": "avc1", "acodec": "none", "height": 1080, "ext": "mp4", "filesize": 1000},
+        {"format_id": "140", "vcodec": "none", "acodec": "mp4a", "abr": 128, "tbr": 128, "ext": "m4a", "filesize": 100},
+    ],
+}
+
+def test_split_streams_download_in_parallel(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    from downloader import VideoDownloader
+
+    async def scenario():
+        downloader = VideoDownloader()
+        downloader.ydl_pool = DownloaderPool(factory=FakeYDL)
+        downloader.storage.min_free_bytes = 0
+        downloader.add_task(INFO["webpage_url"], str(tmp_path))
+        downloader.info_cache.put(INFO["webpage_url"], None, INFO)
+        FakeYDL.barrier = threading.Barrier(2, timeout=5)
+        files = await downloader._fetch_streams(INFO["webpage_url"], str(tmp_path))
+        return downloader, files
+
+    downloader, files = asyncio.run(scenario())
+    assert [os.path.basename(f) for f in files] == ["clip.f137.mp4", "clip.f140.m4a"]
+    task = downloader.get_task(INFO["webpage_url"])
+    assert task.stream_count == 2 and task.filename == "clip.mp4"
+    assert task.format_info.startswith("137+140")
+
+def test_combined_progress_across_streams(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    from downloader import VideoDownloader
+
+    async def scenario():
+        downloader = VideoDownloader()
+        task = downloader.add_task(INFO["webpage_url"], str(tmp_path))
+        task.stream_count = 2
+
+        def hook(format_id, status, downloaded, total):
+            downloader._progress_hook({
+                "status": status, "downloaded_bytes": downloaded, "total_bytes": total,
+                "info_dict": {"webpage_url": INFO["webpage_url"], "format_id": format_id},
+            })
+        hook("137", "downloading", 500, 1000)
+        assert task.progress == 0  # 音频流还没有回调，总大小未知
+        hook("140", "downloading", 50, 100)
+        assert task.downloaded_bytes == 550 and task.progress == 50
+        hook("137", "finished", 1000, 1000)
+        assert task.note != "完成"
+        hook("140", "finished", 100, 100)
+        assert task.progress == 100 and task.note == "完成" and task.total_bytes == 1100
+
+    asyncio.run(scenario())
@@ -0,0 +1,39 @@
+import asyncio
+
+
+from utils.throughput import ThroughputEstimator
+
+def test_rate_decays_without_new_bytes():
+    estimator = ThroughputEstimator(interval=1.0)
+    for second in range(5):
+        estimator.add(1000, now=float(second))
+    steady = estimator.rate(now=5.0)
+    assert steady == 1000
+    assert estimator.rate(now=8.0) < steady
+
+def test_stalled_task_speed_decays_on_refresh(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))  # 历史记录写到临时目录
+    from downloader import DownloadTask, TaskStatus, VideoDownloader
+
+    async def create():
+        return VideoDownloader()
+
+    downloader = asyncio.run(create())
+    task = DownloadTask("https://example.com/a", str(tmp_path))
+    task.status = TaskStatus.DOWNLOADING
+    task.throughput = ThroughputEstimator()
+    task.first_byte_at = 1.0
+    task.total_bytes, task.downloaded_bytes = 100000, 5000
+    for second in range(5):
+        task.throughput.add(1000, now=float(second))
+    downloader.tasks[task.url] = task
+    downloader._running.add(task.url)
+
+    monkeypatch.setattr("time.monotonic", lambda: 5.0)
+    downloader.refresh_speeds()
+    assert task.speed_bps == 1000 and task.eta_seconds == 95
+
+    # 之后没有进度回调，界面定时刷新时速度下降、剩余时间变长
+    monkeypatch.setattr("time.monotonic", lambda: 10.0)
+    downloader.refresh_speeds()
+    assert task.speed_bps < 1000 and task.eta_seconds > 95
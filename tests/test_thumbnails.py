@@ -0,0 +1,93 @@
+import os
+import time
+
+import pytest
+from PyQt6.QtCore import QBuffer, QByteArray, QIODevice
+from PyQt6.QtGui import QColor, QImage
+from PyQt6.QtWidgets import QApplication
+
+from ui.thumbnails import THUMBNAIL_HEIGHT, THUMBNAIL_WIDTH, ThumbnailLoader
+from utils.thumbnails import ThumbnailStore
+
+def test_store_round_trip(tmp_path):
+    store = ThumbnailStore(str(tmp_path / "thumbs"), max_bytes=1000)
+    assert store.get("https://i.example/a.jpg") is None
+    store.put("https://i.example/a.jpg", b"x" * 10)
+    store.put("https://i.example/a.jpg", b"y" * 20)  # 覆盖时按差值计入总大小
+    assert store.get("https://i.example/a.jpg") == b"y" * 20
+    assert store._total == 20
+
+def test_store_evicts_least_recently_used(tmp_path):
+    directory = tmp_path / "thumbs"
+    directory.mkdir()
+    (directory / "stale.jpg").write_bytes(b"s" * 400)  # 上次运行留下的文件计入总大小
+    os.utime(directory / "stale.jpg", (time.time() - 300, time.time() - 300))
+    store = ThumbnailStore(str(directory), max_bytes=1000)
+    store.put("a", b"a" * 300)
+    os.utime(store.path("a"), (time.time() - 200, time.time() - 200))
+    store.put("b", b"b" * 200)
+    os.utime(store.path("b"), (time.time() - 100, time.time() - 100))
+    assert store.get("a") is not None  # 读取后a成为最近使用
+    store.put("c", b"c" * 500)
+
+    assert not (directory / "stale.jpg").exists()
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None
+    assert store._total == 800 <= store.max_bytes * 0.9
+
+def _image_bytes(width=640, height=360) -> bytes:
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(QColor("red"))
+    output = QByteArray()
+    buffer = QBuffer(output)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(output)
+
+@pytest.fixture
+def app():
+    return QApplication.instance() or QApplication([])
+
+def _wait(app, condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    assert condition()
+
+def test_loader_downscales_caches_and_skips_failures(app, tmp_path):
+    fetched = []
+
+    def fetch(url):
+        fetched.append(url)
+        if url.endswith("broken"):
+            return b"not an image"
+        return _image_bytes()
+    store = ThumbnailStore(str(tmp_path), max_bytes=10 * 1024 * 1024)
+    loader = ThumbnailLoader(fetch, store, memory_entries=1)
+    loaded = []
+    loader.loaded.connect(loaded.append)
+
+    loader.set_wanted({"https://i.example/a", "https://i.example/broken"})
+    _wait(app, lambda: not loader._pending)
+    assert loaded == ["https://i.example/a"]
+    pixmap = loader.get("https://i.example/a")
+    assert (pixmap.width(), pixmap.height()) == (THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT)
+    assert store.get("https://i.example/a") is not None
+
+    # 失败的地址不再请求；内存只保留一张，被挤出的图片从磁盘缓存读回而不是重新下载
+    loader.set_wanted({"https://i.example/b", "https://i.example/broken"})
+    _wait(app, lambda: not loader._pending)
+    assert loader.get("https://i.example/a") is None
+    loader.set_wanted({"https://i.example/a"})
+    _wait(app, lambda: not loader._pending)
+    assert loader.get("https://i.example/a") is not None
+    assert sorted(fetched) == ["https://i.example/a", "https://i.example/b", "https://i.example/broken"]
+
+def test_loader_drops_requests_no_longer_visible(app, tmp_path):
+    loader = ThumbnailLoader(lambda url: _image_bytes(), ThumbnailStore(str(tmp_path)))
+    loader.set_wanted({"https://i.example/a"}, view="history")
+    loader.set_wanted(set(), view="history")  # 轮到之前已滚出视口
+    _wait(app, lambda: not loader._pending)
+    assert loader.get("https://i.example/a") is None
+    assert "https://i.example/a" not in loader._failed
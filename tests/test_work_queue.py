@@ -0,0 +1,127 @@
+import asyncio
+import multiprocessing
+import os
+import time
+
+from utils.work_queue import FINISHED, LEASED, QUEUED, SharedQueue
+
+JOBS = 40
+LEASE_SECONDS = 1.0
+
+def _run_worker(db_path: str, worker_id: str, stop, results, slots: int = 2):
+    """工作节点进程：领取任务，处理期间心跳续租，结束时回报"""
+    queue = SharedQueue(db_path)
+    while not stop.is_set():
+        leased = []
+        while len(leased) < slots:
+            job = queue.lease(worker_id, LEASE_SECONDS)
+            if job is None:
+                break
+            leased.append(job.url)
+        if not leased:
+            time.sleep(0.05)
+            continue
+        time.sleep(0.02)
+        queue.heartbeat(worker_id, {url: {"progress": 50.0} for url in leased}, LEASE_SECONDS)
+        for url in leased:
+            if queue.complete(url, worker_id, {"task_status": "completed", "note": worker_id}):
+                results.put((worker_id, url))
+
+def _run_crashing_worker(db_path: str, leased_count: int, ready):
+    """领取任务后不再心跳就退出，模拟节点失联"""
+    queue = SharedQueue(db_path)
+    for _ in range(leased_count):
+        queue.lease("crashed", LEASE_SECONDS)
+    ready.set()
+    os._exit(0)
+
+def _jobs(queue: SharedQueue):
+    jobs, _ = queue.changes(0)
+    return {job.url: job for job in jobs}
+
+def test_several_worker_processes_share_queue(tmp_path):
+    db_path = str(tmp_path / "queue.db")
+    queue = SharedQueue(db_path)
+    for i in range(JOBS):
+        queue.enqueue(f"https://example.com/{i}", str(tmp_path))
+
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Event()
+    crashed = ctx.Process(target=_run_crashing_worker, args=(db_path, 3, ready))
+    crashed.start()
+    assert ready.wait(30)
+    crashed.join(30)
+    held = [job for job in _jobs(queue).values() if job.worker == "crashed"]
+    assert len(held) == 3 and all(job.state == LEASED for job in held)
+
+    stop, results = ctx.Event(), ctx.Queue()
+    workers = [ctx.Process(target=_run_worker, args=(db_path, f"w{i}", stop, results)) for i in range(4)]
+    for worker in workers:
+        worker.start()
+    try:
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            queue.reclaim_expired()  # 协调端的定期回收
+            if all(job.state == FINISHED for job in _jobs(queue).values()):
+                break
+            time.sleep(0.1)
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join(30)
+
+    completed = []
+    while not results.empty():
+        completed.append(results.get())
+    jobs = _jobs(queue)
+    assert all(job.state == FINISHED and job.task_status == "completed" for job in jobs.values())
+    # 每个任务只被一个节点成功回报
+    urls = [url for _, url in completed]
+    assert sorted(urls) == sorted(jobs)
+    assert len({worker for worker, _ in completed}) > 1
+    # 失联节点的任务租约过期后由其他节点完成
+    for job in held:
+        assert jobs[job.url].attempts == 1
+        assert jobs[job.url].note != "crashed"
+
+def test_heartbeat_reports_lost_leases(tmp_path):
+    queue = SharedQueue(str(tmp_path / "queue.db"))
+    queue.enqueue("https://example.com/a", str(tmp_path))
+    queue.enqueue("https://example.com/b", str(tmp_path))
+    a = queue.lease("w1", 0.2)
+    b = queue.lease("w1", 30)
+    queue.cancel(b.url)
+    time.sleep(0.3)
+    queue.reclaim_expired()
+    assert queue.heartbeat("w1", {a.url: {}, b.url: {}}, 30) == {a.url, b.url}
+    assert _jobs(queue)[a.url].state == QUEUED
+    assert queue.lease("w2", 30).url == a.url
+    assert not queue.complete(a.url, "w1", {"task_status": "completed"})
+
+def test_coordinator_requeues_job_reclaimed_during_postprocessing(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))  # 历史记录写到临时目录
+    from distributed import Coordinator
+    from downloader import TaskStatus, VideoDownloader
+
+    async def scenario():
+        downloader = VideoDownloader()
+        queue = SharedQueue(str(tmp_path / "queue.db"))
+        coordinator = Coordinator(downloader, queue)
+        await downloader.download("https://example.com/a", str(tmp_path))
+        await downloader.download("https://example.com/b", str(tmp_path))
+        await coordinator._call(lambda: None)  # 等提交完成
+
+        job = queue.lease("w1", 0.2)
+        queue.heartbeat("w1", {job.url: {"task_status": "postprocessing", "progress": 100.0}}, 0.2)
+        await coordinator.sync()
+        original = downloader.get_task(job.url)
+        assert original.status == TaskStatus.POSTPROCESSING
+
+        await asyncio.sleep(0.3)
+        queue.reclaim_expired()
+        await coordinator.sync()
+        task = downloader.get_task(job.url)
+        assert task is not original and task.status == TaskStatus.PENDING
+        assert downloader.get_task("https://example.com/b").status == TaskStatus.PENDING
+
+    asyncio.run(scenario())